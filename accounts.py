@@ -0,0 +1,157 @@
+from sqlalchemy import bindparam, delete, select, update
+from sqlalchemy.dialects.sqlite import insert
+
+
+class UserRepository:
+    """
+    the account queries of the users table, each one a single statement built once
+    and reused, that only reads the columns it needs
+
+    Attributes:
+        engine: the engine the statements run on
+        users: the users table
+        favorites: the favorites table, cleared along with a deleted user
+        breweries: the breweries table the favorites point at
+    """
+
+    def __init__(self, engine, users, favorites, breweries):
+        """
+        initializes the repository and builds its statements
+        """
+        self.engine = engine
+        self.users = users
+        self.favorites = favorites
+        self.breweries = breweries
+        self.selectId = select(users.c.id).where(users.c.username == bindparam("username"))
+        self.selectCredentials = (select(users.c.id, users.c.salt, users.c.hashed_password)
+                                  .where(users.c.username == bindparam("username")))
+        self.selectHash = select(users.c.hashed_password).where(users.c.id == bindparam("user_id"))
+        #a taken username inserts nothing and returns no id, so there is no need to check it first
+        self.insertUser = (insert(users).on_conflict_do_nothing(index_elements=[users.c.username])
+                           .returning(users.c.id))
+        #only replaces the hash that was verified, so a concurrent change of the password wins
+        self.updateHash = (update(users)
+                           .where(users.c.id == bindparam("user_id"), users.c.hashed_password == bindparam("old_hash"))
+                           .values(salt=bindparam("new_salt"), hashed_password=bindparam("new_hash")))
+        self.selectExisting = select(users.c.username).where(users.c.username.in_(bindparam("usernames", expanding=True)))
+        self.insertUsers = (insert(users).on_conflict_do_nothing(index_elements=[users.c.username])
+                            .returning(users.c.username, users.c.id))
+        upsertBrewery = insert(breweries)
+        self.upsertBreweries = upsertBrewery.on_conflict_do_update(index_elements=[breweries.c.id],
+                                                                  set_={"data": upsertBrewery.excluded.data})
+        self.insertFavorites = insert(favorites)
+        self.selectExport = (select(users.c.id, users.c.username, users.c.salt, users.c.hashed_password,
+                                    favorites.c.position, breweries.c.data)
+                             .select_from(users.outerjoin(favorites, favorites.c.user_id == users.c.id)
+                                          .outerjoin(breweries, breweries.c.id == favorites.c.brewery_id))
+                             .order_by(users.c.id, favorites.c.position))
+        self.deleteFavorites = delete(favorites).where(favorites.c.user_id == bindparam("user_id"))
+        self.deleteUser = (delete(users)
+                           .where(users.c.id == bindparam("user_id"), users.c.hashed_password == bindparam("old_hash")))
+
+    def userId(self, username):
+        """
+        returns:
+            the id of a user, None if the username does not exist
+        """
+        with self.engine.connect() as conn:
+            return conn.execute(self.selectId, {"username": username}).scalar()
+
+    def credentials(self, username):
+        """
+        returns:
+            (id, salt, hashed_password) of a user, None if the username does not exist
+        """
+        with self.engine.connect() as conn:
+            return conn.execute(self.selectCredentials, {"username": username}).first()
+
+    def passwordHash(self, userId):
+        """
+        returns:
+            the hashed_password of a user, None if the user does not exist
+        """
+        with self.engine.connect() as conn:
+            return conn.execute(self.selectHash, {"user_id": userId}).scalar()
+
+    def create(self, username, salt, hashedPassword):
+        """
+        returns:
+            the id of the new user, None if the username already exists
+        """
+        with self.engine.begin() as conn:
+            return conn.execute(self.insertUser, {"username": username, "salt": salt,
+                                                  "hashed_password": hashedPassword}).scalar()
+
+    def setPassword(self, userId, oldHash, salt, hashedPassword):
+        """
+        replaces the salt and hash of a user whose hash is still oldHash
+
+        returns:
+            True if the password was replaced
+        """
+        with self.engine.begin() as conn:
+            return conn.execute(self.updateHash, {"user_id": userId, "old_hash": oldHash,
+                                                  "new_salt": salt, "new_hash": hashedPassword}).rowcount == 1
+
+    def delete(self, userId, oldHash):
+        """
+        deletes a user whose hash is still oldHash, and their favorites, in one transaction
+
+        returns:
+            True if the user was deleted
+        """
+        with self.engine.begin() as conn:
+            if conn.execute(self.deleteUser, {"user_id": userId, "old_hash": oldHash}).rowcount != 1:
+                return False
+            conn.execute(self.deleteFavorites, {"user_id": userId})
+            return True
+
+    def existing(self, usernames):
+        """
+        returns:
+            the set of usernames in usernames that already exist
+        """
+        with self.engine.connect() as conn:
+            return set(conn.execute(self.selectExisting, {"usernames": list(usernames)}).scalars())
+
+    def createMany(self, rows):
+        """
+        inserts a batch of users, dicts of username, salt, hashed_password and optionally
+        favorites ({position: brewery}), with their favorites in one transaction
+        users whose username is taken (by then) are skipped, and so are their favorites
+
+        returns:
+            the set of usernames that were inserted
+        """
+        if not rows:
+            return set()
+        with self.engine.begin() as conn:
+            ids = dict(conn.execute(self.insertUsers, [{"username": row["username"], "salt": row["salt"],
+                                                        "hashed_password": row["hashed_password"]} for row in rows]).all())
+            favorites = [(ids[row["username"]], position, brewery) for row in rows if row["username"] in ids
+                         for position, brewery in row.get("favorites", {}).items()]
+            if favorites:
+                #every brewery once, refreshed like a favorite added through the app
+                breweries = {brewery["id"]: brewery for _, _, brewery in favorites}
+                conn.execute(self.upsertBreweries, [{"id": id, "data": data} for id, data in breweries.items()])
+                conn.execute(self.insertFavorites, [{"user_id": user_id, "position": position, "brewery_id": brewery["id"]}
+                                                    for user_id, position, brewery in favorites])
+            return set(ids)
+
+    def export(self, batchSize=1000):
+        """
+        yields (username, salt, hashed_password, {position: brewery}) for every user, in id order
+        rows are streamed from the db batchSize at a time, the table is never loaded at once
+        """
+        with self.engine.connect() as conn:
+            result = conn.execution_options(yield_per=batchSize).execute(self.selectExport)
+            current = None
+            for user_id, username, salt, hashed_password, position, brewery in result:
+                if current == None or current[0] != user_id:
+                    if current != None:
+                        yield current[1:]
+                    current = (user_id, username, salt, hashed_password, {})
+                if position != None:
+                    current[4][position] = brewery
+            if current != None:
+                yield current[1:]
@@ -0,0 +1,307 @@
+"""
+asyncio serving mode for the brewery proxy routes
+
+    uvicorn asgi_app:app --port 5000
+
+/get-brewery/<id>, /list-breweries (with its all=true fan-out) and /get-random are answered on the event loop
+with an async http client, so one process keeps many upstream calls in flight.
+their sqlite work (the brewery mirror, the sqlite memory backend) runs on worker threads so it never blocks the loop.
+every other route falls through to the flask app in db_app (run on a thread pool),
+and `python db_app.py` still serves everything synchronously.
+"""
+import asyncio
+import json
+import logging
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qsl
+
+import httpx
+from asgiref.wsgi import WsgiToAsgi
+from itsdangerous import BadSignature
+
+import db_app
+from config import Config
+from fanout import ordered_fanout_async
+from memory import SQLiteMemoryStore
+
+
+class BreweryProxy:
+    """
+    an asgi app serving the brewery proxy routes without blocking a worker per upstream call
+    it shares its caches and session memories (and session cookies) with the flask app
+
+    Attributes:
+        fallback: the asgi app every other request is passed to
+        client: the async http client, created on startup (or on first use)
+    """
+
+    def __init__(self, fallback):
+        """
+        initializes the proxy in front of a fallback asgi app
+        """
+        self.fallback = fallback
+        self.client = None
+
+    def getClient(self):
+        """
+        returns:
+            the async http client, creating it if the server did not run lifespan startup
+        """
+        if self.client is None:
+            limits = httpx.Limits(max_connections=Config.ASYNC_MAX_CONNECTIONS,
+                                  max_keepalive_connections=Config.UPSTREAM_POOL_SIZE)
+            #pool=None so requests over the connection limit wait for a connection instead of failing
+            timeout = httpx.Timeout(Config.UPSTREAM_TIMEOUT, pool=None)
+            transport = httpx.AsyncHTTPTransport(retries=Config.UPSTREAM_RETRIES, limits=limits)
+            self.client = httpx.AsyncClient(transport=transport, timeout=timeout)
+        return self.client
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] == "http" and scope["method"] == "GET":
+            path = scope["path"]
+            if path.startswith("/get-brewery/") and path.count("/") == 2 and len(path) > len("/get-brewery/"):
+                await self.getBrewery(path[len("/get-brewery/"):], scope, send)
+                return
+            if path == "/list-breweries":
+                await self.listBreweries(scope, send)
+                return
+            if path == "/get-random":
+                await self.getRandom(scope, receive, send)
+                return
+        await self.fallback(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        """
+        opens the http client on startup and closes it on shutdown
+        """
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.getClient()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self.client is not None:
+                    await self.client.aclose()
+                    self.client = None
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def remember(self, scope, raw, count):
+        """
+        stores a response in the memory of the request's flask session, starting a session if there is none
+        the sqlite backend is written to on a worker thread so the event loop is not blocked
+
+        returns:
+            a set-cookie header to send if a session was started, else None
+        """
+        flaskApp = db_app.app
+        serializer = flaskApp.session_interface.get_signing_serializer(flaskApp)
+        cookieName = flaskApp.config["SESSION_COOKIE_NAME"]
+        cookies = SimpleCookie()
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                cookies.load(value.decode("latin-1"))
+
+        data = {}
+        if cookieName in cookies:
+            try:
+                data = serializer.loads(cookies[cookieName].value, max_age=int(flaskApp.permanent_session_lifetime.total_seconds()))
+            except BadSignature:
+                data = {}
+
+        header = None
+        if "sid" not in data:
+            data = dict(data, sid=db_app.gen_salt())
+            header = (b"set-cookie", f'{cookieName}={serializer.dumps(data)}; HttpOnly; Path=/'.encode("latin-1"))
+        if isinstance(db_app.memories, SQLiteMemoryStore):
+            await asyncio.to_thread(storeResponse, data["sid"], header is not None, raw, count)
+        else:
+            storeResponse(data["sid"], header is not None, raw, count)
+        return header
+
+    async def fetchRaw(self, url):
+        """
+        returns:
+            the raw body of a GET request to the url
+        """
+        response = await self.getClient().get(url)
+        return response.content
+
+    async def fetchBrewery(self, id):
+        """
+        async version of db_app.fetch_brewery
+        """
+        response = await self.getClient().get(f'{db_app.BREWERY_API}/{id}')
+        if response.status_code == 404: #invalid id
+            return None
+        response.raise_for_status()
+        brewery = json.loads(response.content)
+        if db_app.mirror_synced():
+            await asyncio.to_thread(db_app.mirror.add, [brewery])
+        return response.content, 1
+
+    async def fetchBreweries(self, query_string):
+        """
+        async version of db_app.fetch_breweries
+        """
+        raw = await self.fetchRaw(f'{db_app.BREWERY_API}?{query_string}')
+        response = json.loads(raw)
+        if type(response) != list: #the api rejected the query
+            raise ValueError(response)
+        return raw, len(response)
+
+    async def fetchTotal(self, meta_query):
+        """
+        async version of db_app.fetch_total
+        """
+        raw = await self.fetchRaw(f'{db_app.BREWERY_API}/meta?{meta_query}')
+        return raw, int(json.loads(raw)["total"])
+
+    async def cachedBreweries(self, query_string):
+        """
+        async version of db_app.cached_breweries
+        """
+        found, response = db_app.list_cache.lookup(query_string)
+        if not found:
+            response = await db_app.flights.doAsync(("list", query_string), lambda: self.fetchBreweries(query_string))
+            db_app.list_cache.put(query_string, response)
+        return response
+
+    async def getBrewery(self, id, scope, send):
+        """
+        async version of db_app.get_brewery
+        """
+        try:
+            raw = await asyncio.to_thread(db_app.local_brewery, id)
+            if raw != None:
+                await sendRaw(send, raw, cookie=await self.remember(scope, raw, 1))
+                return
+
+            found, response = db_app.brewery_cache.lookup(id)
+            if not found:
+                response = await db_app.flights.doAsync(("brewery", id), lambda: self.fetchBrewery(id))
+                db_app.brewery_cache.put(id, response)
+            if response == None:
+                await sendJson(send, {"error": f'{id}, invalid id'}, 400)
+                return
+            raw, count = response
+            await sendRaw(send, raw, cookie=await self.remember(scope, raw, count))
+        except Exception:
+            logging.exception("error getting brewery %s from API", id)
+            await sendJson(send, {"error": "error getting brewery from API"}, 502)
+
+    async def listBreweries(self, scope, send):
+        """
+        async version of db_app.list_breweries
+        """
+        args = dict(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True))
+        if args.get("all", "").lower() == "true":
+            await self.listAllBreweries(args, send)
+            return
+        try:
+            query_string = db_app.normalize_list_query(args)
+        except ValueError as error:
+            await sendJson(send, {"error": str(error)}, 400)
+            return
+
+        try:
+            raw, count = await asyncio.to_thread(db_app.local_breweries, query_string) or await self.cachedBreweries(query_string)
+            await sendRaw(send, raw, cookie=await self.remember(scope, raw, count))
+        except Exception:
+            logging.exception("error getting a list of breweries from API")
+            await sendJson(send, {"error": "error getting a list of breweries from API"})
+
+    async def listAllBreweries(self, args, send):
+        """
+        async version of db_app.list_all_breweries, every page is sent as NDJSON as soon as it
+        (and the pages before it) arrive, with up to FANOUT_CONCURRENCY pages in flight
+        and the truncation trailer after them if the matches do not fit in FANOUT_MAX_PAGES pages
+        """
+        args.pop("page", None)
+        args.pop("per_page", None)
+        try:
+            meta_query = db_app.fanout_meta_query(args)
+        except ValueError as error:
+            await sendJson(send, {"error": str(error)}, 400)
+            return
+        try:
+            key = f'meta?{meta_query}'
+            found, response = db_app.list_cache.lookup(key)
+            if not found:
+                response = await db_app.flights.doAsync(("meta", meta_query), lambda: self.fetchTotal(meta_query))
+                db_app.list_cache.put(key, response)
+            _, total = response
+        except Exception:
+            logging.exception("error getting a list of breweries from API")
+            await sendJson(send, {"error": "error getting a list of breweries from API"})
+            return
+
+        trailer = db_app.fanout_trailer(total)
+        headers = [(b"content-type", b"application/x-ndjson")]
+        if trailer != None:
+            headers.append((b"x-truncated", b"true"))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        pages = ordered_fanout_async(self.cachedBreweries, db_app.fanout_page_queries(args, total), Config.FANOUT_CONCURRENCY)
+        try:
+            async for raw, _ in pages:
+                await send({"type": "http.response.body", "body": db_app.ndjson_lines(raw), "more_body": True})
+            if trailer != None:
+                await send({"type": "http.response.body", "body": trailer, "more_body": True})
+        except Exception:
+            logging.exception("error getting a list of breweries from API")
+            await send({"type": "http.response.body", "more_body": True,
+                        "body": json.dumps({"error": "error getting a list of breweries from API"}).encode() + b"\n"})
+        finally:
+            await pages.aclose()
+        await send({"type": "http.response.body", "body": b""})
+
+    async def getRandom(self, scope, receive, send):
+        """
+        async version of db_app.get_random
+        filtered picks that need the api (the mirror is not complete) are passed to the flask app
+        """
+        args = dict(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True))
+        try:
+            size, filters = db_app.random_query(args)
+        except ValueError:
+            await sendJson(send, {"error": "size must be an integer"}, 400)
+            return
+
+        try:
+            response = await asyncio.to_thread(db_app.local_random, size, filters)
+            if response == None and filters:
+                await self.fallback(scope, receive, send)
+                return
+            if response == None:
+                raw = await self.fetchRaw(f'{db_app.BREWERY_API}/random?size={size}')
+                response = raw, len(json.loads(raw))
+            raw, count = response
+            await sendRaw(send, raw, cookie=await self.remember(scope, raw, count))
+        except Exception:
+            logging.exception("unable to get random brewery from API")
+            await sendJson(send, {"error": "unable to get random brewery from API"})
+
+
+#stores a response in the memory of a session
+def storeResponse(sid, new, raw, count):
+    db_app.memories.get(sid, new).add(raw, count)
+
+
+#sends a JSON response, with a set-cookie header if given one
+async def sendJson(send, body, status=200, cookie=None):
+    await sendRaw(send, json.dumps(body).encode(), status, cookie)
+
+
+#sends raw JSON bytes as a response, with a set-cookie header if given one
+async def sendRaw(send, payload, status=200, cookie=None):
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())]
+    if cookie is not None:
+        headers.append(cookie)
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": payload})
+
+
+app = BreweryProxy(WsgiToAsgi(db_app.app))
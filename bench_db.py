@@ -0,0 +1,107 @@
+"""
+benchmarks concurrent reads and writes against a users db with the default engine and the tuned one
+
+    python bench_db.py [--seconds 5] [--threads 16] [--writes 0.2]
+
+every thread loops over transactions for about seconds, a writes fraction of them insert
+a user and upsert a favorite (like create-account/add-favorite), the rest look a user up
+and read its favorites (like login/view-favorites), and prints the throughput of each engine
+and how many transactions failed with "database is locked"
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from database import create_db_engine
+
+SCHEMA = [
+    "CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username VARCHAR NOT NULL UNIQUE, "
+    "salt VARCHAR NOT NULL, hashed_password VARCHAR NOT NULL)",
+    "CREATE TABLE breweries (id VARCHAR PRIMARY KEY, data JSON NOT NULL)",
+    "CREATE TABLE favorites (user_id INTEGER, position INTEGER, brewery_id VARCHAR NOT NULL, PRIMARY KEY (user_id, position))",
+    "CREATE INDEX ix_favorites_brewery_user ON favorites (brewery_id, user_id)",
+]
+SEED_USERS = 1000
+
+
+#creates the schema in a new db file and fills it with users
+def seed(path):
+    engine = create_engine(f'sqlite:///{path}')
+    with engine.begin() as conn:
+        for statement in SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(text("INSERT INTO breweries (id, data) VALUES ('b1', '{}')"))
+        conn.execute(text("INSERT INTO users (username, salt, hashed_password) VALUES (:u, 'salt', 'hash')"),
+                     [{"u": f'seed{i}'} for i in range(SEED_USERS)])
+    engine.dispose()
+
+
+#runs the read/write mix from threads threads for about seconds, returns (transactions per second, locked errors)
+def run(engine, seconds, threads, writes):
+    counts = []
+    locked = []
+    deadline = time.perf_counter() + seconds
+
+    def worker(number):
+        rng = random.Random(number)
+        count = 0
+        errors = 0
+        while time.perf_counter() < deadline:
+            try:
+                if rng.random() < writes:
+                    with engine.begin() as conn:
+                        user_id = conn.execute(text("INSERT INTO users (username, salt, hashed_password) "
+                                                    "VALUES (:u, 'salt', 'hash') RETURNING id"),
+                                               {"u": f'{number}-{count}-{time.perf_counter_ns()}'}).scalar()
+                        conn.execute(text("INSERT INTO favorites (user_id, position, brewery_id) VALUES (:id, 1, 'b1') "
+                                          "ON CONFLICT (user_id, position) DO UPDATE SET brewery_id = excluded.brewery_id"),
+                                     {"id": user_id})
+                else:
+                    with engine.begin() as conn:
+                        user_id = conn.execute(text("SELECT id FROM users WHERE username = :u"),
+                                               {"u": f'seed{rng.randrange(SEED_USERS)}'}).scalar()
+                        conn.execute(text("SELECT position, brewery_id FROM favorites WHERE user_id = :id"),
+                                     {"id": user_id}).fetchall()
+                count += 1
+            except OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                errors += 1
+        counts.append(count)
+        locked.append(errors)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(number,)) for number in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    engine.dispose()
+    return sum(counts) / elapsed, sum(locked)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="benchmark the users db engine under concurrent reads and writes")
+    parser.add_argument("--seconds", type=float, default=5, help="seconds to run each engine")
+    parser.add_argument("--threads", type=int, default=16, help="concurrent request threads")
+    parser.add_argument("--writes", type=float, default=0.2, help="fraction of transactions that write")
+    args = parser.parse_args()
+
+    engines = [
+        ("default", lambda path: create_engine(f'sqlite:///{path}')),
+        ("tuned", lambda path: create_db_engine(f'sqlite:///{path}', poolSize=args.threads)),
+    ]
+    print(f'{"engine":<10} {"tx/s":>10} {"locked":>8}')
+    with tempfile.TemporaryDirectory() as directory:
+        for name, make_engine in engines:
+            path = os.path.join(directory, f'{name}.db')
+            seed(path)
+            rate, locked = run(make_engine(path), args.seconds, args.threads, args.writes)
+            print(f'{name:<10} {rate:>10.1f} {locked:>8}')
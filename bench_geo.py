@@ -0,0 +1,63 @@
+"""
+benchmarks by_dist nearest neighbour queries, the grid index against a full scan
+
+    python bench_geo.py [--queries 200] [--k 50] [--sizes 10000,100000,1000000]
+
+points are spread like breweries, mostly over the continental US with the rest anywhere,
+queries are random points over the US, far from it (other continents, the oceans) and near
+the poles, prints the build time of the index, microseconds per query of both for each kind
+of query and checks that they return the same distances
+"""
+import argparse
+import time
+
+import numpy as np
+
+from geo import GridIndex, nearest_of
+
+
+#n points, 90% in the continental US and 10% anywhere on earth
+def make_points(n, rng):
+    us = int(n * 0.9)
+    lats = np.r_[rng.uniform(25, 49, us), rng.uniform(-85, 85, n - us)]
+    lons = np.r_[rng.uniform(-124, -67, us), rng.uniform(-180, 180, n - us)]
+    return lats, lons
+
+
+#n query points of each kind, where most breweries are, far from them and near the poles
+def make_queries(n, rng):
+    far = np.c_[rng.uniform(-60, 70, n), rng.uniform(-30, 180, n)] #europe, africa, asia, oceania
+    polar = np.c_[rng.choice([-1, 1], n) * rng.uniform(85, 90, n), rng.uniform(-180, 180, n)]
+    return {
+        "us": np.c_[rng.uniform(25, 49, n), rng.uniform(-124, -67, n)],
+        "far": far,
+        "polar": polar,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="benchmark the by_dist grid index against a full scan")
+    parser.add_argument("--queries", type=int, default=200, help="queries per size")
+    parser.add_argument("--k", type=int, default=50, help="breweries per query (per_page)")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="comma separated numbers of points")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f'{"points":>9} {"queries":>8} {"build ms":>9} {"grid us/q":>10} {"scan us/q":>10} {"speedup":>8}')
+    for n in [int(size) for size in args.sizes.split(",")]:
+        lats, lons = make_points(n, rng)
+        start = time.perf_counter()
+        index = GridIndex(np.arange(n), lats, lons)
+        build = time.perf_counter() - start
+
+        for kind, queries in make_queries(args.queries, rng).items():
+            start = time.perf_counter()
+            grid = [index.nearest(lat, lon, args.k)[1] for lat, lon in queries]
+            gridTime = (time.perf_counter() - start) / len(queries)
+            start = time.perf_counter()
+            scan = [nearest_of(lat, lon, lats, lons, args.k)[1] for lat, lon in queries]
+            scanTime = (time.perf_counter() - start) / len(queries)
+
+            for gridDistances, scanDistances in zip(grid, scan):
+                assert np.allclose(gridDistances, scanDistances), "the grid index and the scan disagree"
+            print(f'{n:>9} {kind:>8} {build * 1000:>9.1f} {gridTime * 1e6:>10.1f} {scanTime * 1e6:>10.1f} {scanTime / gridTime:>8.1f}')
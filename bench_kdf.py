@@ -0,0 +1,74 @@
+"""
+benchmarks password hashing at each cost setting
+
+    python bench_kdf.py [--seconds 2] [--workers N]
+
+for every scheme/cost prints how many logins (one hash verification each) a single
+core can do per second, and the throughput of the PasswordHasher pool with N workers
+"""
+import argparse
+import os
+import threading
+import time
+
+from passwords import PasswordHasher
+
+SETTINGS = [
+    ("scrypt", (2 ** 13, 8, 1)),
+    ("scrypt", (2 ** 14, 8, 1)),
+    ("scrypt", (2 ** 15, 8, 1)),
+    ("pbkdf2_sha256", (100000,)),
+    ("pbkdf2_sha256", (310000,)),
+    ("pbkdf2_sha256", (600000,)),
+]
+
+
+#runs verify in a loop on the calling thread for about seconds, returns verifications per second
+def single_core(scheme, params, seconds):
+    hasher = PasswordHasher(scheme, params, 0, 1)
+    stored = hasher.hash("correct horse battery staple", "00" * 16)
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        hasher.verify("correct horse battery staple", stored, "")
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+#runs verify from 2 * workers request threads against the pool, returns verifications per second
+def pooled(scheme, params, seconds, workers):
+    hasher = PasswordHasher(scheme, params, workers, workers * 2)
+    stored = hasher.hash("correct horse battery staple", "00" * 16) #also starts the pool
+    counts = []
+    deadline = time.perf_counter() + seconds
+
+    def login_loop():
+        count = 0
+        while time.perf_counter() < deadline:
+            hasher.verify("correct horse battery staple", stored, "")
+            count += 1
+        counts.append(count)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=login_loop) for _ in range(workers * 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    hasher.close()
+    return sum(counts) / elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="benchmark password hashing cost settings")
+    parser.add_argument("--seconds", type=float, default=2, help="seconds to run each measurement")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="pool processes")
+    args = parser.parse_args()
+
+    print(f'{"scheme":<15} {"cost":<18} {"ms/hash":>8} {"logins/s/core":>14} {"pool logins/s":>14} {"pool/core":>10}')
+    for scheme, params in SETTINGS:
+        rate = single_core(scheme, params, args.seconds)
+        poolRate = pooled(scheme, params, args.seconds, args.workers)
+        cost = "/".join(str(param) for param in params)
+        print(f'{scheme:<15} {cost:<18} {1000 / rate:>8.1f} {rate:>14.1f} {poolRate:>14.1f} {poolRate / args.workers:>10.1f}')
@@ -0,0 +1,193 @@
+"""
+bulk import and export of accounts
+
+    python bulk_accounts.py import <file or -> [--format ndjson|csv] [--batch 1000]
+    python bulk_accounts.py export <file or -> [--format ndjson|csv]
+
+an import row has a username and either a password, hashed with the configured scheme,
+or the salt and hashed_password of an export, kept as is, and optionally favorite breweries
+    ndjson: {"username": "...", "password": "...", "favorites": {"1": {brewery}}} per line
+    csv: a header row with username,password (or username,salt,hashed_password) and optionally
+        favorite_brew_1..favorite_brew_5 columns holding the JSON of a brewery
+
+an export has the same layout, so it can be imported back as is, favorites included
+
+rows are read as a stream, hashed in parallel on the password pool and inserted
+batch by batch, one transaction per batch, rows that fail are reported by line
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+
+FORMATS = ["ndjson", "csv"]
+POSITIONS = range(1, 6)
+
+
+#yields (line number, row, None) for every row of an import, or (line number, None, error) if it can not be used
+def read_rows(lines, fmt):
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield (reader.line_num,) + check_row(row)
+        return
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield number, None, "invalid JSON"
+            continue
+        yield (number,) + check_row(row)
+
+
+#returns (row, None) for a usable import row, (None, error) otherwise
+def check_row(row):
+    if type(row) != dict:
+        return None, "row must be an object"
+    username = row.get("username")
+    if type(username) != str or not username:
+        return None, "username is required"
+    favorites, error = check_favorites(row)
+    if error:
+        return None, error
+    if row.get("password"):
+        return {"username": username, "password": str(row["password"]), "favorites": favorites}, None
+    if row.get("salt") and row.get("hashed_password"):
+        return {"username": username, "salt": str(row["salt"]), "hashed_password": str(row["hashed_password"]),
+                "favorites": favorites}, None
+    return None, "password (or salt and hashed_password) is required"
+
+
+#returns ({position: brewery}, None) for the favorites of an import row, (None, error) if they can not be used
+#they are the "favorites" object of an ndjson row, or the favorite_brew_<position> JSON columns of a csv row
+def check_favorites(row):
+    favorites = row.get("favorites")
+    if favorites == None:
+        favorites = {}
+        for position in POSITIONS:
+            value = row.get(f'favorite_brew_{position}')
+            if not value:
+                continue
+            try:
+                favorites[position] = json.loads(value) if type(value) == str else value
+            except ValueError:
+                return None, f'favorite_brew_{position} is not valid JSON'
+    if type(favorites) != dict:
+        return None, "favorites must be an object"
+    checked = {}
+    for position, brewery in favorites.items():
+        try:
+            position = int(position)
+        except (ValueError, TypeError):
+            position = None
+        if position not in POSITIONS or type(brewery) != dict or type(brewery.get("id")) != str or not brewery["id"]:
+            return None, "favorites must map positions 1-5 to breweries with an id"
+        checked[position] = brewery
+    return checked, None
+
+
+def import_users(repository, hasher, lines, fmt="ndjson", batchSize=1000):
+    """
+    creates the accounts in an NDJSON or CSV stream of lines
+
+    returns:
+        (number of accounts created, list of {"line", "username", "error"} for the rows that were not)
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f'unknown import format: {fmt}')
+    created = 0
+    errors = []
+    batch = []
+    for number, row, error in read_rows(lines, fmt):
+        if error:
+            errors.append({"line": number, "username": None, "error": error})
+            continue
+        batch.append((number, row))
+        if len(batch) >= batchSize:
+            created += import_batch(repository, hasher, batch, errors)
+            batch = []
+    created += import_batch(repository, hasher, batch, errors)
+    return created, errors
+
+
+#hashes and inserts a batch of (line number, row), adds the rows that failed to errors, returns the number created
+def import_batch(repository, hasher, batch, errors):
+    if not batch:
+        return 0
+    #usernames already taken are dropped before any hashing
+    existing = repository.existing({row["username"] for _, row in batch})
+    seen = set()
+    accepted = []
+    for number, row in batch:
+        username = row["username"]
+        if username in existing or username in seen:
+            errors.append({"line": number, "username": username, "error": "username already exists"})
+            continue
+        seen.add(username)
+        accepted.append((number, row))
+
+    plain = [row for _, row in accepted if "password" in row]
+    salts = [os.urandom(16).hex() for _ in plain]
+    for row, salt, hashed_password in zip(plain, salts, hasher.hashMany([row["password"] for row in plain], salts)):
+        row["salt"] = salt
+        row["hashed_password"] = hashed_password
+
+    inserted = repository.createMany([{"username": row["username"], "salt": row["salt"], "hashed_password": row["hashed_password"],
+                                       "favorites": row["favorites"]} for _, row in accepted])
+    for number, row in accepted:
+        if row["username"] not in inserted: #taken by another request since the check
+            errors.append({"line": number, "username": row["username"], "error": "username already exists"})
+    return len(inserted)
+
+
+def export_users(repository, fmt="ndjson"):
+    """
+    yields every account and its favorite breweries as NDJSON or CSV text, a line at a time
+    the export can be imported back as is, favorites included
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f'unknown export format: {fmt}')
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["username", "salt", "hashed_password"] + [f'favorite_brew_{position}' for position in POSITIONS])
+        for username, salt, hashed_password, favorites in repository.export():
+            writer.writerow([username, salt, hashed_password] +
+                            [json.dumps(favorites[position]) if position in favorites else "" for position in POSITIONS])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+        return
+    for username, salt, hashed_password, favorites in repository.export():
+        yield json.dumps({"username": username, "salt": salt, "hashed_password": hashed_password,
+                          "favorites": {str(position): brewery for position, brewery in favorites.items()}}) + "\n"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="bulk import or export accounts of users.db")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("path", help="file to read/write, - for stdin/stdout")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--batch", type=int, default=1000, help="accounts per transaction")
+    args = parser.parse_args()
+
+    import db_app
+
+    if args.command == "import":
+        source = sys.stdin if args.path == "-" else open(args.path, newline="", encoding="utf-8")
+        with source:
+            created, errors = import_users(db_app.users, db_app.hasher, source, args.format, args.batch)
+        for error in errors:
+            print(json.dumps(error), file=sys.stderr)
+        print(f'created {created} accounts, {len(errors)} rows failed')
+        db_app.hasher.close()
+    else:
+        target = sys.stdout if args.path == "-" else open(args.path, "w", newline="", encoding="utf-8")
+        with target:
+            for chunk in export_users(db_app.users, args.format):
+                target.write(chunk)
@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    a thread safe, size bounded LRU cache where every entry expires after a ttl
+
+    Attributes:
+        maxSize: the maximum total weight the cache can store
+        weigh: a function returning the weight of a value, 1 by default (so maxSize
+            is an entry count), ex. a byte size to give the cache a memory budget
+        ttl: the number of seconds a cached value stays fresh
+        negativeTtl: the number of seconds a cached None (ex. an invalid id) stays fresh
+        hits, misses, evictions, expirations: counters describing how the cache is doing
+    """
+
+    def __init__(self, maxSize, ttl, negativeTtl=None, weigh=None):
+        """
+        initializes an empty cache
+        negativeTtl defaults to ttl if not given
+        """
+        self.entries = OrderedDict() #key -> (expires at, weight, value), least recently used first
+        self.maxSize = maxSize
+        self.weigh = weigh if weigh is not None else (lambda value: 1)
+        self.size = 0 #total weight of the entries
+        self.ttl = ttl
+        self.negativeTtl = ttl if negativeTtl is None else negativeTtl
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def lookup(self, key):
+        """
+        looks up a fresh entry and marks it as recently used
+        expired entries are dropped on the way
+
+        returns:
+            (True, value) if a fresh entry exists, otherwise (False, None)
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires, weight, value = entry
+                if expires > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self.entries[key]
+                self.size -= weight
+                self.expirations += 1
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        """
+        stores a value under a key, evicting the least recently used entries if full
+        a value of None is stored with the negative ttl
+        values heavier than the whole cache are not stored
+        """
+        ttl = self.negativeTtl if value is None else self.ttl
+        weight = 1 if value is None else self.weigh(value)
+        if ttl <= 0 or weight > self.maxSize:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self.entries[key] = (time.monotonic() + ttl, weight, value)
+            self.size += weight
+            while self.size > self.maxSize:
+                _, (_, evictedWeight, _) = self.entries.popitem(last=False)
+                self.size -= evictedWeight
+                self.evictions += 1
+
+    def fetch(self, key, loader):
+        """
+        read-through lookup: returns the cached value for a key,
+        otherwise calls loader() and caches whatever it returns
+
+        loader should return None for values that do not exist upstream
+        so they get cached negatively, and raise for transient errors
+        so nothing gets cached
+
+        returns:
+            the cached or freshly loaded value
+        """
+        found, value = self.lookup(key)
+        if found:
+            return value
+        value = loader()
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        """
+        removes every entry, the counters are kept
+        """
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """
+        returns:
+            a dict of the size and counters of the cache
+        """
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "size": self.size,
+                "maxSize": self.maxSize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
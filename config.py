@@ -1,4 +1,87 @@
+import os
+
+
 class Config:
-    SQLALCHEMY_DATABASE_URI = "sqlite:///users.db"
+    SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", "sqlite:///users.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-   
\ No newline at end of file
+
+    #users.db connection pool, connections kept open, extra ones allowed under load and seconds to wait for one
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    #pragmas set on every users.db connection
+    DB_JOURNAL_MODE = os.getenv("DB_JOURNAL_MODE", "WAL")
+    DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+    DB_BUSY_TIMEOUT = int(os.getenv("DB_BUSY_TIMEOUT", 5000)) #milliseconds a writer waits for the lock
+    DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", 256 * 1024 * 1024)) #bytes
+    DB_CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", -16000)) #pages, or KiB if negative, per connection
+
+    #signs session cookies and tokens, set it so sessions survive restarts and are shared between workers
+    #required with MEMORY_BACKEND=sqlite, otherwise a random key is used (with a warning) while it is unset
+    SECRET_KEY = os.getenv("SECRET_KEY", "")
+
+    #number of recent api responses kept in memory per session
+    MEMORY_LIMIT = int(os.getenv("MEMORY_LIMIT", 1000))
+    #the most sessions kept at once, and how many seconds an unused session is kept
+    MEMORY_SESSIONS = int(os.getenv("MEMORY_SESSIONS", 1000))
+    MEMORY_IDLE_TIMEOUT = float(os.getenv("MEMORY_IDLE_TIMEOUT", 1800))
+    #the most sessions kept whose client has not sent the session cookie back yet (ex. clients ignoring cookies)
+    MEMORY_NEW_SESSIONS = int(os.getenv("MEMORY_NEW_SESSIONS", 100))
+    #the most bytes of responses kept in memory by the "local" backend, least recently used sessions are dropped past it
+    MEMORY_MAX_BYTES = int(os.getenv("MEMORY_MAX_BYTES", 64 * 1024 * 1024))
+    #"local" (per process) or "sqlite" (shared by every worker process using MEMORY_DB_PATH)
+    MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "local")
+    MEMORY_DB_PATH = os.getenv("MEMORY_DB_PATH", "memory.db")
+
+    #brewery-by-id cache
+    BREWERY_CACHE_SIZE = int(os.getenv("BREWERY_CACHE_SIZE", 1024))
+    BREWERY_CACHE_TTL = float(os.getenv("BREWERY_CACHE_TTL", 3600))
+    BREWERY_CACHE_NEGATIVE_TTL = float(os.getenv("BREWERY_CACHE_NEGATIVE_TTL", 300))
+
+    #list-breweries cache, bounded by the size of the cached responses in bytes
+    LIST_CACHE_BYTES = int(os.getenv("LIST_CACHE_BYTES", 32 * 1024 * 1024))
+    LIST_CACHE_TTL = float(os.getenv("LIST_CACHE_TTL", 300))
+    #local brewery mirror (see mirror.py), and how often (seconds, 0 to only sync from the cli) and how many pages a background sync pulls (0 for all)
+    MIRROR_DB_PATH = os.getenv("MIRROR_DB_PATH", "breweries.db")
+    MIRROR_SYNC_INTERVAL = float(os.getenv("MIRROR_SYNC_INTERVAL", 0))
+    MIRROR_SYNC_PAGES = int(os.getenv("MIRROR_SYNC_PAGES", 0))
+    #get-random, breweries prefetched from the api (0 to never prefetch) and how many are fetched at once
+    RANDOM_POOL_SIZE = int(os.getenv("RANDOM_POOL_SIZE", 200))
+    RANDOM_POOL_BATCH = int(os.getenv("RANDOM_POOL_BATCH", 50))
+    #filtered get-random without a complete mirror, how many random pages of matches the picks are drawn from
+    RANDOM_FILTERED_PAGES = int(os.getenv("RANDOM_FILTERED_PAGES", 2))
+    #list-breweries?all=true, threads fetching pages (for every request), pages fetched ahead per request and the most pages
+    FANOUT_WORKERS = int(os.getenv("FANOUT_WORKERS", 16))
+    FANOUT_CONCURRENCY = int(os.getenv("FANOUT_CONCURRENCY", 4))
+    FANOUT_MAX_PAGES = int(os.getenv("FANOUT_MAX_PAGES", 100))
+
+    #pooled http client for upstream apis
+    UPSTREAM_POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", 10))
+    UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", 2))
+    UPSTREAM_BACKOFF = float(os.getenv("UPSTREAM_BACKOFF", 0.2))
+    UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", 5))
+    UPSTREAM_HOST_TIMEOUTS = os.getenv("UPSTREAM_HOST_TIMEOUTS", "") #host=seconds,host=seconds
+
+    #asgi serving mode, the most upstream connections open at once
+    ASYNC_MAX_CONNECTIONS = int(os.getenv("ASYNC_MAX_CONNECTIONS", 500))
+
+    #password hashing, "scrypt" or "pbkdf2_sha256", and the cost of each
+    KDF_SCHEME = os.getenv("KDF_SCHEME", "scrypt")
+    KDF_SCRYPT_N = int(os.getenv("KDF_SCRYPT_N", 2 ** 14))
+    KDF_SCRYPT_R = int(os.getenv("KDF_SCRYPT_R", 8))
+    KDF_SCRYPT_P = int(os.getenv("KDF_SCRYPT_P", 1))
+    KDF_PBKDF2_ITERATIONS = int(os.getenv("KDF_PBKDF2_ITERATIONS", 600000))
+    #processes hashing passwords (0 hashes on the request thread) and how many hashes can wait for them
+    KDF_WORKERS = int(os.getenv("KDF_WORKERS", os.cpu_count() or 1))
+    KDF_MAX_PENDING = int(os.getenv("KDF_MAX_PENDING", 64))
+
+    #session tokens issued by /login, how long they are valid and how many verified tokens are remembered (and for how long)
+    TOKEN_TTL = int(os.getenv("TOKEN_TTL", 3600))
+    TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+    TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", 300))
+    #seconds a user's current credential version is cached, a token revoked by a password change or delete
+    #in another worker process is still accepted by this one for at most this long
+    TOKEN_CHECK_TTL = float(os.getenv("TOKEN_CHECK_TTL", 30))
+
+    #key for the bulk account routes (X-Admin-Key header), they are disabled while it is unset
+    ADMIN_KEY = os.getenv("ADMIN_KEY", "")
@@ -0,0 +1,2 @@
+#meal_max is its own project with its own tests, run them from the meal_max directory
+collect_ignore = ["meal_max"]
@@ -0,0 +1,54 @@
+from sqlalchemy import create_engine, event
+
+from config import Config
+
+JOURNAL_MODES = ["DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"]
+SYNCHRONOUS = ["OFF", "NORMAL", "FULL", "EXTRA"]
+
+
+#the pragmas set on every new sqlite connection, from the config by default
+def sqlite_pragmas(journalMode=None, synchronous=None, busyTimeout=None, mmapSize=None, cacheSize=None):
+    journalMode = (journalMode or Config.DB_JOURNAL_MODE).upper()
+    synchronous = (synchronous or Config.DB_SYNCHRONOUS).upper()
+    if journalMode not in JOURNAL_MODES:
+        raise ValueError(f'unknown sqlite journal mode: {journalMode}')
+    if synchronous not in SYNCHRONOUS:
+        raise ValueError(f'unknown sqlite synchronous setting: {synchronous}')
+    return {
+        "journal_mode": journalMode,
+        "synchronous": synchronous,
+        "busy_timeout": int(busyTimeout if busyTimeout is not None else Config.DB_BUSY_TIMEOUT),
+        "mmap_size": int(mmapSize if mmapSize is not None else Config.DB_MMAP_SIZE),
+        "cache_size": int(cacheSize if cacheSize is not None else Config.DB_CACHE_SIZE),
+    }
+
+
+def create_db_engine(url=None, poolSize=None, maxOverflow=None, poolTimeout=None, pragmas=None):
+    """
+    creates an engine for a sqlite database with its connection pool sized from the config
+
+    every connection the pool opens gets the pragmas (WAL, synchronous=NORMAL, busy_timeout,
+    mmap_size and cache_size by default) so readers do not block the writer, and a writer waits
+    busy_timeout ms for the lock instead of failing with "database is locked"
+
+    returns:
+        the engine
+    """
+    engine = create_engine(
+        url or Config.SQLALCHEMY_DATABASE_URI,
+        pool_size=poolSize if poolSize is not None else Config.DB_POOL_SIZE,
+        max_overflow=maxOverflow if maxOverflow is not None else Config.DB_MAX_OVERFLOW,
+        pool_timeout=poolTimeout if poolTimeout is not None else Config.DB_POOL_TIMEOUT,
+    )
+    pragmas = pragmas if pragmas is not None else sqlite_pragmas()
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+    return engine
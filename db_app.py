@@ -1,53 +1,298 @@
-from flask import Flask, request, jsonify
-from sqlalchemy import create_engine, Column, Integer, String, JSON
-from sqlalchemy.ext.declarative import declarative_base
+from flask import Flask, Response, request, jsonify, session as flask_session
+from sqlalchemy import func, text
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.orm import sessionmaker
-import hashlib
+import hmac
+import io
+import json
 import os
-import sqlite3
-import requests
 import logging
-from memory import Memory
+import math
+import random
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode
+from memory import Memory, MemoryStore, SQLiteMemoryStore
+from mirror import BreweryMirror, start_sync_thread
+from geo import parse_point
+from cache import TTLCache
+from config import Config
+from accounts import UserRepository
+from bulk_accounts import FORMATS, export_users, import_users
+from database import create_db_engine
+from models import Base, Brewery, Favorite, User
+from fanout import ordered_fanout
+from upstream import SingleFlight, UpstreamClient, parse_host_timeouts
+from passwords import PasswordHasher, configured_params
+from sampler import RandomPool
+from tokens import TokenSigner
 
 #logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+#secret key
+#every worker process has to sign with the same key, a random one only works for a single process
+SECRET_KEY = Config.SECRET_KEY
+if not SECRET_KEY:
+    if Config.MEMORY_BACKEND == "sqlite":
+        raise RuntimeError("SECRET_KEY must be set when MEMORY_BACKEND is sqlite, every worker needs the same key to read the session cookies")
+    logging.warning("SECRET_KEY is not set, using a random key: sessions and tokens will not survive a restart or work across workers")
+    SECRET_KEY = os.urandom(32).hex()
+
 #flask setup
 app = Flask(__name__)
+app.secret_key = SECRET_KEY #signs the session cookie that identifies a client's memory
 
 #db configuration
-DATABASE_URL = "sqlite:///users.db"
-engine = create_engine(DATABASE_URL)
-Base = declarative_base()
+#WAL with a pooled engine so reads do not block writes, see database.py and the DB_ settings of config.py
+DATABASE_URL = Config.SQLALCHEMY_DATABASE_URI
+engine = create_db_engine(DATABASE_URL)
 Session = sessionmaker(bind=engine)
 
+#password hashing
+#scrypt or pbkdf2 on a pool of KDF_WORKERS processes, older hashes are upgraded on login
+hasher = PasswordHasher(Config.KDF_SCHEME, configured_params(Config.KDF_SCHEME), Config.KDF_WORKERS, Config.KDF_MAX_PENDING)
+
+#session tokens
+#/login hands out a signed token so later requests are authenticated without a password hash
+#a token is bound to the password hash it was issued for, so changing the password or deleting the user revokes it
+tokens = TokenSigner(SECRET_KEY, Config.TOKEN_TTL, Config.TOKEN_CACHE_SIZE, Config.TOKEN_CACHE_TTL)
+#user id -> the credential version their tokens have to carry (None for a deleted user), kept for TOKEN_CHECK_TTL
+#so most requests skip the db, and replaced right away when this process changes a password or deletes a user
+credential_versions = TTLCache(Config.TOKEN_CACHE_SIZE, Config.TOKEN_CHECK_TTL)
+
 #memory
-#stores the most recent 10 successful api responses
-memory = Memory(10) 
-
-#user schema
-class User(Base):
-    __tablename__ = "users"
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    username = Column(String, unique=True, nullable=False)
-    salt = Column(String, nullable=False)
-    hashed_password = Column(String, nullable=False)
-    favorite_brew_1 = Column(JSON)
-    favorite_brew_2 = Column(JSON)
-    favorite_brew_3 = Column(JSON)
-    favorite_brew_4 = Column(JSON)
-    favorite_brew_5 = Column(JSON)
+#every session gets its own memory of its most recent successful api responses (MEMORY_LIMIT of them)
+#"local" keeps it in this process, "sqlite" shares it between every worker process through MEMORY_DB_PATH
+#a session is only started once a response has to be stored, and sessions whose client never sends
+#the cookie back are capped at MEMORY_NEW_SESSIONS so they can not push the others out
+if Config.MEMORY_BACKEND == "sqlite":
+    memories = SQLiteMemoryStore(Config.MEMORY_DB_PATH, Config.MEMORY_LIMIT, Config.MEMORY_SESSIONS, Config.MEMORY_IDLE_TIMEOUT,
+                                 maxNewSessions=Config.MEMORY_NEW_SESSIONS)
+else:
+    memories = MemoryStore(Config.MEMORY_LIMIT, Config.MEMORY_SESSIONS, Config.MEMORY_IDLE_TIMEOUT,
+                           Config.MEMORY_MAX_BYTES, Config.MEMORY_NEW_SESSIONS)
+
+#upstream
+BREWERY_API = "https://api.openbrewerydb.org/v1/breweries"
+#pooled keep-alive client for the open brewery db api
+upstream = UpstreamClient(Config.UPSTREAM_POOL_SIZE, Config.UPSTREAM_RETRIES, Config.UPSTREAM_BACKOFF,
+                          Config.UPSTREAM_TIMEOUT, parse_host_timeouts(Config.UPSTREAM_HOST_TIMEOUTS))
+#concurrent identical upstream fetches share one call
+flights = SingleFlight()
+#random breweries prefetched for get-random while the mirror is not complete (the api gives at most 50 at once)
+random_pool = RandomPool(lambda size: upstream.get(f'{BREWERY_API}/random?size={size}').content,
+                         Config.RANDOM_POOL_SIZE, Config.RANDOM_POOL_BATCH)
+
+#local brewery mirror
+#once it holds the whole dataset the brewery routes are answered from it, the api is only the fallback
+mirror = BreweryMirror(Config.MIRROR_DB_PATH)
+
+#cache
+#both caches hold (raw JSON bytes, number of breweries) so hits are sent without re-serializing
+#brewery-by-id lookups, invalid ids are cached as None for a shorter ttl
+brewery_cache = TTLCache(Config.BREWERY_CACHE_SIZE, Config.BREWERY_CACHE_TTL, Config.BREWERY_CACHE_NEGATIVE_TTL)
+#list-breweries pages, keyed on the normalized query string and bounded by their size in bytes
+list_cache = TTLCache(Config.LIST_CACHE_BYTES, Config.LIST_CACHE_TTL, weigh=lambda response: len(response[0]))
+
+#queries accepted by list-breweries and the defaults the api uses for paging
+LIST_QUERIES = ["by_city", "by_country", "by_dist", "by_ids", "by_name", "by_state", "by_postal", "by_type", "page", "per_page", "sort"]
+LIST_DEFAULTS = {"page": "1", "per_page": "50"}
+MAX_PER_PAGE = 200
+#get-random, the most breweries at once and the list-breweries filters it can pick among
+MAX_RANDOM = 50
+RANDOM_FILTERS = ["by_city", "by_country", "by_ids", "by_name", "by_postal", "by_state", "by_type"]
+#import-users, the most accounts per transaction (and per hashMany call)
+MAX_IMPORT_BATCH = 1000
+
+#list-breweries?all=true fetches every page on a shared pool, up to FANOUT_CONCURRENCY pages at once per request
+fanout_pool = ThreadPoolExecutor(max_workers=Config.FANOUT_WORKERS)
 
 #create db
 Base.metadata.create_all(engine)
 
+#account queries (logins, sign ups, password changes, deletes)
+users = UserRepository(engine, User.__table__, Favorite.__table__, Brewery.__table__)
+
 #helper functions
-#hashes a password according to a salt
-def hash_pwd(pwd, salt):
-    return hashlib.sha256((pwd + salt).encode()).hexdigest()
 #generates a salt
 def gen_salt():
     return os.urandom(16).hex()
+#gets the memory of the session making the request to store a response in, starting a session if there is none
+def session_memory():
+    new = "sid" not in flask_session
+    if new:
+        flask_session["sid"] = gen_salt()
+    return memories.get(flask_session["sid"], new)
+#gets the memory of the session making the request to read, an empty one (without starting a session) if there is none
+def read_session_memory():
+    sid = flask_session.get("sid")
+    if sid == None:
+        return Memory(Config.MEMORY_LIMIT)
+    return memories.peek(sid)
+#gets the credential version the tokens of a user have to carry, None if the user does not exist
+def credential_version(user_id):
+    def load():
+        hashed_password = users.passwordHash(user_id)
+        return tokens.version(hashed_password) if hashed_password != None else None
+    return credential_versions.fetch(user_id, load)
+#gets the user a request is for as (user id, username, None), or (None, None, error response)
+#a bearer token is verified with its signature and the user's current credential version (usually cached),
+#otherwise the username in the JSON body is looked up
+def request_user():
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        user = tokens.verify(header[len("Bearer "):].strip())
+        if user == None or credential_version(user[0]) != user[2]:
+            return None, None, (jsonify({"error": "invalid or expired token"}), 401)
+        return user[0], user[1], None
+    username = (request.get_json(silent=True) or {}).get('username')
+    if not username:
+        return None, None, (jsonify({"error": "username is required."}), 400)
+    user_id = users.userId(username)
+    if user_id == None: #user doesnt exist
+        return None, None, (jsonify({"error": "username does not exist"}), 400)
+    return user_id, username, None
+#checks the X-Admin-Key header of the request against ADMIN_KEY, bulk account routes are off while it is unset
+def is_admin():
+    key = request.headers.get("X-Admin-Key", "")
+    return bool(Config.ADMIN_KEY) and hmac.compare_digest(key.encode(), Config.ADMIN_KEY.encode())
+#gets a brewery from the api as (raw JSON bytes, 1), None if the id is invalid (a 404, cached negatively)
+#any other error status (429, 5xx left after the retries) raises so nothing gets cached
+#a valid brewery is also added to the mirror when it is kept in sync (see mirror_synced)
+def fetch_brewery(id):
+    response = upstream.get(f'{BREWERY_API}/{id}')
+    if response.status_code == 404: #invalid id
+        return None
+    response.raise_for_status()
+    brewery = json.loads(response.content)
+    if mirror_synced():
+        mirror.add([brewery])
+    return response.content, 1
+#True if the background sync runs, so breweries added to the mirror outside of it get refreshed
+#(or deleted) by its next pass, otherwise they would be served from the mirror forever
+def mirror_synced():
+    return Config.MIRROR_SYNC_INTERVAL > 0
+#gets a page of breweries from the api for a normalized query string as (raw JSON bytes, number of breweries)
+def fetch_breweries(query_string):
+    raw = upstream.get(f'{BREWERY_API}?{query_string}').content
+    response = json.loads(raw)
+    if type(response) != list: #the api rejected the query
+        raise ValueError(response)
+    return raw, len(response)
+#gets the meta (raw JSON bytes, total number of breweries) of a query string of filters from the api
+def fetch_total(meta_query):
+    raw = upstream.get(f'{BREWERY_API}/meta?{meta_query}').content
+    return raw, int(json.loads(raw)["total"])
+#gets the number of breweries matching a query string of filters (see fanout_meta_query) through the cache
+def cached_total(meta_query):
+    _, total = list_cache.fetch(f'meta?{meta_query}', lambda: flights.do(("meta", meta_query), lambda: fetch_total(meta_query)))
+    return total
+#gets a page of breweries for a normalized query string through the cache
+def cached_breweries(query_string):
+    return list_cache.fetch(query_string, lambda: flights.do(("list", query_string), lambda: fetch_breweries(query_string)))
+#gets a brewery from the mirror as raw JSON bytes, None if the mirror is not complete yet or does not have it
+def local_brewery(id):
+    if not mirror.ready():
+        return None
+    return mirror.get(id)
+#gets a page of breweries for a normalized query string from the mirror as (raw JSON bytes, number of breweries)
+#None if the mirror is not complete yet or can not answer the query
+def local_breweries(query_string):
+    if not mirror.ready():
+        return None
+    return mirror.page(dict(parse_qsl(query_string)))
+#gets a page of breweries from the api for the mirror sync
+def fetch_mirror_page(page, per_page):
+    raw, _ = fetch_breweries(urlencode([("page", page), ("per_page", per_page)]))
+    return json.loads(raw)
+#sends raw JSON bytes as a response
+def json_response(raw, status=200):
+    return Response(raw, status, mimetype="application/json")
+#turns list-breweries queries into a canonical query string
+#unknown/empty queries are dropped, paging defaults are filled in and per_page is clamped
+#so queries that mean the same thing share a cache entry
+#raises ValueError if page or per_page is not an integer or by_dist is not a point
+def normalize_list_query(args):
+    queries = {}
+    for key in LIST_QUERIES:
+        value = args.get(key)
+        if value != None and value.strip() != "":
+            queries[key] = value.strip()
+    for key in LIST_DEFAULTS:
+        queries.setdefault(key, LIST_DEFAULTS[key])
+    try:
+        page = int(queries["page"])
+        per_page = int(queries["per_page"])
+    except ValueError:
+        raise ValueError("page and per_page must be integers")
+    if "by_dist" in queries:
+        parse_point(queries["by_dist"])
+    queries["page"] = str(max(page, 1))
+    queries["per_page"] = str(min(max(per_page, 1), MAX_PER_PAGE))
+    return urlencode(sorted(queries.items()))
+#the filters of a list-breweries query as the query string of the api's meta endpoint (which counts the matches)
+#raises ValueError like normalize_list_query
+def fanout_meta_query(args):
+    queries = parse_qsl(normalize_list_query(args))
+    return urlencode([(key, value) for key, value in queries if key not in LIST_DEFAULTS and key != "sort"])
+#the normalized query strings of every page of a list-breweries query with total matches
+#pages are as large as the api allows and there are at most FANOUT_MAX_PAGES of them (see fanout_trailer)
+def fanout_page_queries(args, total):
+    pages = min(math.ceil(total / MAX_PER_PAGE), Config.FANOUT_MAX_PAGES)
+    for page in range(1, pages + 1):
+        yield normalize_list_query({**args, "page": str(page), "per_page": str(MAX_PER_PAGE)})
+#the last NDJSON line of a list-breweries?all=true stream when there are more than FANOUT_MAX_PAGES pages of matches,
+#so a client can tell the stream stopped early, None if every match is sent
+def fanout_trailer(total):
+    limit = Config.FANOUT_MAX_PAGES * MAX_PER_PAGE
+    if total <= limit:
+        return None
+    return json.dumps({"truncated": True, "total": total, "sent": limit}).encode() + b"\n"
+#the (size, filters) of a get-random request, raises ValueError if size is not an integer
+def random_query(args):
+    size = min(max(int(args.get("size", 1)), 1), MAX_RANDOM)
+    return size, {key: args[key] for key in RANDOM_FILTERS if args.get(key)}
+#gets random breweries without asking the api, from the mirror or the prefetched pool
+#returns (raw JSON list, number of breweries), None if the api has to be asked
+def local_random(size, filters):
+    if mirror.ready():
+        return mirror.sample(filters, size)
+    if not filters:
+        raw = random_pool.take(size)
+        if raw != None:
+            return raw, size
+    return None
+#gets random breweries matching filters from the api, picked among the breweries of up to RANDOM_FILTERED_PAGES
+#full pages of matches at random page numbers, the count and the pages go through the list cache
+#so a request costs at most 1 + RANDOM_FILTERED_PAGES api calls, and none while they are cached
+def fetch_random_filtered(size, filters):
+    total = cached_total(fanout_meta_query(filters))
+    pages = math.ceil(total / MAX_PER_PAGE)
+    queries = [normalize_list_query({**filters, "page": str(page), "per_page": str(MAX_PER_PAGE)})
+               for page in random.sample(range(1, pages + 1), min(max(Config.RANDOM_FILTERED_PAGES, 1), pages))]
+    pages = ordered_fanout(fanout_pool, cached_breweries, queries, Config.FANOUT_CONCURRENCY)
+    breweries = [brewery for raw, _ in pages for brewery in json.loads(raw)]
+    breweries = random.sample(breweries, min(size, len(breweries)))
+    return json.dumps(breweries).encode(), len(breweries)
+#turns a raw JSON list of breweries into NDJSON, a brewery per line
+def ndjson_lines(raw):
+    return b"".join(json.dumps(brewery).encode() + b"\n" for brewery in json.loads(raw))
+#yields every page of breweries as NDJSON, fetching up to FANOUT_CONCURRENCY pages ahead of the client, then the trailer if any
+#if a page fails, a last {"error": ...} line is sent instead of the rest
+def stream_breweries(page_queries, trailer=None):
+    try:
+        for raw, _ in ordered_fanout(fanout_pool, cached_breweries, page_queries, Config.FANOUT_CONCURRENCY):
+            yield ndjson_lines(raw)
+    except Exception:
+        logging.exception("error getting a list of breweries from API")
+        yield json.dumps({"error": "error getting a list of breweries from API"}).encode() + b"\n"
+        return
+    if trailer != None:
+        yield trailer
+
+#keeps the mirror in sync in the background, MIRROR_SYNC_PAGES pages every MIRROR_SYNC_INTERVAL seconds
+if Config.MIRROR_SYNC_INTERVAL > 0:
+    start_sync_thread(mirror, fetch_mirror_page, Config.MIRROR_SYNC_INTERVAL, Config.MIRROR_SYNC_PAGES or None)
 
 #home page for front end (if we get there)
 @app.route('/', methods=['POST','GET'])
@@ -152,7 +397,8 @@ def login():
         - password (str): the password to be matched with the hashed password
     
     returns:
-        JSON response indicating the status of logging in or any errors with inputs
+        JSON response indicating the status of logging in (with a session token for
+        the Authorization: Bearer header) or any errors with inputs
     """
     data = request.json
     username = data.get('username')
@@ -160,22 +406,26 @@ def login():
     #if either field is left blank, return BAD REQUEST response 
     if not username or not password:
         return jsonify({"error": "Username and password are required."}), 400
-    session = Session()
     try:
-        #if user already exists, return CONFLICT response
-        user = session.query(User).filter_by(username=username).first()
+        user = users.credentials(username)
         if not user:
             return jsonify({"error": "Invalid username."}), 401
+        user_id, salt, hashed_password = user
 
-        hashed_pwd = hash_pwd(password, user.salt)
-        if hashed_pwd == user.hashed_password :
-            return jsonify({"message": "Login successful."}), 200
-        else:
+        if not hasher.verify(password, hashed_password, salt):
             return jsonify({"error": "Invalid password."}), 401
+
+        #the password is known now, so a hash with an old scheme or cost can be upgraded
+        #(which revokes the older tokens of the user, like any change of the hash)
+        if hasher.needsRehash(hashed_password):
+            new_salt = gen_salt()
+            new_hash = hasher.hash(password, new_salt)
+            if users.setPassword(user_id, hashed_password, new_salt, new_hash):
+                hashed_password = new_hash
+                credential_versions.put(user_id, tokens.version(new_hash))
+        return jsonify({"message": "Login successful.", "token": tokens.issue(user_id, username, hashed_password)}), 200
     except:
         return jsonify({"error": "error interacting with the db"}), 400
-    finally:
-        session.close()
 
 @app.route('/create-account', methods=['POST'])
 def create_account():
@@ -196,22 +446,16 @@ def create_account():
     #if either field is left blank, return BAD REQUEST response 
     if not username or not password:
         return jsonify({"error": "Username and password are required."}), 400
-    session = Session()
     try:
-        #if user already exists, return CONFLICT response
-        if session.query(User).filter_by(username=username).first():
-            return jsonify({"error": "Username already exists."}), 409
         salt = gen_salt()
-        hashed_pwd = hash_pwd(password, salt)
-        new_user = User(username = username, salt=salt,  hashed_password= hashed_pwd)
-        session.add(new_user)
-        session.commit()
+        hashed_pwd = hasher.hash(password, salt)
+        #if user already exists, nothing is inserted, return CONFLICT response
+        if users.create(username, salt, hashed_pwd) == None:
+            return jsonify({"error": "Username already exists."}), 409
         #if committed, return CREATED response
         return jsonify({"message": "Account created successfully!"}), 201
     except:
         return jsonify({"error": "error interacting with the db"}), 400
-    finally:
-        session.close()
 
 
 @app.route('/update-password', methods=['POST'])
@@ -234,31 +478,28 @@ def update_password():
     newPassword = data.get('newPassword')
     if not username or not oldPassword or not newPassword:
         return jsonify({"error": "Username, old password, and new password are required."}), 400
-    
-    session = Session()
+    if oldPassword == newPassword: #old and new password are equal, checked first so nothing is hashed
+        return jsonify({"error": "new password must not be the same as old password"}), 400
+
     try:
-        user = session.query(User).filter_by(username=username).first()
+        user = users.credentials(username)
 
         if user == None: #user doesnt exist
             return jsonify({"error": "username does not exist"}), 400
-        
-        hash_old_pwd = hash_pwd(oldPassword, user.salt)
-        hash_new_pwd = hash_pwd(newPassword, user.salt)
+        user_id, salt, hashed_password = user
 
-        if hash_old_pwd != user.hashed_password: #old password does not match password in db
+        if not hasher.verify(oldPassword, hashed_password, salt): #old password does not match password in db
             return jsonify({"error": "incorrect old password"}), 400
 
-        if hash_old_pwd == hash_new_pwd: #old and new password are equal
-            return jsonify({"error": "new password must not be the same as old password"}), 400
-
-        #user exists, old password is correct, and new password is unique -> change password
-        user.hashed_password = hash_pwd(newPassword, user.salt)
-        session.commit()
+        #user exists, old password is correct, and new password is unique -> change password (revoking every token)
+        new_salt = gen_salt()
+        new_hash = hasher.hash(newPassword, new_salt)
+        if not users.setPassword(user_id, hashed_password, new_salt, new_hash):
+            return jsonify({"error": "password was changed by another request"}), 409
+        credential_versions.put(user_id, tokens.version(new_hash))
         return jsonify({"message": "password updated successfully"}), 200
     except:
         return jsonify({"error": "error interacting with the db"}), 400
-    finally:
-        session.close()
 
 @app.route('/delete-user', methods=['DELETE'])
 def delete_user():
@@ -277,24 +518,81 @@ def delete_user():
     password = data.get('password')
     if not username or not password:
         return jsonify({"error": "Username and password are required."}), 400
-    session = Session()
     try:
-        user = session.query(User).filter_by(username=username).first()
+        user = users.credentials(username)
 
         if user == None: #user doesnt exist
             return jsonify({"error": "username does not exist"}), 400
-        
-        if hash_pwd(password, user.salt) != user.hashed_password: #password does not match password in db
+        user_id, salt, hashed_password = user
+
+        if not hasher.verify(password, hashed_password, salt): #password does not match password in db
             return jsonify({"error": "incorrect password"}), 400
 
-        #user exists and password is correct -> delete user
-        user = session.query(User).filter_by(username=username).delete()
-        session.commit()
+        #user exists and password is correct -> delete user and their favorites (revoking every token)
+        if not users.delete(user_id, hashed_password):
+            return jsonify({"error": "password was changed by another request"}), 409
+        credential_versions.put(user_id, None)
         return jsonify({"message": "user successfully deleted"}), 200
     except:
         return jsonify({"error": "error interacting with the db"}), 400
-    finally:
-        session.close()
+
+@app.route('/import-users', methods=['POST'])
+def import_users_route():
+    """
+    creates accounts in bulk from an NDJSON or CSV body, read as a stream
+    passwords are hashed in parallel and accounts are inserted in batched transactions
+
+    expected header:
+        - X-Admin-Key : the ADMIN_KEY of the server
+
+    query parameters:
+        - format (str) : "ndjson" (default) or "csv", see bulk_accounts.py for the rows
+        - batch (int) : accounts per transaction, 1000 by default (and at most)
+
+    returns:
+        JSON response with the number of accounts created and an error for every row that was not
+    """
+    if not is_admin():
+        return jsonify({"error": "admin key required"}), 403
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in FORMATS:
+        return jsonify({"error": f'format must be one of {FORMATS}'}), 400
+    try:
+        batch = int(request.args.get("batch", MAX_IMPORT_BATCH))
+    except ValueError:
+        return jsonify({"error": "batch must be an integer"}), 400
+    if batch > MAX_IMPORT_BATCH:
+        return jsonify({"error": f'batch must be at most {MAX_IMPORT_BATCH}'}), 400
+
+    try:
+        lines = io.TextIOWrapper(request.stream, encoding="utf-8", newline="")
+        created, errors = import_users(users, hasher, lines, fmt, max(batch, 1))
+        return jsonify({"created": created, "errors": errors}), 200
+    except:
+        return jsonify({"error": "error interacting with the db"}), 400
+
+@app.route('/export-users', methods=['GET'])
+def export_users_route():
+    """
+    streams every account (salt and hash included) with its favorite breweries
+    rows are read from the db in batches as they are sent, the output can be imported back as is (favorites included)
+
+    expected header:
+        - X-Admin-Key : the ADMIN_KEY of the server
+
+    query parameters:
+        - format (str) : "ndjson" (default) or "csv"
+
+    returns:
+        NDJSON or CSV response of the accounts
+    """
+    if not is_admin():
+        return jsonify({"error": "admin key required"}), 403
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in FORMATS:
+        return jsonify({"error": f'format must be one of {FORMATS}'}), 400
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(export_users(users, fmt), 200, mimetype=mimetype)
 
 ##########################################
 # requirement: functionality 
@@ -320,9 +618,10 @@ def db_check():
         JSON response indicating the status of the database
     """
     try:
-        connection = sqlite3.connect(DATABASE_URL)
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
         return jsonify({"message": "db is connected!"}), 200
-    except sqlite3.Error as e:
+    except Exception as e:
         return jsonify({"error": f'{e}'}), 500
 
 
@@ -332,11 +631,12 @@ def clear_favorite(position = int):
     clears a specified favorite brew position for a user
 
     path parameter
-        - position (int) : the position # of the favorite brew column of the user
+        - position (int) : the position # of the favorite brewery of the user
             that will get reset
 
-    expected JSON input:
-        - username (str) : the username in the database who will have its favorite brewery removed
+    expected header (or JSON input):
+        - Authorization: Bearer <token> : the session token from /login of the user who will have its favorite brewery removed
+        - username (str) : without a token, the username in the database who will have its favorite brewery removed
 
     returns:
         JSON response idicating a successful clearing of the favorite or errors with input/parameter
@@ -344,26 +644,13 @@ def clear_favorite(position = int):
     if not (1 <= position <= 5) :
         return jsonify({"error": "position must be within [1,5]"}), 500
 
-    data = request.json
-    username = data.get('username')
-    if not username:
-        return jsonify({"error": "username is required."}), 400
-
     session = Session()
     try:
-        user = session.query(User).filter_by(username=username).first()
-        
-        match position:
-            case 1:
-                user.favorite_brew_1 = None
-            case 2:
-                user.favorite_brew_2 = None
-            case 3:
-                user.favorite_brew_3 = None
-            case 4:
-                user.favorite_brew_4 = None
-            case 5:
-                user.favorite_brew_5 = None
+        user_id, _, error = request_user()
+        if error:
+            return error
+
+        session.query(Favorite).filter_by(user_id=user_id, position=position).delete()
         session.commit()
         return jsonify({"message": f'successfully cleared favorite brewery {position}'}), 200
     except:
@@ -383,24 +670,31 @@ def get_brewery(id: str):
         JSON response of the details of the brewery (if valid id) or errors with input/parameter
     """
     try:
-        response = requests.get(f'https://api.openbrewerydb.org/v1/breweries/{id}').json()
-        if "message" in response: #invalid id
+        raw = local_brewery(id)
+        if raw != None:
+            session_memory().add(raw, 1)
+            return json_response(raw)
+
+        response = brewery_cache.fetch(id, lambda: flights.do(("brewery", id), lambda: fetch_brewery(id)))
+        if response == None: #invalid id
             return jsonify({"error": f'{id}, invalid id'}), 400
-        memory.add(response)
-        return response, 200
+        raw, count = response
+        session_memory().add(raw, count)
+        return json_response(raw)
     except:
-        return jsonify({"error": "error getting brewery from API"})
+        return jsonify({"error": "error getting brewery from API"}), 502
 
 @app.route('/add-favorite/<int:position>', methods=['PUT'])
 def add_favorite(position: int):
     """
-    adds the most recent singular brewery from memory at a position for the user in the database
+    adds the most recent singular brewery from the session's memory at a position for the user in the database
 
     path parameter:
-        - position (int) : the position # of the favorite brew column that will be updated
+        - position (int) : the position # of the favorite brewery that will be updated
 
-    expected JSON input:
-        - username (str) : the username in the database who will have a favorite brewery added/updated 
+    expected header (or JSON input):
+        - Authorization: Bearer <token> : the session token from /login of the user who will have a favorite brewery added/updated
+        - username (str) : without a token, the username in the database who will have a favorite brewery added/updated
 
     returns:
         JSON response idicating a successful adding of the brewery to the favorite or errors with input/parameter
@@ -408,30 +702,22 @@ def add_favorite(position: int):
     if not (1 <= position <= 5) :
         return jsonify({"error": "position must be within [1,5] inclusive"}), 500
 
-    brewery = memory.getRecent()
+    brewery = read_session_memory().getRecent()
     if brewery == None:
         return jsonify({"error": "there is no singular brewery in memory"})
 
-    data = request.json
-    username = data.get('username')
-    if not username:
-        return jsonify({"error": "username is required."}), 400
-
     session = Session()
     try:
-        user = session.query(User).filter_by(username=username).first()
-
-        match position:
-            case 1:
-                user.favorite_brew_1 = brewery
-            case 2:
-                user.favorite_brew_2 = brewery
-            case 3:
-                user.favorite_brew_3 = brewery
-            case 4:
-                user.favorite_brew_4 = brewery
-            case 5:
-                user.favorite_brew_5 = brewery
+        user_id, _, error = request_user()
+        if error:
+            return error
+
+        #store the brewery once (refreshing it if it is already stored), then point the position at it
+        brewery = brewery[0]
+        session.execute(insert(Brewery).values(id=brewery["id"], data=brewery)
+                        .on_conflict_do_update(index_elements=[Brewery.id], set_={"data": brewery}))
+        session.execute(insert(Favorite).values(user_id=user_id, position=position, brewery_id=brewery["id"])
+                        .on_conflict_do_update(index_elements=[Favorite.user_id, Favorite.position], set_={"brewery_id": brewery["id"]}))
         session.commit()
         return jsonify({"message": f'successfully updated favorite brewery {position}'}), 200
     except:
@@ -446,92 +732,199 @@ def list_breweries():
     
     queries:
         - see https://www.openbrewerydb.org/documentation#list-breweries for information
+        - all (bool) : "true" to get every matching brewery instead of a page, streamed as NDJSON
+            while the pages are fetched (concurrently), page and per_page are ignored
+            and the breweries are not added to the memory
+            at most FANOUT_MAX_PAGES pages are sent, past that the response has an X-Truncated: true
+            header and ends with a {"truncated": true, "total": ..., "sent": ...} line
 
     returns:
         JSON response containing a list of breweries according to the queries
     """
-    queries = {
-        "by_city" : request.args.get('by_city'),
-        "by_country" : request.args.get('by_country'),
-        "by_dist" : request.args.get('by_dist'),
-        "by_ids" : request.args.get('by_ids'),
-        "by_name" : request.args.get('by_name'),
-        "by_state" : request.args.get('by_state'),
-        "by_postal" : request.args.get('by_postal'),
-        "by_type" : request.args.get('by_type'),
-        "page" : request.args.get('page'),
-        "per_page" : request.args.get('per_page'),
-        "sort" : request.args.get('sort')
-    }
-
-    query_string = "?"
-    for key in queries:
-        if queries[key] != None:
-            query_string += f'{key}={queries[key]}&'
-    
+    if request.args.get("all", "").lower() == "true":
+        return list_all_breweries(request.args.to_dict())
+
+    try:
+        query_string = normalize_list_query(request.args)
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
     try:
-        response = requests.get(f'https://api.openbrewerydb.org/v1/breweries{query_string}').json()
-        memory.add(response)
-        return response, 200
+        raw, count = local_breweries(query_string) or cached_breweries(query_string)
+        session_memory().add(raw, count)
+        return json_response(raw)
     except:
         return jsonify({"error": "error getting a list of breweries from API"})
 
+#list-breweries?all=true
+def list_all_breweries(args):
+    args.pop("page", None)
+    args.pop("per_page", None)
+    try:
+        meta_query = fanout_meta_query(args)
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    try:
+        total = cached_total(meta_query)
+    except:
+        return jsonify({"error": "error getting a list of breweries from API"})
+    trailer = fanout_trailer(total)
+    headers = {"X-Truncated": "true"} if trailer != None else {}
+    return Response(stream_breweries(fanout_page_queries(args, total), trailer), 200, headers, mimetype="application/x-ndjson")
+
 @app.route('/view-favorites', methods=['GET'])
 def view_favorites():
     """
     gets the users favorite breweries
 
-    expected JSON input:
-        - username (str) : the user in the database whos favorite breweries will be returned
+    expected header (or JSON input):
+        - Authorization: Bearer <token> : the session token from /login of the user whos favorite breweries will be returned
+        - username (str) : without a token, the user in the database whos favorite breweries will be returned
 
     returns:
         JSON response containing the users favorite breweries or errors with parameters
     """
-    data = request.json
-    username = data.get('username')
-    if not username:
-        return jsonify({"error": "username required"}), 400
-    
     session = Session()
     try:
-        user = session.query(User).filter_by(username=username).first()
-        
-        user_dict = vars(user)
-        favorite_brews_dict = {}
-
-        for key in user_dict:
-            if "favorite_brew" in key:
-                favorite_brews_dict[key] = user_dict[key]
-        
-        return jsonify({user.username: favorite_brews_dict}), 200
+        user_id, username, error = request_user()
+        if error:
+            return error
+
+        favorites = (session.query(Favorite.position, Brewery.data)
+                     .join(Brewery, Favorite.brewery_id == Brewery.id)
+                     .filter(Favorite.user_id == user_id).all())
+
+        #same shape as before favorites were normalized, every position with its brewery (in a list) or None
+        favorite_brews_dict = {f'favorite_brew_{position}': None for position in range(1, 6)}
+        for position, brewery in favorites:
+            favorite_brews_dict[f'favorite_brew_{position}'] = [brewery]
+
+        return jsonify({username: favorite_brews_dict}), 200
     except:
         return jsonify({"error": "error interacting or traversing with the db"}), 400
     finally:
         session.close()
 
+@app.route('/most-favorited', methods=['GET'])
+def most_favorited():
+    """
+    gets the breweries that are favorites of the most users
+
+    queries:
+        - limit (int) : how many breweries to return, 10 by default
+
+    returns:
+        JSON response containing the breweries and how many users favorited each, most favorited first
+    """
+    limit = request.args.get('limit', 10, type=int)
+    session = Session()
+    try:
+        favorites = func.count(Favorite.user_id.distinct()).label("favorites")
+        #counted off the brewery_id index, then joined to only the top breweries
+        top = (session.query(Favorite.brewery_id, favorites)
+               .group_by(Favorite.brewery_id)
+               .order_by(favorites.desc())
+               .limit(limit).subquery())
+        rows = (session.query(Brewery.data, top.c.favorites)
+                .join(top, Brewery.id == top.c.brewery_id)
+                .order_by(top.c.favorites.desc()).all())
+        return jsonify({"breweries": [{"brewery": brewery, "favorites": count} for brewery, count in rows]}), 200
+    except:
+        return jsonify({"error": "error interacting with the db"}), 400
+    finally:
+        session.close()
+
 @app.route('/get-random', methods=['GET'])
 def get_random():
     """
-    gets a completely random brewery
+    gets random breweries, picked from the mirror (or taken from a prefetched pool) without asking the api
+
+    queries:
+        - size (int) : the number of breweries, 1 by default, at most 50
+        - by_city, by_country, by_ids, by_name, by_postal, by_state, by_type : only pick among
+            the breweries matching these list-breweries filters
 
     returns:
-        JSON response that contains the details of a random brewery or an error with the API
+        JSON response that contains a list of random breweries or an error with the API
     """
     try:
-        response = requests.get("https://api.openbrewerydb.org/v1/breweries/random").json()
-        # response = response.json()
-        memory.add(response)
-        return response, 200
+        size, filters = random_query(request.args)
+    except ValueError:
+        return jsonify({"error": "size must be an integer"}), 400
+
+    try:
+        response = local_random(size, filters)
+        if response == None and filters:
+            response = fetch_random_filtered(size, filters)
+        elif response == None:
+            raw = upstream.get(f'{BREWERY_API}/random?size={size}').content
+            response = raw, len(json.loads(raw))
+        raw, count = response
+        session_memory().add(raw, count)
+        return json_response(raw)
     except:
         return jsonify({"error": "unable to get random brewery from API"})
 
+@app.route('/autocomplete', methods=['GET'])
+def autocomplete():
+    """
+    suggests breweries as a name (or city) is typed, from the mirror's search index
+    words match as prefixes ("sierra nev"), and similar names (typos) fill up the rest
+
+    queries:
+        - query (str) : what was typed so far
+        - limit (int) : the most suggestions, 10 by default (at most 50)
+
+    returns:
+        JSON response with a list of {"id", "name", "city", "state"}, best match first
+        (the api's autocomplete while the mirror is not complete)
+    """
+    query = request.args.get("query", "")
+    try:
+        limit = min(max(int(request.args.get("limit", 10)), 1), 50)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    try:
+        if mirror.ready():
+            return jsonify(mirror.autocomplete(query, limit)), 200
+        raw = upstream.get(f'{BREWERY_API}/autocomplete?{urlencode({"query": query})}').content
+        return json_response(raw)
+    except:
+        return jsonify({"error": "error searching breweries"})
+
 @app.route('/view-memory', methods=['GET'])
 def view_memory():
     """
     returns:
-        JSON response that shows the memory (most recent api calls)
+        JSON response that shows the session's memory (its most recent api calls)
+        the stored responses are streamed as they are, without being parsed or re-serialized
+    """
+    memory = read_session_memory()
+    def generate():
+        yield b'{"memory": '
+        yield from memory.chunks()
+        yield b'}'
+    return Response(generate(), mimetype="application/json")
+
+@app.route('/memory-sizes', methods=['GET'])
+def memory_sizes():
+    """
+    returns:
+        JSON response with the size in bytes of every response in the session's memory, in order, and their total
+    """
+    sizes = read_session_memory().entrySizes()
+    return jsonify({"sizes": sizes, "total": sum(sizes)}), 200
+
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    """
+    returns:
+        JSON response with the size and hit/miss/eviction counters of the brewery caches
+        and how many upstream fetches were collapsed into an in-flight one, and the random brewery pool
     """
-    return jsonify({"memory": memory.stringRep()})
+    return jsonify({"brewery_cache": brewery_cache.stats(), "list_cache": list_cache.stats(), "coalescing": flights.stats(),
+                    "random_pool": random_pool.stats()}), 200
 
 
 
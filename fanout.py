@@ -0,0 +1,47 @@
+import asyncio
+from collections import deque
+
+
+def ordered_fanout(pool, fn, items, window):
+    """
+    yields fn(item) for every item, in order, running up to window calls at once on pool
+    at most window results are held at a time, however many items there are,
+    and calls that have not started are cancelled if the generator is closed early
+    """
+    pending = deque()
+    items = iter(items)
+    try:
+        while True:
+            while len(pending) < window:
+                item = next(items, None)
+                if item is None:
+                    break
+                pending.append(pool.submit(fn, item))
+            if not pending:
+                return
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+async def ordered_fanout_async(fn, items, window):
+    """
+    async version of ordered_fanout, yields await fn(item) for every item in order,
+    with up to window of them running at once as tasks
+    """
+    pending = deque()
+    items = iter(items)
+    try:
+        while True:
+            while len(pending) < window:
+                item = next(items, None)
+                if item is None:
+                    break
+                pending.append(asyncio.ensure_future(fn(item)))
+            if not pending:
+                return
+            yield await pending.popleft()
+    finally:
+        for task in pending:
+            task.cancel()
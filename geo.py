@@ -0,0 +1,151 @@
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+#rings of cells a query scans before it gives up on the grid and scans every point (vectorized),
+#past a few rings the python loop over cells costs more than the scan
+MAX_RINGS = 8
+
+
+def parse_point(value):
+    """
+    returns:
+        (lat, lon) of a "lat,lon" point in degrees
+        raises ValueError if it is not two numbers with lat in [-90, 90] and lon in [-180, 180]
+    """
+    try:
+        lat, lon = (float(part) for part in value.split(","))
+    except ValueError:
+        raise ValueError(f'invalid point: {value}, expected lat,lon')
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180): #also rejects nan
+        raise ValueError(f'invalid point: {value}, lat has to be in [-90, 90] and lon in [-180, 180]')
+    return lat, lon
+
+
+def haversine(lat, lon, lats, lons):
+    """
+    returns:
+        the great-circle distances in km from a point to arrays of points, all in degrees
+    """
+    lat1 = math.radians(lat)
+    lats = np.radians(lats)
+    a = (np.sin((lats - lat1) / 2) ** 2
+         + math.cos(lat1) * np.cos(lats) * np.sin((np.radians(lons) - math.radians(lon)) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+def nearest_of(lat, lon, lats, lons, k):
+    """
+    returns:
+        (positions, distances in km) of the k points nearest to a point, nearest first, by a full scan
+    """
+    distances = haversine(lat, lon, lats, lons)
+    if k < len(distances):
+        positions = np.argpartition(distances, k)[:k]
+    else:
+        positions = np.arange(len(distances))
+    positions = positions[np.lexsort((positions, distances[positions]))]
+    return positions, distances[positions]
+
+
+class GridIndex:
+    """
+    points bucketed into a grid of cellDegrees x cellDegrees cells, for nearest neighbour queries
+
+    a query scans rings of cells around the point until the k nearest candidates found are closer
+    than anything in the cells not scanned yet, then ranks the candidates with haversine
+    a query that is not settled within maxRing rings (far from the points, or near a pole where
+    rings are narrow) ranks every point with nearest_of instead
+
+    Attributes:
+        ids: the id of every point, in cell order
+        lats, lons: the coordinates of every point in degrees, in cell order
+        cellDegrees: the size of a cell
+        lonCells: the number of cells around the globe, longitude cells wrap around at the antimeridian
+        cells: (lat cell, lon cell) -> (start, end) of its points in the arrays
+        maxRing: the last ring a query scans before falling back to a full scan
+    """
+
+    def __init__(self, ids, lats, lons, cellDegrees=0.5):
+        """
+        initializes the index over the points
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        self.cellDegrees = cellDegrees
+        self.lonCells = int(math.ceil(360 / cellDegrees))
+        latCells = np.floor(lats / cellDegrees).astype(np.int64)
+        lonCells = np.floor(lons / cellDegrees).astype(np.int64) % self.lonCells
+        order = np.lexsort((lonCells, latCells))
+        self.ids = np.asarray(ids, dtype=object)[order]
+        self.lats = lats[order]
+        self.lons = lons[order]
+        latCells = latCells[order]
+        lonCells = lonCells[order]
+        self.cells = {}
+        if len(order):
+            #a cell starts wherever the (lat cell, lon cell) pair changes
+            starts = np.flatnonzero(np.r_[True, (latCells[1:] != latCells[:-1]) | (lonCells[1:] != lonCells[:-1])])
+            ends = np.r_[starts[1:], len(order)]
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                self.cells[(int(latCells[start]), int(lonCells[start]))] = (start, end)
+        self.maxRing = min(MAX_RINGS, self.lonCells)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def ring(self, latCell, lonCell, radius):
+        """
+        returns:
+            the (start, end) of every non empty cell at Chebyshev distance radius from a cell
+        """
+        spans = []
+        for dLat in range(-radius, radius + 1):
+            edge = abs(dLat) == radius
+            for dLon in (range(-radius, radius + 1) if edge else (-radius, radius)):
+                span = self.cells.get((latCell + dLat, (lonCell + dLon) % self.lonCells))
+                if span != None:
+                    spans.append(span)
+        return spans
+
+    def bound(self, lat, radius):
+        """
+        returns:
+            a lower bound in km on the distance from a point at lat to any point outside the radius rings
+        """
+        gap = math.radians(radius * self.cellDegrees)
+        #a point that far away in longitude is past a meridian, which is asin(cos(lat) sin(gap)) away
+        acrossMeridian = math.asin(math.cos(math.radians(lat)) * math.sin(min(gap, math.pi / 2)))
+        return EARTH_RADIUS_KM * min(gap, acrossMeridian)
+
+    def nearest(self, lat, lon, k):
+        """
+        returns:
+            (ids, distances in km) of the k points nearest to a point, nearest first
+        """
+        if k <= 0 or not len(self):
+            return [], np.empty(0)
+        latCell = int(math.floor(lat / self.cellDegrees))
+        lonCell = int(math.floor(lon / self.cellDegrees)) % self.lonCells
+        spans = []
+        seen = set() #once rings are wider than the globe they wrap onto cells already scanned
+        found = 0
+        for radius in range(self.maxRing + 1):
+            for span in self.ring(latCell, lonCell, radius):
+                if span in seen:
+                    continue
+                seen.add(span)
+                spans.append(span)
+                found += span[1] - span[0]
+            if found == len(self):
+                break
+            if found >= k:
+                positions = np.concatenate([np.arange(start, end) for start, end in spans])
+                distances = haversine(lat, lon, self.lats[positions], self.lons[positions])
+                kth = np.partition(distances, k - 1)[k - 1]
+                if kth <= self.bound(lat, radius):
+                    order, distances = nearest_of(lat, lon, self.lats[positions], self.lons[positions], k)
+                    return list(self.ids[positions[order]]), distances
+        order, distances = nearest_of(lat, lon, self.lats, self.lons, k)
+        return list(self.ids[order]), distances
@@ -4,6 +4,8 @@ from flask import Flask, jsonify, make_response, Response, request
 
 from meal_max.models import kitchen_model
 from meal_max.models.battle_model import BattleModel
+from meal_max.models.simulation_model import simulate_win_probabilities
+from meal_max.models.tournament_model import run_tournament
 from meal_max.utils.sql_utils import check_database_connection, check_table_exists
 
 
@@ -292,6 +294,85 @@ def prep_combatant() -> Response:
         return make_response(jsonify({'error': str(e)}), 500)
 
 
+@app.route('/api/tournament', methods=['POST'])
+def tournament() -> Response:
+    """
+    Route to run a whole tournament between meals in one request.
+
+    Expected JSON Input:
+        - meal_ids (List[int]): The IDs of the meals, in seed order.
+        - format (str): single_elimination (default), double_elimination or round_robin.
+
+    Returns:
+        JSON response with the champion, every round of the tournament and the standings.
+    Raises:
+        400 error if the input is invalid.
+        500 error if there is an issue running the tournament.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        meal_ids = data.get('meal_ids')
+        tournament_format = data.get('format', 'single_elimination')
+
+        if not isinstance(meal_ids, list) or not all(isinstance(meal_id, int) for meal_id in meal_ids):
+            return make_response(jsonify({'error': 'meal_ids must be a list of meal IDs'}), 400)
+
+        app.logger.info("Running a %s tournament between %d meals", tournament_format, len(meal_ids))
+        result = run_tournament(meal_ids, tournament_format)
+
+        return make_response(jsonify({'status': 'success', 'tournament': result}), 200)
+    except ValueError as e:
+        app.logger.error(f"Invalid tournament: {e}")
+        return make_response(jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        app.logger.error(f"Tournament error: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+
+@app.route('/api/win-probabilities', methods=['GET'])
+def win_probabilities() -> Response:
+    """
+    Route to estimate win probabilities by simulating battles, without updating any stats.
+
+    Query Parameters:
+        - trials (int): The number of battles simulated per pair of meals. Default is 10000.
+        - seed (int): The seed of the random generator. Optional.
+        - meal_id (int): Only return the win probabilities of this meal. Optional.
+
+    Returns:
+        JSON response with the meals and the win probability matrix, row i being combatant 1,
+        or the win probabilities of meal_id against every other meal.
+    Raises:
+        400 error if the parameters are invalid or trials times the number of meals squared is over MAX_BATTLES.
+        500 error if there is an issue running the simulation.
+    """
+    try:
+        trials = request.args.get('trials', 10000, type=int)
+        seed = request.args.get('seed', None, type=int)
+        meal_id = request.args.get('meal_id', None, type=int)
+        app.logger.info("Simulating %d battles per pair of meals", trials)
+
+        result = simulate_win_probabilities(trials, seed)
+
+        if meal_id is not None:
+            ids = [meal['id'] for meal in result['meals']]
+            if meal_id not in ids:
+                return make_response(jsonify({'error': f'Meal with ID {meal_id} not found'}), 404)
+            row = result['matrix'][ids.index(meal_id)]
+            opponents = [{**meal, 'win_probability': probability}
+                         for meal, probability in zip(result['meals'], row) if meal['id'] != meal_id]
+            return make_response(jsonify({'status': 'success', 'meal_id': meal_id, 'trials': trials,
+                                          'win_probabilities': opponents}), 200)
+
+        return make_response(jsonify({'status': 'success', **result}), 200)
+    except ValueError as e:
+        app.logger.error(f"Invalid simulation: {e}")
+        return make_response(jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        app.logger.error(f"Simulation error: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+
 ############################################################
 #
 # Leaderboard
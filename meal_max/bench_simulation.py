@@ -0,0 +1,67 @@
+"""
+Benchmarks the vectorized battle simulator against the per-battle Python path.
+
+    python bench_simulation.py [--meals 50] [--trials 2000]
+
+The per-battle path scores both combatants with BattleModel.get_battle_score
+and draws one random number per battle, like BattleModel.battle without the
+database. Prints battles per second of both and the largest difference
+between their win probability estimates.
+"""
+import argparse
+import logging
+import random
+import time
+
+import numpy as np
+
+from meal_max.models.battle_model import BattleModel, DIFFICULTY_MODIFIERS
+from meal_max.models.kitchen_model import Meal
+from meal_max.models.simulation_model import delta_matrix, win_probability_matrix
+
+
+def make_meals(count: int, rng: np.random.Generator) -> list:
+    cuisines = ["Thai", "Greek", "Korean", "Italian", "Mexican", "Ethiopian", "Vietnamese"]
+    return [Meal(id=i, meal=f"Meal {i}", cuisine=cuisines[int(rng.integers(len(cuisines)))],
+                 price=round(float(rng.uniform(1, 20)), 2), difficulty=str(rng.choice(["LOW", "MED", "HIGH"])))
+            for i in range(count)]
+
+
+def per_battle(meals: list, trials: int) -> np.ndarray:
+    battle_model = BattleModel()
+    wins = np.zeros((len(meals), len(meals)))
+    for i, combatant_1 in enumerate(meals):
+        for j, combatant_2 in enumerate(meals):
+            for _ in range(trials):
+                delta = abs(battle_model.get_battle_score(combatant_1) - battle_model.get_battle_score(combatant_2)) / 100
+                if delta > random.random():
+                    wins[i, j] += 1
+    return wins / trials
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized battle simulator against per-battle Python.")
+    parser.add_argument("--meals", type=int, default=50, help="number of meals")
+    parser.add_argument("--trials", type=int, default=2000, help="battles simulated per pair")
+    args = parser.parse_args()
+
+    # The per-battle path logs every score, which would dominate its time
+    logging.disable(logging.INFO)
+    meals = make_meals(args.meals, np.random.default_rng(0))
+    battles = args.meals ** 2 * args.trials
+
+    start = time.perf_counter()
+    prices = np.array([meal.price for meal in meals])
+    cuisine_lengths = np.array([len(meal.cuisine) for meal in meals], dtype=np.float64)
+    modifiers = np.array([DIFFICULTY_MODIFIERS[meal.difficulty] for meal in meals], dtype=np.float64)
+    vectorized = win_probability_matrix(delta_matrix(prices, cuisine_lengths, modifiers), args.trials, seed=0)
+    vectorized_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    python = per_battle(meals, args.trials)
+    python_time = time.perf_counter() - start
+
+    print(f"{battles} battles between {args.meals} meals")
+    print(f"vectorized: {vectorized_time:8.3f} s  {battles / vectorized_time:14,.0f} battles/s")
+    print(f"per battle: {python_time:8.3f} s  {battles / python_time:14,.0f} battles/s")
+    print(f"speedup: {python_time / vectorized_time:.1f}x, largest difference: {np.abs(vectorized - python).max():.4f}")
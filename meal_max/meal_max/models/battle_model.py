@@ -1,7 +1,7 @@
 import logging
 from typing import Any, List
 
-from meal_max.models.kitchen_model import Meal, update_meal_stats
+from meal_max.models.kitchen_model import Meal, settle_battle
 from meal_max.utils.logger import configure_logger
 from meal_max.utils.random_utils import get_random
 
@@ -10,6 +10,10 @@ logger = logging.getLogger(__name__)
 configure_logger(logger)
 
 
+# Subtracted from a combatant's score by difficulty
+DIFFICULTY_MODIFIERS = {"HIGH": 1, "MED": 2, "LOW": 3}
+
+
 class BattleModel:
     """
     A class to manage the battle between two combatants.
@@ -76,9 +80,8 @@ class BattleModel:
         # Log the winner
         logger.info("The winner is: %s", winner.meal)
 
-        # Update stats for both combatants
-        update_meal_stats(winner.id, 'win')
-        update_meal_stats(loser.id, 'loss')
+        # Update stats for both combatants in one transaction
+        settle_battle(winner.id, loser.id)
 
         # Remove the losing combatant from combatants
         self.combatants.remove(loser)
@@ -106,14 +109,12 @@ class BattleModel:
         Returns:
             float: The calculated battle score.
         """
-        difficulty_modifier = {"HIGH": 1, "MED": 2, "LOW": 3}
-
         # Log the calculation process
         logger.info("Calculating battle score for %s: price=%.3f, cuisine=%s, difficulty=%s",
                     combatant.meal, combatant.price, combatant.cuisine, combatant.difficulty)
 
         # Calculate score
-        score = (combatant.price * len(combatant.cuisine)) - difficulty_modifier[combatant.difficulty]
+        score = (combatant.price * len(combatant.cuisine)) - DIFFICULTY_MODIFIERS[combatant.difficulty]
 
         # Log the calculated score
         logger.info("Battle score for %s: %.3f", combatant.meal, score)
@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 import logging
 import sqlite3
-from typing import Any
+from typing import Any, Dict, List, Tuple
 
 from meal_max.utils.sql_utils import get_db_connection
 from meal_max.utils.logger import configure_logger
@@ -235,6 +235,47 @@ def get_meal_by_name(meal_name: str) -> Meal:
         raise e
 
 
+def get_meals_by_ids(meal_ids: List[int]) -> List[Meal]:
+    """
+    Retrieves meals from the database by their IDs in one query.
+
+    Args:
+        meal_ids (List[int]): The IDs of the meals to retrieve.
+
+    Returns:
+        List[Meal]: The meals, in the order of meal_ids.
+
+    Raises:
+        sqlite3.Error: If there's a database error.
+        ValueError: If any meal is not found or is deleted.
+    """
+    if not meal_ids:
+        return []
+    placeholders = ", ".join("?" for _ in meal_ids)
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT id, meal, cuisine, price, difficulty, deleted FROM meals WHERE id IN ({placeholders})",
+                           tuple(meal_ids))
+            rows = {row[0]: row for row in cursor.fetchall()}
+
+        meals = []
+        for meal_id in meal_ids:
+            row = rows.get(meal_id)
+            if row is None:
+                logger.info("Meal with ID %s not found", meal_id)
+                raise ValueError(f"Meal with ID {meal_id} not found")
+            if row[5]:
+                logger.info("Meal with ID %s has been deleted", meal_id)
+                raise ValueError(f"Meal with ID {meal_id} has been deleted")
+            meals.append(Meal(id=row[0], meal=row[1], cuisine=row[2], price=row[3], difficulty=row[4]))
+        return meals
+
+    except sqlite3.Error as e:
+        logger.error("Database error: %s", str(e))
+        raise e
+
+
 def update_meal_stats(meal_id: int, result: str) -> None:
     """
     Updates the meal stats by incrementing the number of battles,
@@ -273,3 +314,70 @@ def update_meal_stats(meal_id: int, result: str) -> None:
     except sqlite3.Error as e:
         logger.error("Database error: %s", str(e))
         raise e
+
+
+def settle_battle(winner_id: int, loser_id: int) -> None:
+    """
+    Records the result of a single battle, see settle_battles.
+
+    Args:
+        winner_id (int): The ID of the winning meal.
+        loser_id (int): The ID of the losing meal.
+
+    Raises:
+        ValueError: If either meal is not found or has been deleted.
+        sqlite3.Error: If there's a database error.
+    """
+    settle_battles([(winner_id, loser_id)])
+
+
+def settle_battles(results: List[Tuple[int, int]]) -> None:
+    """
+    Records the results of battles in a single transaction.
+
+    Every meal's battles and wins are added up first, so each meal is
+    updated once however many battles it fought. The updates skip deleted
+    meals and their row counts are checked instead of selecting the meals
+    beforehand; if any meal is missing or deleted, nothing is recorded.
+
+    Args:
+        results (List[Tuple[int, int]]): (winner ID, loser ID) of every battle.
+
+    Raises:
+        ValueError: If any meal is not found or has been deleted.
+        sqlite3.Error: If there's a database error.
+    """
+    stats: Dict[int, List[int]] = {}
+    for winner_id, loser_id in results:
+        stats.setdefault(winner_id, [0, 0])
+        stats.setdefault(loser_id, [0, 0])
+        stats[winner_id][0] += 1
+        stats[winner_id][1] += 1
+        stats[loser_id][0] += 1
+    if not stats:
+        return
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            for meal_id in sorted(stats):
+                battles, wins = stats[meal_id]
+                cursor.execute("""
+                    UPDATE meals SET battles = battles + ?, wins = wins + ?
+                    WHERE id = ? AND deleted = FALSE
+                """, (battles, wins, meal_id))
+                if cursor.rowcount == 0:
+                    conn.rollback()
+                    cursor.execute("SELECT deleted FROM meals WHERE id = ?", (meal_id,))
+                    if cursor.fetchone() is None:
+                        logger.info("Meal with ID %s not found", meal_id)
+                        raise ValueError(f"Meal with ID {meal_id} not found")
+                    logger.info("Meal with ID %s has been deleted", meal_id)
+                    raise ValueError(f"Meal with ID {meal_id} has been deleted")
+            conn.commit()
+
+            logger.info("Settled %d battles for %d meals", len(results), len(stats))
+
+    except sqlite3.Error as e:
+        logger.error("Database error: %s", str(e))
+        raise e
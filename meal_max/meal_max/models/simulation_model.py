@@ -0,0 +1,157 @@
+import argparse
+import json
+import logging
+import sqlite3
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from meal_max.models.battle_model import DIFFICULTY_MODIFIERS
+from meal_max.utils.logger import configure_logger
+from meal_max.utils.sql_utils import get_db_connection
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+MAX_TRIALS = 1000000
+# Battles simulated by one call to simulate_win_probabilities. The route runs the
+# simulation on the request thread, so this keeps a request under a few seconds
+MAX_BATTLES = 100000000
+# Random numbers drawn per chunk of trials, bounds the memory of a simulation
+CHUNK_SIZE = 4000000
+
+
+def load_meal_arrays() -> Dict[str, np.ndarray]:
+    """
+    Loads every meal that is not deleted into arrays, one entry per meal.
+
+    Returns:
+        dict: The ids, meal names, prices, cuisine lengths and difficulty modifiers of the meals, ordered by ID.
+
+    Raises:
+        sqlite3.Error: If there's a database error.
+    """
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, meal, cuisine, price, difficulty FROM meals WHERE deleted = false ORDER BY id")
+            rows = cursor.fetchall()
+
+    except sqlite3.Error as e:
+        logger.error("Database error: %s", str(e))
+        raise e
+
+    logger.info("Loaded %d meals for simulation", len(rows))
+    return {
+        'ids': np.array([row[0] for row in rows], dtype=np.int64),
+        'meals': np.array([row[1] for row in rows], dtype=object),
+        'prices': np.array([row[3] for row in rows], dtype=np.float64),
+        'cuisine_lengths': np.array([len(row[2]) for row in rows], dtype=np.float64),
+        'modifiers': np.array([DIFFICULTY_MODIFIERS[row[4]] for row in rows], dtype=np.float64)
+    }
+
+
+def delta_matrix(prices: np.ndarray, cuisine_lengths: np.ndarray, modifiers: np.ndarray) -> np.ndarray:
+    """
+    Computes the normalized score delta of every pair of meals at once.
+
+    Scores follow BattleModel.get_battle_score, and entry (i, j) is
+    |score_i - score_j| / 100, the delta BattleModel.battle compares
+    against the random number.
+
+    Args:
+        prices (np.ndarray): The price of every meal.
+        cuisine_lengths (np.ndarray): The number of letters in the cuisine of every meal.
+        modifiers (np.ndarray): The difficulty modifier of every meal.
+
+    Returns:
+        np.ndarray: The n x n delta matrix.
+    """
+    scores = prices * cuisine_lengths - modifiers
+    return np.abs(scores[:, None] - scores[None, :]) / 100
+
+
+def win_probability_matrix(deltas: np.ndarray, trials: int, seed: Optional[int] = None) -> np.ndarray:
+    """
+    Estimates win probabilities by simulating trials battles for every pair of meals.
+
+    Entry (i, j) is the fraction of battles meal i won as combatant 1
+    against meal j, which wins when its delta is greater than a uniform
+    random number. Trials are simulated in chunks of about CHUNK_SIZE
+    random numbers.
+
+    Args:
+        deltas (np.ndarray): The n x n delta matrix.
+        trials (int): The number of battles simulated per pair.
+        seed (int, optional): The seed of the random generator.
+
+    Returns:
+        np.ndarray: The n x n win probability matrix.
+
+    Raises:
+        ValueError: If trials is out of range.
+    """
+    if not 1 <= trials <= MAX_TRIALS:
+        raise ValueError(f"Invalid trials: {trials}. Must be between 1 and {MAX_TRIALS}.")
+
+    rng = np.random.default_rng(seed)
+    wins = np.zeros(deltas.shape, dtype=np.int64)
+    chunk = max(1, CHUNK_SIZE // max(deltas.size, 1))
+    done = 0
+    while done < trials:
+        size = min(chunk, trials - done)
+        wins += (deltas > rng.random((size,) + deltas.shape)).sum(axis=0)
+        done += size
+    return wins / trials
+
+
+def simulate_win_probabilities(trials: int = 10000, seed: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Estimates the win probability of every meal against every other meal, without touching their stats.
+
+    Args:
+        trials (int): The number of battles simulated per pair.
+        seed (int, optional): The seed of the random generator.
+
+    Returns:
+        dict: The meals (ID and name) in matrix order, the number of trials per pair,
+              and the win probability matrix with row i as combatant 1.
+
+    Raises:
+        ValueError: If trials is out of range or would simulate more than MAX_BATTLES battles.
+        sqlite3.Error: If there's a database error.
+    """
+    arrays = load_meal_arrays()
+    battles = trials * len(arrays['ids']) ** 2
+    if battles > MAX_BATTLES:
+        raise ValueError(f"Too many battles to simulate: {battles}. At most {MAX_BATTLES}, use fewer trials.")
+    deltas = delta_matrix(arrays['prices'], arrays['cuisine_lengths'], arrays['modifiers'])
+    probabilities = win_probability_matrix(deltas, trials, seed)
+    logger.info("Simulated %d battles between %d meals", battles, len(arrays['ids']))
+    return {
+        'meals': [{'id': int(meal_id), 'meal': meal} for meal_id, meal in zip(arrays['ids'], arrays['meals'])],
+        'trials': trials,
+        'matrix': probabilities.round(4).tolist()
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Estimate the win probability of every meal against every other meal.")
+    parser.add_argument("--trials", type=int, default=10000, help="battles simulated per pair of meals")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random generator")
+    parser.add_argument("--meal", default=None, help="only print the win probabilities of this meal")
+    args = parser.parse_args()
+
+    result = simulate_win_probabilities(args.trials, args.seed)
+    names = [meal['meal'] for meal in result['meals']]
+    if args.meal is None:
+        print(json.dumps(result))
+    elif args.meal not in names:
+        parser.error(f"Meal with name {args.meal} not found")
+    else:
+        row = result['matrix'][names.index(args.meal)]
+        for name, probability in sorted(zip(names, row), key=lambda item: -item[1]):
+            if name != args.meal:
+                print(f"{probability:.4f}  {name}")
@@ -0,0 +1,288 @@
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from meal_max.models.battle_model import DIFFICULTY_MODIFIERS
+from meal_max.models.kitchen_model import Meal, get_meals_by_ids, settle_battles
+from meal_max.utils.logger import configure_logger
+from meal_max.utils.random_utils import get_randoms
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+FORMATS = ("single_elimination", "double_elimination", "round_robin")
+MAX_TOURNAMENT_SIZE = 256
+
+
+def get_battle_scores(meals: List[Meal]) -> np.ndarray:
+    """
+    Calculates the battle score of every meal at once.
+
+    Uses the same rule as BattleModel.get_battle_score: the price multiplied
+    by the number of letters in the cuisine, minus the difficulty modifier.
+
+    Args:
+        meals (List[Meal]): The meals to score.
+
+    Returns:
+        np.ndarray: The battle score of every meal, in order.
+    """
+    prices = np.array([meal.price for meal in meals], dtype=np.float64)
+    cuisine_lengths = np.array([len(meal.cuisine) for meal in meals], dtype=np.float64)
+    modifiers = np.array([DIFFICULTY_MODIFIERS[meal.difficulty] for meal in meals], dtype=np.float64)
+    return prices * cuisine_lengths - modifiers
+
+
+class Tournament:
+    """
+    A tournament between meals, played with the battle rules of BattleModel.
+
+    Meals are referred to by their position in meals (their seed). Every
+    round is played at once: the score deltas of all its pairings are
+    computed together and compared against random numbers drawn in bulk
+    before the tournament starts.
+
+    Attributes:
+        meals (List[Meal]): The meals in the tournament, in seed order.
+        scores (np.ndarray): The battle score of every meal.
+        randoms (np.ndarray): The random numbers for the battles, used in order.
+        rounds (List[dict]): The battles and byes of every round played.
+        results (List[Tuple[int, int]]): (winner ID, loser ID) of every battle played.
+        wins (np.ndarray): The number of battles won by every meal.
+        losses (np.ndarray): The number of battles lost by every meal.
+        eliminated (Dict[int, int]): The number of the battle that eliminated a meal.
+    """
+
+    def __init__(self, meals: List[Meal], randoms: List[float]):
+        """
+        Initializes a tournament that has not been played yet.
+
+        Args:
+            meals (List[Meal]): The meals in the tournament, in seed order.
+            randoms (List[float]): At least as many random numbers as the tournament has battles.
+        """
+        self.meals = meals
+        self.scores = get_battle_scores(meals)
+        self.randoms = np.asarray(randoms, dtype=np.float64)
+        self.rounds: List[Dict[str, Any]] = []
+        self.results: List[Tuple[int, int]] = []
+        self.wins = np.zeros(len(meals), dtype=np.int64)
+        self.losses = np.zeros(len(meals), dtype=np.int64)
+        self.eliminated: Dict[int, int] = {}
+
+    def play_round(self, name: str, first: List[int], second: List[int],
+                   byes: Optional[List[int]] = None) -> Tuple[List[int], List[int]]:
+        """
+        Plays the battles first[k] against second[k], first[k] being combatant 1.
+
+        Args:
+            name (str): The name of the round.
+            first (List[int]): The seeds of the first combatants.
+            second (List[int]): The seeds of the second combatants.
+            byes (List[int], optional): The seeds that advance without a battle.
+
+        Returns:
+            Tuple[List[int], List[int]]: The seeds of the winners and of the losers, by battle.
+        """
+        first = np.asarray(first, dtype=np.int64)
+        second = np.asarray(second, dtype=np.int64)
+        start = len(self.results)
+        deltas = np.abs(self.scores[first] - self.scores[second]) / 100
+        randoms = self.randoms[start:start + len(first)]
+
+        # Combatant 1 wins when the normalized delta beats the random number
+        first_wins = deltas > randoms
+        winners = np.where(first_wins, first, second)
+        losers = np.where(first_wins, second, first)
+        np.add.at(self.wins, winners, 1)
+        np.add.at(self.losses, losers, 1)
+
+        battles = []
+        for k, (winner, loser) in enumerate(zip(winners.tolist(), losers.tolist())):
+            self.results.append((self.meals[winner].id, self.meals[loser].id))
+            battles.append({
+                'combatant_1': self.meals[int(first[k])].meal,
+                'combatant_2': self.meals[int(second[k])].meal,
+                'winner': self.meals[winner].meal,
+                'delta': round(float(deltas[k]), 3),
+                'random': float(randoms[k])
+            })
+        self.rounds.append({
+            'round': name,
+            'battles': battles,
+            'byes': [self.meals[seed].meal for seed in (byes or [])]
+        })
+        logger.info("Played %s: %d battles", name, len(battles))
+        return winners.tolist(), losers.tolist()
+
+    def eliminate(self, seeds: List[int]) -> None:
+        """
+        Marks meals as eliminated by the last battle played.
+
+        Args:
+            seeds (List[int]): The seeds of the eliminated meals.
+        """
+        for seed in seeds:
+            self.eliminated[seed] = len(self.results)
+
+    def play_bracket_round(self, name: str, entrants: List[int]) -> Tuple[List[int], List[int]]:
+        """
+        Pairs entrants in order and plays them, the first entrant gets a bye when there is an odd number.
+
+        Args:
+            name (str): The name of the round.
+            entrants (List[int]): The seeds of the meals in the round.
+
+        Returns:
+            Tuple[List[int], List[int]]: The seeds advancing (byes first) and the seeds of the losers.
+        """
+        byes = entrants[:len(entrants) % 2]
+        paired = entrants[len(byes):]
+        winners, losers = self.play_round(name, paired[0::2], paired[1::2], byes)
+        return byes + winners, losers
+
+    def play_single_elimination(self) -> None:
+        """
+        Plays a knockout bracket, every loss eliminates a meal.
+
+        The top seeds get byes in the first round so that the number of
+        meals left afterwards is a power of two.
+        """
+        entrants = list(range(len(self.meals)))
+        size = 1 << (len(entrants) - 1).bit_length()
+        byes = entrants[:size - len(entrants)]
+        paired = entrants[len(byes):]
+        winners, losers = self.play_round("round 1", paired[0::2], paired[1::2], byes)
+        self.eliminate(losers)
+        entrants = byes + winners
+
+        number = 2
+        while len(entrants) > 1:
+            entrants, losers = self.play_bracket_round(f"round {number}", entrants)
+            self.eliminate(losers)
+            number += 1
+
+    def play_double_elimination(self) -> None:
+        """
+        Plays a winners and a losers bracket, a meal is eliminated after its second loss.
+
+        Losers of the winners bracket drop into the losers bracket. The
+        champions of both brackets meet in a grand final, which is played
+        again if the losers bracket champion wins it.
+        """
+        upper = list(range(len(self.meals)))
+        lower: List[int] = []
+        number = 1
+        while len(upper) > 1 or len(lower) > 1:
+            if len(upper) > 1:
+                upper, dropped = self.play_bracket_round(f"winners round {number}", upper)
+                lower = lower + dropped
+            if len(lower) > 1:
+                lower, losers = self.play_bracket_round(f"losers round {number}", lower)
+                self.eliminate(losers)
+            number += 1
+
+        winners, losers = self.play_round("grand final", upper, lower)
+        if winners == lower:
+            # Both finalists have lost once, the final is played again
+            winners, losers = self.play_round("grand final reset", upper, lower)
+        self.eliminate(losers)
+
+    def play_round_robin(self) -> None:
+        """Plays every meal against every other meal once, the lower seed being combatant 1."""
+        first, second = np.triu_indices(len(self.meals), k=1)
+        self.play_round("round robin", first.tolist(), second.tolist())
+
+    def standings(self, by_wins: bool) -> List[Dict[str, Any]]:
+        """
+        Ranks the meals, by wins or by how late they were eliminated, ties going to the higher seed.
+
+        Args:
+            by_wins (bool): Rank by wins instead of elimination.
+
+        Returns:
+            List[dict]: The place, ID, name, wins and losses of every meal, best first.
+        """
+        never = len(self.results) + 1
+        if by_wins:
+            order = sorted(range(len(self.meals)), key=lambda seed: (-self.wins[seed], seed))
+        else:
+            order = sorted(range(len(self.meals)), key=lambda seed: (-self.eliminated.get(seed, never), seed))
+        return [{
+            'place': place,
+            'id': self.meals[seed].id,
+            'meal': self.meals[seed].meal,
+            'wins': int(self.wins[seed]),
+            'losses': int(self.losses[seed])
+        } for place, seed in enumerate(order, start=1)]
+
+
+def count_battles(tournament_format: str, size: int) -> int:
+    """
+    Returns the largest number of battles a tournament can need.
+
+    Args:
+        tournament_format (str): One of FORMATS.
+        size (int): The number of meals.
+
+    Returns:
+        int: The number of random numbers to draw for the tournament.
+    """
+    if tournament_format == "single_elimination":
+        return size - 1
+    if tournament_format == "double_elimination":
+        return 2 * size - 1
+    return size * (size - 1) // 2
+
+
+def run_tournament(meal_ids: List[int], tournament_format: str = "single_elimination") -> Dict[str, Any]:
+    """
+    Runs a tournament between meals and records every battle in one transaction.
+
+    Meals are seeded in the order of meal_ids. The random numbers for all
+    the battles are drawn in one go before the tournament starts.
+
+    Args:
+        meal_ids (List[int]): The IDs of the meals, in seed order.
+        tournament_format (str): single_elimination (default), double_elimination or round_robin.
+
+    Returns:
+        dict: The format, the champion, every round with its battles and byes, and the standings.
+
+    Raises:
+        ValueError: If the format is unknown, the IDs are invalid, or a meal is not found or deleted.
+        RuntimeError: If the random numbers cannot be fetched.
+        sqlite3.Error: If there's a database error.
+    """
+    if tournament_format not in FORMATS:
+        raise ValueError(f"Invalid tournament format: {tournament_format}. Must be one of {', '.join(FORMATS)}.")
+    if not 2 <= len(meal_ids) <= MAX_TOURNAMENT_SIZE:
+        raise ValueError(f"A tournament needs between 2 and {MAX_TOURNAMENT_SIZE} meals, got {len(meal_ids)}.")
+    if len(set(meal_ids)) != len(meal_ids):
+        raise ValueError("A meal can only enter a tournament once.")
+
+    logger.info("Starting a %s tournament between %d meals", tournament_format, len(meal_ids))
+    meals = get_meals_by_ids(meal_ids)
+    tournament = Tournament(meals, get_randoms(count_battles(tournament_format, len(meals))))
+
+    if tournament_format == "single_elimination":
+        tournament.play_single_elimination()
+    elif tournament_format == "double_elimination":
+        tournament.play_double_elimination()
+    else:
+        tournament.play_round_robin()
+
+    settle_battles(tournament.results)
+
+    standings = tournament.standings(by_wins=tournament_format == "round_robin")
+    logger.info("The tournament champion is: %s", standings[0]['meal'])
+    return {
+        'format': tournament_format,
+        'champion': standings[0]['meal'],
+        'battles': len(tournament.results),
+        'rounds': tournament.rounds,
+        'standings': standings
+    }
@@ -0,0 +1,149 @@
+import logging
+import os
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from meal_max.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+def parse_host_timeouts(value: str) -> Dict[str, float]:
+    """
+    Parses per-host timeouts written as "host=seconds,host=seconds".
+
+    Args:
+        value (str): The comma separated list of host timeouts.
+
+    Returns:
+        Dict[str, float]: A mapping of host names to timeouts in seconds.
+
+    Raises:
+        ValueError: If an entry is not of the form host=seconds.
+    """
+    timeouts = {}
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        host, sep, seconds = entry.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid host timeout: {entry}. Expected host=seconds.")
+        timeouts[host.strip().lower()] = float(seconds)
+    return timeouts
+
+
+class HttpClient:
+    """
+    A pooled, keep-alive HTTP client for outbound calls.
+
+    Connections are kept open and reused between requests, idempotent
+    requests are retried with exponential backoff on connection errors and
+    throttling/5xx responses, and every request gets a timeout based on its host.
+
+    Attributes:
+        session (requests.Session): The session holding the connection pools.
+        default_timeout (float): The timeout used for hosts without their own timeout.
+        timeouts (Dict[str, float]): Per-host timeouts in seconds.
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, pool_size: int = 10, retries: int = 2, backoff: float = 0.2,
+                 default_timeout: float = 5, timeouts: Optional[Dict[str, float]] = None):
+        """
+        Initializes the session and mounts a pooled, retrying adapter on it.
+
+        Args:
+            pool_size (int): The number of keep-alive connections kept per host.
+            retries (int): The number of retries for connection errors and retryable statuses.
+            backoff (float): The backoff factor between retries, in seconds.
+            default_timeout (float): The timeout for hosts not listed in timeouts.
+            timeouts (Dict[str, float], optional): Per-host timeouts in seconds.
+        """
+        # Read timeouts are not retried so a slow upstream fails within its timeout,
+        # and the last response is returned (not raised) once status retries run out.
+        retry = Retry(total=retries, read=False, backoff_factor=backoff,
+                      status_forcelist=self.RETRY_STATUSES, allowed_methods=["GET", "HEAD"],
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.default_timeout = default_timeout
+        self.timeouts = {host.lower(): timeout for host, timeout in (timeouts or {}).items()}
+
+    def timeout_for(self, url: str) -> float:
+        """
+        Returns the timeout for the host of a URL.
+
+        Args:
+            url (str): The URL being requested.
+
+        Returns:
+            float: The timeout in seconds.
+        """
+        host = (urlsplit(url).hostname or "").lower()
+        return self.timeouts.get(host, self.default_timeout)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        Sends a GET request over a pooled connection.
+
+        Args:
+            url (str): The URL to request.
+            **kwargs: Extra arguments passed to requests, an explicit timeout wins over the host timeout.
+
+        Returns:
+            requests.Response: The response of the request.
+
+        Raises:
+            requests.exceptions.RequestException: If the request fails after its retries.
+        """
+        kwargs.setdefault("timeout", self.timeout_for(url))
+        return self.session.get(url, **kwargs)
+
+    def close(self) -> None:
+        """Closes every pooled connection."""
+        self.session.close()
+
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """
+    Returns the process-wide HttpClient, creating it on first use.
+
+    The client is configured from the environment:
+        - HTTP_POOL_SIZE: keep-alive connections per host (default 10).
+        - HTTP_RETRIES: retries on connection errors and retryable statuses (default 2).
+        - HTTP_BACKOFF: backoff factor between retries in seconds (default 0.2).
+        - HTTP_TIMEOUT: default timeout in seconds (default 5).
+        - HTTP_HOST_TIMEOUTS: per-host timeouts as host=seconds,... (default none).
+
+    Returns:
+        HttpClient: The shared client.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            pool_size = int(os.getenv("HTTP_POOL_SIZE", 10))
+            _client = HttpClient(
+                pool_size=pool_size,
+                retries=int(os.getenv("HTTP_RETRIES", 2)),
+                backoff=float(os.getenv("HTTP_BACKOFF", 0.2)),
+                default_timeout=float(os.getenv("HTTP_TIMEOUT", 5)),
+                timeouts=parse_host_timeouts(os.getenv("HTTP_HOST_TIMEOUTS", ""))
+            )
+            logger.info("Created pooled HTTP client with %d connections per host", pool_size)
+        return _client
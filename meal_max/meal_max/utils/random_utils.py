@@ -1,43 +1,64 @@
+from abc import ABC, abstractmethod
+from collections import deque
+import hashlib
 import logging
+import os
+import random
+import struct
+import threading
+from typing import List, Optional, Sequence
+
 import requests
 
+from meal_max.utils.http_utils import get_http_client
 from meal_max.utils.logger import configure_logger
 
 logger = logging.getLogger(__name__)
 configure_logger(logger)
 
 
-def get_random() -> float:
+# random.org serves at most this many numbers per request
+RANDOM_ORG_MAX = 10000
+
+
+def fetch_random_org(count: int = 1) -> List[float]:
     """
-    Fetches a random float between 0 and 1 from random.org.
+    Fetches random floats between 0 and 1 from random.org in one request.
+
+    Args:
+        count (int): The number of random numbers to fetch, at most RANDOM_ORG_MAX.
 
     Returns:
-        float: The random number fetched from random.org.
+        List[float]: The random numbers fetched from random.org.
 
     Raises:
         RuntimeError: If the request to random.org fails or returns an invalid response.
-        ValueError: If the response from random.org is not a valid float.
+        ValueError: If count is out of range or the response from random.org is not a list of floats.
     """
-    url = "https://www.random.org/decimal-fractions/?num=1&dec=2&col=1&format=plain&rnd=new"
+    if not 1 <= count <= RANDOM_ORG_MAX:
+        raise ValueError(f"Invalid count: {count}. Must be between 1 and {RANDOM_ORG_MAX}.")
+
+    url = f"https://www.random.org/decimal-fractions/?num={count}&dec=2&col=1&format=plain&rnd=new"
 
     try:
         # Log the request to random.org
-        logger.info("Fetching random number from %s", url)
+        logger.info("Fetching %d random numbers from %s", count, url)
 
-        response = requests.get(url, timeout=5)
+        response = get_http_client().get(url)
 
         # Check if the request was successful
         response.raise_for_status()
 
-        random_number_str = response.text.strip()
+        random_number_strs = response.text.split()
 
         try:
-            random_number = float(random_number_str)
+            random_numbers = [float(random_number_str) for random_number_str in random_number_strs]
         except ValueError:
-            raise ValueError("Invalid response from random.org: %s" % random_number_str)
+            raise ValueError("Invalid response from random.org: %s" % response.text.strip())
+        if len(random_numbers) != count:
+            raise ValueError("Invalid response from random.org: expected %d numbers, got %d" % (count, len(random_numbers)))
 
-        logger.info("Received random number: %.3f", random_number)
-        return random_number
+        return random_numbers
 
     except requests.exceptions.Timeout:
         logger.error("Request to random.org timed out.")
@@ -46,3 +67,284 @@ def get_random() -> float:
     except requests.exceptions.RequestException as e:
         logger.error("Request to random.org failed: %s", e)
         raise RuntimeError("Request to random.org failed: %s" % e)
+
+
+class RandomProvider(ABC):
+    """
+    A source of random floats between 0 and 1.
+
+    Subclasses implement randoms, random draws a single number from it.
+    """
+
+    def random(self) -> float:
+        """
+        Returns a single random number.
+
+        Returns:
+            float: A random number between 0 and 1.
+        """
+        return self.randoms(1)[0]
+
+    @abstractmethod
+    def randoms(self, count: int) -> List[float]:
+        """
+        Returns count random numbers.
+
+        Args:
+            count (int): The number of random numbers to return.
+
+        Returns:
+            List[float]: The random numbers.
+        """
+
+
+class RandomOrgProvider(RandomProvider):
+    """Fetches every number from random.org when it is needed, one request per call."""
+
+    def randoms(self, count: int) -> List[float]:
+        random_numbers = []
+        while len(random_numbers) < count:
+            random_numbers.extend(fetch_random_org(min(count - len(random_numbers), RANDOM_ORG_MAX)))
+        return random_numbers
+
+
+class BufferedRandomOrgProvider(RandomProvider):
+    """
+    Serves random.org numbers from a buffer that is prefetched in bulk.
+
+    Whenever a draw leaves fewer than low_water numbers in the buffer, a
+    background thread fetches batches until it holds batch numbers again (one
+    thread at a time). A draw larger than the buffer fetches what is missing
+    itself.
+
+    Attributes:
+        batch (int): The number of random numbers the buffer is refilled to, fetched in one request.
+        low_water (int): The buffer size below which a background refill starts.
+    """
+
+    def __init__(self, batch: int = 1000, low_water: Optional[int] = None):
+        """
+        Initializes an empty buffer, it is filled on first use.
+
+        Args:
+            batch (int): The number of random numbers fetched per request, at most RANDOM_ORG_MAX.
+            low_water (int, optional): The refill threshold, half of batch by default.
+
+        Raises:
+            ValueError: If batch is out of range.
+        """
+        if not 1 <= batch <= RANDOM_ORG_MAX:
+            raise ValueError(f"Invalid batch size: {batch}. Must be between 1 and {RANDOM_ORG_MAX}.")
+        self.batch = batch
+        self.low_water = batch // 2 if low_water is None else low_water
+        self._buffer: deque = deque()
+        self._lock = threading.Lock()
+        self._refilling = False
+
+    def randoms(self, count: int) -> List[float]:
+        with self._lock:
+            taken = [self._buffer.popleft() for _ in range(min(count, len(self._buffer)))]
+            start = not self._refilling and len(self._buffer) < self.low_water
+            if start:
+                self._refilling = True
+        if start:
+            threading.Thread(target=self.refill, name="random-org-refill", daemon=True).start()
+        if len(taken) < count:
+            logger.info("Random number buffer empty, fetching %d numbers directly", count - len(taken))
+            taken.extend(RandomOrgProvider().randoms(count - len(taken)))
+        return taken
+
+    def refill(self) -> None:
+        """Fetches batches until the buffer holds batch numbers."""
+        try:
+            while True:
+                with self._lock:
+                    missing = self.batch - len(self._buffer)
+                if missing <= 0:
+                    return
+                random_numbers = fetch_random_org(missing)
+                with self._lock:
+                    self._buffer.extend(random_numbers)
+        except Exception as e:
+            logger.error("Unable to refill the random number buffer: %s", e)
+        finally:
+            with self._lock:
+                self._refilling = False
+
+    def size(self) -> int:
+        """
+        Returns the number of random numbers in the buffer.
+
+        Returns:
+            int: The buffer size.
+        """
+        with self._lock:
+            return len(self._buffer)
+
+
+class LocalRandomProvider(RandomProvider):
+    """
+    Generates random numbers locally from a CSPRNG.
+
+    Without a seed the numbers come from the operating system (os.urandom).
+    With a seed they come from BLAKE2b keyed with the seed over a counter, so
+    the same seed always gives the same numbers.
+
+    Attributes:
+        seed (str, optional): The seed of the generator, None for the operating system.
+    """
+
+    def __init__(self, seed: Optional[str] = None):
+        """
+        Initializes the generator.
+
+        Args:
+            seed (str, optional): The seed of the generator, None for the operating system.
+        """
+        self.seed = seed
+        self._system = random.SystemRandom() if seed is None else None
+        self._key = hashlib.blake2b(str(seed).encode()).digest() if seed is not None else None
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def randoms(self, count: int) -> List[float]:
+        if self._system is not None:
+            return [self._system.random() for _ in range(count)]
+
+        random_numbers = []
+        with self._lock:
+            while len(random_numbers) < count:
+                block = hashlib.blake2b(self._counter.to_bytes(16, "big"), key=self._key).digest()
+                self._counter += 1
+                # 53 random bits per float, the precision of a double
+                random_numbers.extend((word >> 11) * 2.0 ** -53 for word in struct.unpack(">8Q", block))
+        # The rest of the last block is dropped, the next call starts on a new block
+        return random_numbers[:count]
+
+
+class ReplayRandomProvider(RandomProvider):
+    """
+    Replays a fixed sequence of random numbers, starting over once it runs out.
+
+    Attributes:
+        values (List[float]): The numbers replayed, in order.
+    """
+
+    def __init__(self, values: Sequence[float]):
+        """
+        Initializes the replay at the start of values.
+
+        Args:
+            values (Sequence[float]): The numbers to replay.
+
+        Raises:
+            ValueError: If values is empty or a value is not between 0 and 1.
+        """
+        values = [float(value) for value in values]
+        if not values:
+            raise ValueError("Replay values must not be empty.")
+        for value in values:
+            if not 0 <= value <= 1:
+                raise ValueError(f"Invalid replay value: {value}. Must be between 0 and 1.")
+        self.values = values
+        self._position = 0
+        self._lock = threading.Lock()
+
+    def randoms(self, count: int) -> List[float]:
+        with self._lock:
+            random_numbers = []
+            for _ in range(count):
+                random_numbers.append(self.values[self._position])
+                self._position = (self._position + 1) % len(self.values)
+            return random_numbers
+
+
+PROVIDERS = ("random_org", "buffered", "local", "replay")
+
+
+def create_random_provider(name: str) -> RandomProvider:
+    """
+    Creates a randomness provider by name, configured from the environment.
+
+    Args:
+        name (str): One of PROVIDERS.
+
+    Returns:
+        RandomProvider: The provider.
+
+    Raises:
+        ValueError: If the name is unknown or its configuration is invalid.
+    """
+    name = name.lower()
+    if name == "random_org":
+        return RandomOrgProvider()
+    if name == "buffered":
+        low_water = os.getenv("RANDOM_LOW_WATER")
+        return BufferedRandomOrgProvider(batch=int(os.getenv("RANDOM_BATCH", 1000)),
+                                         low_water=int(low_water) if low_water else None)
+    if name == "local":
+        return LocalRandomProvider(seed=os.getenv("RANDOM_SEED") or None)
+    if name == "replay":
+        values = [value for value in os.getenv("RANDOM_REPLAY", "").split(",") if value.strip()]
+        return ReplayRandomProvider(values)
+    raise ValueError(f"Invalid random provider: {name}. Must be one of {', '.join(PROVIDERS)}.")
+
+
+_provider: Optional[RandomProvider] = None
+_provider_lock = threading.Lock()
+
+
+def get_random_provider() -> RandomProvider:
+    """
+    Returns the process-wide randomness provider, creating it on first use.
+
+    The provider is configured from the environment:
+        - RANDOM_PROVIDER: random_org (one request per draw, default), buffered, local or replay.
+        - RANDOM_BATCH: numbers prefetched per random.org request when buffered (default 1000).
+        - RANDOM_LOW_WATER: buffer size that starts a background refill (default half of RANDOM_BATCH).
+        - RANDOM_SEED: the seed of the local generator, unset for the operating system CSPRNG.
+        - RANDOM_REPLAY: the comma separated numbers replayed in order by replay.
+
+    Returns:
+        RandomProvider: The shared provider.
+    """
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            name = os.getenv("RANDOM_PROVIDER", "random_org")
+            _provider = create_random_provider(name)
+            logger.info("Using the %s randomness provider", name)
+        return _provider
+
+
+def get_random() -> float:
+    """
+    Returns a random float between 0 and 1 from the configured provider.
+
+    Returns:
+        float: The random number.
+
+    Raises:
+        RuntimeError: If the request to random.org fails or returns an invalid response.
+        ValueError: If the response from random.org is not a valid float.
+    """
+    random_number = get_random_provider().random()
+    logger.info("Received random number: %.3f", random_number)
+    return random_number
+
+
+def get_randoms(count: int) -> List[float]:
+    """
+    Returns count random floats between 0 and 1 from the configured provider in one draw.
+
+    Args:
+        count (int): The number of random numbers.
+
+    Returns:
+        List[float]: The random numbers.
+
+    Raises:
+        RuntimeError: If the request to random.org fails or returns an invalid response.
+        ValueError: If the response from random.org is not a list of valid floats.
+    """
+    return get_random_provider().randoms(count)
@@ -2,6 +2,9 @@ from contextlib import contextmanager
 import logging
 import os
 import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
 
 from meal_max.utils.logger import configure_logger
 
@@ -14,6 +17,255 @@ configure_logger(logger)
 DB_PATH = os.getenv("DB_PATH", "/app/sql/meal_max.db")
 
 
+JOURNAL_MODES = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+
+
+class ConnectionPool:
+    """
+    A thread-aware pool of SQLite connections.
+
+    A thread keeps the connection it checked out until its outermost
+    checkout ends, so nested checkouts share one connection (and one
+    transaction). Returned connections are kept open, and a thread gets
+    back the connection it used last when it is still idle. At most
+    max_size connections are open at once; a checkout waits up to timeout
+    seconds for one to be returned. Pragmas are set once per connection,
+    and a connection idle for longer than check_interval seconds is pinged
+    before it is handed out and replaced if it no longer works.
+
+    Attributes:
+        path (str): The path of the database file.
+        max_size (int): The maximum number of open connections.
+        timeout (float): The number of seconds a checkout waits for a free connection.
+        check_interval (float): The idle time after which a connection is checked before use.
+        pragmas (Dict[str, object]): The pragmas set on every new connection.
+    """
+
+    def __init__(self, path: str, max_size: int = 5, timeout: float = 30,
+                 check_interval: float = 30, journal_mode: str = "WAL",
+                 busy_timeout: int = 5000, cache_size: int = -16000):
+        """
+        Initializes an empty pool, connections are opened on demand.
+
+        Args:
+            path (str): The path of the database file.
+            max_size (int): The maximum number of open connections.
+            timeout (float): The number of seconds a checkout waits for a free connection.
+            check_interval (float): The idle time in seconds after which a connection is checked before use.
+            journal_mode (str): The journal mode of the database (WAL by default).
+            busy_timeout (int): The milliseconds a statement waits on a locked database.
+            cache_size (int): The page cache size, in pages or in KiB when negative.
+
+        Raises:
+            ValueError: If max_size is not positive or journal_mode is unknown.
+        """
+        if max_size < 1:
+            raise ValueError(f"Invalid pool size: {max_size}. Must be at least 1.")
+        journal_mode = journal_mode.upper()
+        if journal_mode not in JOURNAL_MODES:
+            raise ValueError(f"Invalid journal mode: {journal_mode}. Must be one of {', '.join(JOURNAL_MODES)}.")
+
+        self.path = path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.pragmas = {"journal_mode": journal_mode, "busy_timeout": int(busy_timeout), "cache_size": int(cache_size)}
+
+        self._cond = threading.Condition()
+        self._idle: List[sqlite3.Connection] = []
+        self._returned: Dict[sqlite3.Connection, float] = {}
+        self._open = 0
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Opens a new connection and sets the pool's pragmas on it.
+
+        Returns:
+            sqlite3.Connection: The new connection.
+        """
+        # Connections move between threads, but only one thread uses a connection at a time
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        try:
+            for name, value in self.pragmas.items():
+                conn.execute(f"PRAGMA {name} = {value}")
+        except sqlite3.Error:
+            conn.close()
+            raise
+        logger.info("Opened pooled database connection to %s", self.path)
+        return conn
+
+    def _healthy(self, conn: sqlite3.Connection) -> bool:
+        """
+        Checks that a connection still answers queries.
+
+        Args:
+            conn (sqlite3.Connection): The connection to check.
+
+        Returns:
+            bool: True if the connection works.
+        """
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error as e:
+            logger.warning("Discarding broken database connection: %s", str(e))
+            return False
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        """Closes a connection and frees its slot in the pool."""
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    def _acquire(self) -> sqlite3.Connection:
+        """
+        Takes an idle connection, opens a new one, or waits for one to be returned.
+
+        Returns:
+            sqlite3.Connection: A working connection owned by the calling thread.
+
+        Raises:
+            sqlite3.OperationalError: If no connection is free within the timeout.
+        """
+        deadline = time.monotonic() + self.timeout
+        preferred = getattr(self._local, "last", None)
+        while True:
+            with self._cond:
+                while not self._idle and self._open >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        logger.error("Timed out waiting for a database connection")
+                        raise sqlite3.OperationalError(
+                            f"Timed out waiting for a database connection after {self.timeout} seconds")
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn = preferred if preferred in self._idle else self._idle[-1]
+                    self._idle.remove(conn)
+                    returned = self._returned.pop(conn)
+                else:
+                    conn = None
+                    self._open += 1
+
+            if conn is None:
+                try:
+                    return self._connect()
+                except sqlite3.Error:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+            if time.monotonic() - returned < self.check_interval or self._healthy(conn):
+                return conn
+            self._discard(conn)
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        """
+        Returns a connection to the pool, rolling back anything left uncommitted.
+
+        Args:
+            conn (sqlite3.Connection): The connection to return.
+        """
+        if conn.in_transaction:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                self._discard(conn)
+                return
+        self._local.last = conn
+        with self._cond:
+            self._idle.append(conn)
+            self._returned[conn] = time.monotonic()
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager checking out a connection for the calling thread.
+
+        Nested checkouts in the same thread get the same connection, and it
+        goes back to the pool when the outermost one ends.
+
+        Yields:
+            sqlite3.Connection: The pooled connection.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self._release(conn)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the number of open and idle connections.
+
+        Returns:
+            Dict[str, int]: The open and idle counts and the maximum size of the pool.
+        """
+        with self._cond:
+            return {"open": self._open, "idle": len(self._idle), "max_size": self.max_size}
+
+    def close(self) -> None:
+        """Closes every idle connection, connections in use are closed when they are returned."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._returned.clear()
+        for conn in idle:
+            self._discard(conn)
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_connection_pool() -> ConnectionPool:
+    """
+    Returns the process-wide ConnectionPool for DB_PATH, creating it on first use.
+
+    The pool is configured from the environment:
+        - DB_POOL_SIZE: the maximum number of open connections (default 5).
+        - DB_POOL_TIMEOUT: seconds to wait for a free connection (default 30).
+        - DB_POOL_CHECK_INTERVAL: idle seconds after which a connection is checked (default 30).
+        - DB_JOURNAL_MODE: the journal mode (default WAL).
+        - DB_BUSY_TIMEOUT: milliseconds to wait on a locked database (default 5000).
+        - DB_CACHE_SIZE: the page cache size, in KiB when negative (default -16000).
+
+    Returns:
+        ConnectionPool: The shared pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                DB_PATH,
+                max_size=int(os.getenv("DB_POOL_SIZE", 5)),
+                timeout=float(os.getenv("DB_POOL_TIMEOUT", 30)),
+                check_interval=float(os.getenv("DB_POOL_CHECK_INTERVAL", 30)),
+                journal_mode=os.getenv("DB_JOURNAL_MODE", "WAL"),
+                busy_timeout=int(os.getenv("DB_BUSY_TIMEOUT", 5000)),
+                cache_size=int(os.getenv("DB_CACHE_SIZE", -16000))
+            )
+            logger.info("Created database connection pool for %s with %d connections", DB_PATH, _pool.max_size)
+        return _pool
+
+
 def check_database_connection():
     """Check the database connection
 
@@ -53,19 +305,14 @@ def check_table_exists(tablename: str):
 @contextmanager
 def get_db_connection():
     """
-    Context manager for SQLite database connection.
+    Context manager for a pooled SQLite database connection.
 
     Yields:
         sqlite3.Connection: The SQLite connection object.
     """
-    conn = None
     try:
-        conn = sqlite3.connect(DB_PATH)
-        yield conn
+        with get_connection_pool().connection() as conn:
+            yield conn
     except sqlite3.Error as e:
         logger.error("Database connection error: %s", str(e))
         raise e
-    finally:
-        if conn:
-            conn.close()
-            logger.info("Database connection closed.")
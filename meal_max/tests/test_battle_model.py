@@ -126,7 +126,7 @@ def test_battle(battle_model, sample_combatants, caplog, mocker):
     # Mock the battle functions
     mocker.patch("meal_max.models.battle_model.BattleModel.get_battle_score", side_effect=[85.5, 102.0])
     mocker.patch("meal_max.models.battle_model.get_random", return_value=0.42)
-    mock_update_stats = mocker.patch("meal_max.models.battle_model.update_meal_stats")
+    mock_settle_battle = mocker.patch("meal_max.models.battle_model.settle_battle")
 
     # Call the battle method
     winner_meal = battle_model.battle()
@@ -134,9 +134,8 @@ def test_battle(battle_model, sample_combatants, caplog, mocker):
     # Ensure the winner is combatant_2 since score_2 > score_1
     assert winner_meal == "Pizza", f"Expected combatant 2 to win, but got {winner_meal}"
 
-    # Ensure update_stats was called correctly for both winner and loser
-    mock_update_stats.assert_any_call(1, 'loss')  # combatant_1 is the loser
-    mock_update_stats.assert_any_call(2, 'win')   # combatant_2 is the winner
+    # Ensure the battle was settled once with combatant_2 as the winner
+    mock_settle_battle.assert_called_once_with(2, 1)
 
     # Check that combatant_1 was removed from the combatants list
     assert len(battle_model.combatants) == 1, "Losing combatant was not removed from the list."
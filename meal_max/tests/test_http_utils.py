@@ -0,0 +1,147 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
+
+import pytest
+import requests
+
+from meal_max.utils.http_utils import HttpClient, parse_host_timeouts
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves canned responses and records the client port of every request."""
+
+    # HTTP/1.1 so the stub keeps connections alive like a real upstream
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, self.client_address[1]))
+
+        if self.path == "/slow":
+            time.sleep(0.5)
+        status = 200
+        if self.path == "/flaky" and server.failures > 0:
+            server.failures -= 1
+            status = 503
+
+        body = b"0.42"
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    """A threaded server that ignores clients hanging up mid-response."""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    """Runs a local HTTP server for the duration of a test."""
+    server = StubServer(("127.0.0.1", 0), StubHandler)
+    server.requests = []
+    server.failures = 0
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def url_for(server, path: str) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+######################################################
+#
+#    Client
+#
+######################################################
+
+
+def test_get(stub_server):
+    """Test fetching a response through the pooled client."""
+    client = HttpClient()
+
+    response = client.get(url_for(stub_server, "/random"))
+
+    assert response.status_code == 200
+    assert response.text == "0.42"
+
+
+def test_connections_are_reused(stub_server):
+    """Test that sequential requests share one keep-alive connection."""
+    client = HttpClient()
+
+    for _ in range(5):
+        client.get(url_for(stub_server, "/random"))
+
+    ports = {port for _, port in stub_server.requests}
+    assert len(stub_server.requests) == 5
+    assert len(ports) == 1, f"Expected a single reused connection, got {len(ports)}"
+
+
+def test_retry_on_unavailable(stub_server):
+    """Test that 503 responses are retried with backoff until one succeeds."""
+    stub_server.failures = 2
+    client = HttpClient(retries=2, backoff=0)
+
+    response = client.get(url_for(stub_server, "/flaky"))
+
+    assert response.status_code == 200
+    assert len(stub_server.requests) == 3
+
+
+def test_retries_exhausted_returns_last_response(stub_server):
+    """Test that the last response is returned once the retries run out."""
+    stub_server.failures = 5
+    client = HttpClient(retries=1, backoff=0)
+
+    response = client.get(url_for(stub_server, "/flaky"))
+
+    assert response.status_code == 503
+    assert len(stub_server.requests) == 2
+
+
+def test_host_timeout(stub_server):
+    """Test that a per-host timeout applies and read timeouts are not retried."""
+    client = HttpClient(default_timeout=5, timeouts={"127.0.0.1": 0.1})
+
+    with pytest.raises(requests.exceptions.Timeout):
+        client.get(url_for(stub_server, "/slow"))
+
+    assert len(stub_server.requests) == 1
+
+
+def test_timeout_for():
+    """Test choosing the timeout of a URL by its host."""
+    client = HttpClient(default_timeout=5, timeouts={"www.random.org": 2})
+
+    assert client.timeout_for("https://www.random.org/decimal-fractions/") == 2
+    assert client.timeout_for("https://api.openbrewerydb.org/v1/breweries") == 5
+
+
+def test_parse_host_timeouts():
+    """Test parsing host timeouts from their environment form."""
+    assert parse_host_timeouts("www.random.org=2, API.example.com=0.5,") == {"www.random.org": 2.0, "api.example.com": 0.5}
+    assert parse_host_timeouts("") == {}
+
+    with pytest.raises(ValueError, match="Invalid host timeout: nope"):
+        parse_host_timeouts("nope")
@@ -4,7 +4,7 @@ import sqlite3
 
 import pytest
 
-from meal_max.models.kitchen_model import create_meal, delete_meal, get_leaderboard, get_meal_by_id, get_meal_by_name, Meal, update_meal_stats
+from meal_max.models.kitchen_model import create_meal, delete_meal, get_leaderboard, get_meal_by_id, get_meal_by_name, get_meals_by_ids, Meal, settle_battle, settle_battles, update_meal_stats
 
 ######################################################
 #
@@ -190,6 +190,31 @@ def test_get_meal_by_name_deleted(mock_cursor):
         get_meal_by_name("Sphagetti")
 
 
+def test_get_meals_by_ids(mock_cursor):
+    """Test getting several meals in one query, in the order of their IDs."""
+    mock_cursor.fetchall.return_value = [(1, "Meal A", "Cuisine A", 10.99, "LOW", False), (2, "Meal B", "Cuisine B", 5.5, "HIGH", False)]
+
+    result = get_meals_by_ids([2, 1])
+
+    assert [meal.id for meal in result] == [2, 1]
+    expected_query = normalize_whitespace("SELECT id, meal, cuisine, price, difficulty, deleted FROM meals WHERE id IN (?, ?)")
+    actual_query = normalize_whitespace(mock_cursor.execute.call_args[0][0])
+    assert actual_query == expected_query, "The SQL query did not match the expected structure."
+    assert mock_cursor.execute.call_args[0][1] == (2, 1)
+
+
+def test_get_meals_by_ids_deleted(mock_cursor):
+    """Test getting several meals when one has been marked as deleted."""
+    mock_cursor.fetchall.return_value = [(1, "Meal A", "Cuisine A", 10.99, "LOW", False), (2, "Meal B", "Cuisine B", 5.5, "HIGH", True)]
+
+    with pytest.raises(ValueError, match="Meal with ID 2 has been deleted"):
+        get_meals_by_ids([1, 2])
+
+    mock_cursor.fetchall.return_value = [(1, "Meal A", "Cuisine A", 10.99, "LOW", False)]
+    with pytest.raises(ValueError, match="Meal with ID 3 not found"):
+        get_meals_by_ids([1, 3])
+
+
 def test_update_meal_stats_win(mock_cursor):
     """Test updating the meal stats for a win."""
     mock_cursor.fetchone.return_value = ([False])
@@ -238,6 +263,52 @@ def test_update_meal_stats_deleted(mock_cursor):
         update_meal_stats(999, 'win')
 
 
+def test_settle_battle(mock_cursor):
+    """Test settling a battle updates both meals in one transaction."""
+    mock_cursor.rowcount = 1
+
+    settle_battle(2, 1)
+
+    expected_sql = normalize_whitespace("UPDATE meals SET battles = battles + ?, wins = wins + ? WHERE id = ? AND deleted = FALSE")
+    calls = mock_cursor.execute.call_args_list
+    assert len(calls) == 2, f"Expected one UPDATE per meal, got {len(calls)} statements."
+    for call in calls:
+        assert normalize_whitespace(call[0][0]) == expected_sql, "The SQL query did not match the expected structure."
+
+    actual_args = [call[0][1] for call in calls]
+    expected_args = [(1, 0, 1), (1, 1, 2)]
+    assert actual_args == expected_args, f"The SQL arguments did not match. Expected {expected_args}, got {actual_args}."
+
+
+def test_settle_battles_aggregates(mock_cursor):
+    """Test that a batch of battles updates each meal once with its totals."""
+    mock_cursor.rowcount = 1
+
+    settle_battles([(1, 2), (1, 3), (3, 2)])
+
+    actual_args = [call[0][1] for call in mock_cursor.execute.call_args_list]
+    expected_args = [(2, 2, 1), (2, 0, 2), (2, 1, 3)]
+    assert actual_args == expected_args, f"The SQL arguments did not match. Expected {expected_args}, got {actual_args}."
+
+
+def test_settle_battle_bad_id(mock_cursor):
+    """Test settling a battle with a meal that does not exist."""
+    mock_cursor.rowcount = 0
+    mock_cursor.fetchone.return_value = None
+
+    with pytest.raises(ValueError, match="Meal with ID 1 not found"):
+        settle_battle(2, 1)
+
+
+def test_settle_battle_deleted(mock_cursor):
+    """Test settling a battle with a meal that has been marked as deleted."""
+    mock_cursor.rowcount = 0
+    mock_cursor.fetchone.return_value = ([1])
+
+    with pytest.raises(ValueError, match="Meal with ID 1 has been deleted"):
+        settle_battle(2, 1)
+
+
 def test_get_leaderboard(mock_cursor):
     """Test retrieving the leaderboard sorted by wins."""
     mock_cursor.fetchall.return_value = [
@@ -1,23 +1,36 @@
+import time
+
 import pytest
 import requests
 
-from meal_max.utils.random_utils import get_random
+from meal_max.utils.random_utils import (
+    BufferedRandomOrgProvider, create_random_provider, fetch_random_org, get_random, get_random_provider,
+    get_randoms, LocalRandomProvider, RandomOrgProvider, RandomProvider, ReplayRandomProvider
+)
 
 
 RANDOM_NUMBER = 0.42
 
 
 @pytest.fixture
-def mock_random_org(mocker):
-    # Patch the requests.get call
-    # requests.get returns an object, which we have replaced with a mock object
+def mock_http_client(mocker):
+    # Patch the shared HTTP client so no request leaves the process
+    mock_client = mocker.Mock()
+    mocker.patch("meal_max.utils.random_utils.get_http_client", return_value=mock_client)
+    # Use a fresh unbuffered provider so every draw makes its own request
+    mocker.patch("meal_max.utils.random_utils._provider", RandomOrgProvider())
+    return mock_client
+
+@pytest.fixture
+def mock_random_org(mock_http_client, mocker):
+    # client.get returns an object, which we have replaced with a mock object
     mock_response = mocker.Mock()
     # We are giving that object a text attribute
     mock_response.text = f"{RANDOM_NUMBER}"
-    mocker.patch("requests.get", return_value=mock_response)
+    mock_http_client.get.return_value = mock_response
     return mock_response
 
-def test_get_random(mock_random_org):
+def test_get_random(mock_random_org, mock_http_client):
     """Test retrieving a random number from random.org."""
     result = get_random()
 
@@ -25,20 +38,20 @@ def test_get_random(mock_random_org):
     assert result == RANDOM_NUMBER, f"Expected random number {RANDOM_NUMBER}, but got {result}"
 
     # Ensure that the correct URL was called
-    requests.get.assert_called_once_with("https://www.random.org/decimal-fractions/?num=1&dec=2&col=1&format=plain&rnd=new", timeout=5)
+    mock_http_client.get.assert_called_once_with("https://www.random.org/decimal-fractions/?num=1&dec=2&col=1&format=plain&rnd=new")
 
-def test_get_random_request_failure(mocker):
+def test_get_random_request_failure(mock_http_client):
     """Test handling of a request failure when calling random.org."""
     # Simulate a request failure
-    mocker.patch("requests.get", side_effect=requests.exceptions.RequestException("Connection error"))
+    mock_http_client.get.side_effect = requests.exceptions.RequestException("Connection error")
 
     with pytest.raises(RuntimeError, match="Request to random.org failed: Connection error"):
         get_random()
 
-def test_get_random_timeout(mocker):
+def test_get_random_timeout(mock_http_client):
     """Test handling of a timeout when calling random.org."""
     # Simulate a timeout
-    mocker.patch("requests.get", side_effect=requests.exceptions.Timeout)
+    mock_http_client.get.side_effect = requests.exceptions.Timeout
 
     with pytest.raises(RuntimeError, match="Request to random.org timed out."):
         get_random()
@@ -50,3 +63,104 @@ def test_get_random_invalid_response(mock_random_org):
 
     with pytest.raises(ValueError, match="Invalid response from random.org: invalid_response"):
         get_random()
+
+
+######################################################
+#
+#    Providers
+#
+######################################################
+
+
+def test_fetch_random_org_bulk(mock_random_org, mock_http_client):
+    """Test fetching many random numbers from random.org in one request."""
+    mock_random_org.text = "0.1\n0.2\n0.3\n"
+
+    assert fetch_random_org(3) == [0.1, 0.2, 0.3]
+    mock_http_client.get.assert_called_once_with("https://www.random.org/decimal-fractions/?num=3&dec=2&col=1&format=plain&rnd=new")
+
+def test_fetch_random_org_short_response(mock_random_org):
+    """Test handling of a response with fewer numbers than requested."""
+    mock_random_org.text = "0.1\n0.2\n"
+
+    with pytest.raises(ValueError, match="expected 3 numbers, got 2"):
+        fetch_random_org(3)
+
+def test_buffered_provider(mocker):
+    """Test that the buffered provider draws from a buffer refilled in bulk."""
+    mock_fetch = mocker.patch("meal_max.utils.random_utils.fetch_random_org", side_effect=lambda count: [0.5] * count)
+    provider = BufferedRandomOrgProvider(batch=100, low_water=10)
+
+    # The buffer starts empty, so the first draw is fetched directly and starts a refill
+    assert provider.random() == 0.5
+    for _ in range(100):
+        if provider.size() == 100:
+            break
+        time.sleep(0.01)
+    assert provider.size() == 100
+
+    calls = mock_fetch.call_count
+    assert provider.randoms(50) == [0.5] * 50
+    assert mock_fetch.call_count == calls, "Draws from a full buffer should not fetch."
+    assert provider.size() == 50
+
+def test_provider_requires_randoms():
+    """Test that a provider can only be created once randoms is implemented."""
+    class Incomplete(RandomProvider):
+        pass
+
+    class Constant(RandomProvider):
+        def randoms(self, count):
+            return [0.5] * count
+
+    with pytest.raises(TypeError, match="randoms"):
+        RandomProvider()
+    with pytest.raises(TypeError, match="randoms"):
+        Incomplete()
+    assert Constant().random() == 0.5
+
+def test_buffered_provider_invalid_batch():
+    """Test that a batch larger than random.org serves is rejected."""
+    with pytest.raises(ValueError, match="Invalid batch size: 10001"):
+        BufferedRandomOrgProvider(batch=10001)
+
+def test_local_provider_seeded():
+    """Test that a seeded local provider is deterministic and in range."""
+    first = LocalRandomProvider(seed="battle").randoms(20)
+    second = LocalRandomProvider(seed="battle")
+
+    assert second.randoms(5) == first[:5]
+    assert all(0 <= value < 1 for value in first)
+    assert LocalRandomProvider(seed="other").randoms(20) != first
+
+def test_local_provider_unseeded():
+    """Test that an unseeded local provider uses the operating system CSPRNG."""
+    values = LocalRandomProvider().randoms(10)
+
+    assert len(values) == 10
+    assert all(0 <= value < 1 for value in values)
+
+def test_replay_provider():
+    """Test that the replay provider repeats its values in order."""
+    provider = ReplayRandomProvider([0.1, 0.9])
+
+    assert provider.randoms(3) == [0.1, 0.9, 0.1]
+    assert provider.random() == 0.9
+
+    with pytest.raises(ValueError, match="Invalid replay value: 1.5"):
+        ReplayRandomProvider([1.5])
+
+def test_provider_from_environment(mocker, monkeypatch):
+    """Test that get_random uses the provider selected by RANDOM_PROVIDER."""
+    mocker.patch("meal_max.utils.random_utils._provider", None)
+    monkeypatch.setenv("RANDOM_PROVIDER", "replay")
+    monkeypatch.setenv("RANDOM_REPLAY", "0.25,0.75")
+
+    assert isinstance(get_random_provider(), ReplayRandomProvider)
+    assert get_random() == 0.25
+    assert get_randoms(2) == [0.75, 0.25]
+
+def test_invalid_provider():
+    """Test that an unknown provider name is rejected."""
+    with pytest.raises(ValueError, match="Invalid random provider: dice"):
+        create_random_provider("dice")
@@ -0,0 +1,106 @@
+from contextlib import contextmanager
+
+import numpy as np
+import pytest
+
+from meal_max.models.battle_model import BattleModel
+from meal_max.models.kitchen_model import Meal
+from meal_max.models.simulation_model import delta_matrix, load_meal_arrays, simulate_win_probabilities, win_probability_matrix
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+
+MEAL_ROWS = [
+    (1, "Spaghetti", "Italian", 12.5, "MED"),
+    (2, "Pizza", "Italian", 15.0, "LOW"),
+    (3, "Taco", "Mexican", 3.0, "LOW"),
+    (4, "Pho", "Vietnamese", 9.0, "HIGH")
+]
+
+@pytest.fixture
+def mock_cursor(mocker):
+    mock_conn = mocker.Mock()
+    mock_cursor = mocker.Mock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = MEAL_ROWS
+
+    @contextmanager
+    def mock_get_db_connection():
+        yield mock_conn
+
+    mocker.patch("meal_max.models.simulation_model.get_db_connection", mock_get_db_connection)
+    return mock_cursor
+
+
+######################################################
+#
+#    Simulation
+#
+######################################################
+
+
+def test_load_meal_arrays(mock_cursor):
+    """Test loading the meals that are not deleted into arrays."""
+    arrays = load_meal_arrays()
+
+    assert "WHERE deleted = false" in mock_cursor.execute.call_args[0][0]
+    assert arrays['ids'].tolist() == [1, 2, 3, 4]
+    assert arrays['cuisine_lengths'].tolist() == [7, 7, 7, 10]
+    assert arrays['modifiers'].tolist() == [2, 3, 3, 1]
+
+def test_delta_matrix_matches_battle_scores(mock_cursor):
+    """Test that every delta matches the delta of BattleModel scores."""
+    battle_model = BattleModel()
+    meals = [Meal(*row) for row in MEAL_ROWS]
+    arrays = load_meal_arrays()
+
+    deltas = delta_matrix(arrays['prices'], arrays['cuisine_lengths'], arrays['modifiers'])
+
+    for i, meal_1 in enumerate(meals):
+        for j, meal_2 in enumerate(meals):
+            expected = abs(battle_model.get_battle_score(meal_1) - battle_model.get_battle_score(meal_2)) / 100
+            assert deltas[i, j] == pytest.approx(expected)
+
+def test_win_probability_matrix_converges():
+    """Test that simulated probabilities converge to the deltas, capped at 1."""
+    deltas = np.array([[0.0, 0.3, 1.4], [0.3, 0.0, 0.8], [1.4, 0.8, 0.0]])
+
+    probabilities = win_probability_matrix(deltas, 200000, seed=1)
+
+    assert np.allclose(probabilities, np.minimum(deltas, 1), atol=0.01)
+    assert np.array_equal(probabilities, win_probability_matrix(deltas, 200000, seed=1)), "A seed should make the simulation repeatable."
+
+def test_win_probability_matrix_chunks(mocker):
+    """Test that trials split into chunks are all counted."""
+    mocker.patch("meal_max.models.simulation_model.CHUNK_SIZE", 10)
+    deltas = np.array([[0.0, 2.0], [2.0, 0.0]])
+
+    probabilities = win_probability_matrix(deltas, 25, seed=0)
+
+    assert probabilities.tolist() == [[0.0, 1.0], [1.0, 0.0]]
+
+def test_win_probability_matrix_invalid_trials():
+    """Test that the number of trials must be in range."""
+    with pytest.raises(ValueError, match="Invalid trials: 0"):
+        win_probability_matrix(np.zeros((2, 2)), 0)
+
+def test_simulate_win_probabilities(mock_cursor):
+    """Test the simulation result of every meal against every other meal."""
+    result = simulate_win_probabilities(1000, seed=0)
+
+    assert [meal['meal'] for meal in result['meals']] == ["Spaghetti", "Pizza", "Taco", "Pho"]
+    assert result['trials'] == 1000
+    assert len(result['matrix']) == 4 and all(len(row) == 4 for row in result['matrix'])
+    assert all(result['matrix'][i][i] == 0 for i in range(4))
+
+def test_simulate_too_many_battles(mock_cursor, mocker):
+    """Test that a simulation larger than MAX_BATTLES is rejected."""
+    mocker.patch("meal_max.models.simulation_model.MAX_BATTLES", 1000)
+
+    with pytest.raises(ValueError, match="Too many battles to simulate: 1600"):
+        simulate_win_probabilities(100)
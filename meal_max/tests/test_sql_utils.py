@@ -0,0 +1,140 @@
+import sqlite3
+import threading
+
+import pytest
+
+from meal_max.utils import sql_utils
+from meal_max.utils.sql_utils import ConnectionPool, get_db_connection
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Creates a database file with a meals table."""
+    path = str(tmp_path / "meal_max.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE meals (id INTEGER PRIMARY KEY, meal TEXT)")
+    conn.close()
+    return path
+
+@pytest.fixture
+def pool(db_path):
+    """Provides a small pool over the test database."""
+    pool = ConnectionPool(db_path, max_size=2, timeout=0.2)
+    yield pool
+    pool.close()
+
+
+######################################################
+#
+#    Pool
+#
+######################################################
+
+
+def test_connection_is_reused(pool):
+    """Test that sequential checkouts in one thread reuse the same connection."""
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+    assert pool.stats() == {"open": 1, "idle": 1, "max_size": 2}
+
+def test_nested_checkouts_share_connection(pool):
+    """Test that nested checkouts in one thread share a connection and its transaction."""
+    with pool.connection() as outer:
+        outer.execute("INSERT INTO meals (meal) VALUES ('Spaghetti')")
+        with pool.connection() as inner:
+            assert inner is outer
+            assert inner.in_transaction
+        outer.commit()
+
+    assert pool.stats()["open"] == 1
+
+def test_pragmas_are_set(pool):
+    """Test that new connections get the pool's pragmas."""
+    with pool.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == -16000
+
+def test_uncommitted_work_is_rolled_back(pool):
+    """Test that a connection returned mid-transaction is rolled back."""
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO meals (meal) VALUES ('Spaghetti')")
+            raise RuntimeError("boom")
+
+    with pool.connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM meals").fetchone()[0] == 0
+
+def test_pool_max_size(pool):
+    """Test that checkouts beyond max_size time out instead of opening more connections."""
+    held = threading.Event()
+    done = threading.Event()
+
+    def hold():
+        with pool.connection():
+            held.set()
+            done.wait(5)
+
+    threads = [threading.Thread(target=hold) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+        held.wait(5)
+        held.clear()
+
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="Timed out waiting for a database connection"):
+            with pool.connection():
+                pass
+        assert pool.stats()["open"] == 2
+    finally:
+        done.set()
+        for thread in threads:
+            thread.join()
+
+    with pool.connection():
+        assert pool.stats() == {"open": 2, "idle": 1, "max_size": 2}
+
+def test_broken_connection_is_replaced(db_path):
+    """Test that a connection failing its health check is replaced."""
+    pool = ConnectionPool(db_path, max_size=1, check_interval=0)
+    with pool.connection() as first:
+        pass
+    first.close()
+
+    with pool.connection() as second:
+        assert second is not first
+        assert second.execute("SELECT 1").fetchone() == (1,)
+    assert pool.stats()["open"] == 1
+    pool.close()
+
+def test_invalid_pool_settings(db_path):
+    """Test that an invalid size or journal mode is rejected."""
+    with pytest.raises(ValueError, match="Invalid pool size: 0"):
+        ConnectionPool(db_path, max_size=0)
+
+    with pytest.raises(ValueError, match="Invalid journal mode: FAST"):
+        ConnectionPool(db_path, journal_mode="fast")
+
+def test_get_db_connection_uses_pool(pool, mocker):
+    """Test that get_db_connection checks connections out of the shared pool."""
+    mocker.patch.object(sql_utils, "get_connection_pool", return_value=pool)
+
+    with get_db_connection() as first:
+        first.execute("INSERT INTO meals (meal) VALUES ('Pizza')")
+        first.commit()
+    with get_db_connection() as second:
+        assert second.execute("SELECT meal FROM meals").fetchall() == [("Pizza",)]
+
+    assert first is second
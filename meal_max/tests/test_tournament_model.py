@@ -0,0 +1,159 @@
+import pytest
+
+from meal_max.models.battle_model import BattleModel
+from meal_max.models.kitchen_model import Meal
+from meal_max.models.tournament_model import count_battles, get_battle_scores, run_tournament, Tournament
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+
+CUISINES = ["Italian", "Thai", "Mexican", "French", "Indian", "Greek", "Korean", "Spanish"]
+
+
+def make_meals(count: int) -> list:
+    return [Meal(id=i + 1, meal=f"Meal {i + 1}", cuisine=CUISINES[i % len(CUISINES)],
+                 price=5.0 + 2.5 * i, difficulty=["LOW", "MED", "HIGH"][i % 3]) for i in range(count)]
+
+@pytest.fixture
+def mock_tournament(mocker):
+    """Mocks loading meals, drawing random numbers and settling battles."""
+    meals = {}
+
+    def get_meals_by_ids(meal_ids):
+        return [meals[meal_id] for meal_id in meal_ids]
+
+    for meal in make_meals(16):
+        meals[meal.id] = meal
+    mocker.patch("meal_max.models.tournament_model.get_meals_by_ids", side_effect=get_meals_by_ids)
+    mock_randoms = mocker.patch("meal_max.models.tournament_model.get_randoms", side_effect=lambda count: [0.5] * count)
+    mock_settle = mocker.patch("meal_max.models.tournament_model.settle_battles")
+    return mock_randoms, mock_settle
+
+
+######################################################
+#
+#    Scoring
+#
+######################################################
+
+
+def test_get_battle_scores():
+    """Test that vectorized scores match get_battle_score for every meal."""
+    meals = make_meals(10)
+    battle_model = BattleModel()
+
+    scores = get_battle_scores(meals)
+
+    assert scores.tolist() == [battle_model.get_battle_score(meal) for meal in meals]
+
+def test_play_round_follows_battle_rules():
+    """Test that combatant 1 wins exactly when the normalized delta beats the random number."""
+    meals = [Meal(1, "Spaghetti", "Italian", 12.5, "MED"), Meal(2, "Pizza", "Italian", 15.0, "LOW"),
+             Meal(3, "Taco", "Mexican", 3.0, "LOW"), Meal(4, "Pho", "Vietnamese", 9.0, "HIGH")]
+    # delta(Spaghetti, Pizza) = 0.165, delta(Taco, Pho) = 0.71
+    tournament = Tournament(meals, [0.42, 0.42])
+
+    winners, losers = tournament.play_round("round 1", [0, 2], [1, 3])
+
+    assert winners == [1, 2]
+    assert losers == [0, 3]
+    assert tournament.results == [(2, 1), (3, 4)]
+    assert tournament.rounds[0]['battles'][0] == {
+        'combatant_1': "Spaghetti", 'combatant_2': "Pizza", 'winner': "Pizza", 'delta': 0.165, 'random': 0.42
+    }
+
+
+######################################################
+#
+#    Formats
+#
+######################################################
+
+
+@pytest.mark.parametrize("size", [2, 3, 5, 8, 13])
+def test_single_elimination(mock_tournament, size):
+    """Test that a knockout bracket plays n - 1 battles and settles them once."""
+    mock_randoms, mock_settle = mock_tournament
+
+    result = run_tournament(list(range(1, size + 1)), "single_elimination")
+
+    assert result['battles'] == size - 1
+    mock_randoms.assert_called_once_with(size - 1)
+    mock_settle.assert_called_once()
+    assert len(mock_settle.call_args[0][0]) == size - 1
+
+    standings = result['standings']
+    assert standings[0]['meal'] == result['champion']
+    assert standings[0]['losses'] == 0
+    assert all(standing['losses'] == 1 for standing in standings[1:])
+    # After the first round the bracket is a power of two
+    remaining = size - len(result['rounds'][0]['battles'])
+    assert remaining & (remaining - 1) == 0
+
+@pytest.mark.parametrize("size", [2, 5, 16])
+def test_double_elimination(mock_tournament, size):
+    """Test that every meal but the champion is eliminated after two losses."""
+    mock_randoms, mock_settle = mock_tournament
+
+    result = run_tournament(list(range(1, size + 1)), "double_elimination")
+
+    mock_randoms.assert_called_once_with(2 * size - 1)
+    standings = result['standings']
+    assert standings[0]['losses'] <= 1
+    assert all(standing['losses'] == 2 for standing in standings[1:])
+    assert result['battles'] in (2 * size - 2, 2 * size - 1)
+    assert len(mock_settle.call_args[0][0]) == result['battles']
+    assert result['rounds'][-1]['round'].startswith("grand final")
+
+def test_round_robin(mock_tournament):
+    """Test that every meal battles every other meal once and standings follow wins."""
+    mock_randoms, mock_settle = mock_tournament
+
+    result = run_tournament([1, 2, 3, 4, 5, 6], "round_robin")
+
+    assert result['battles'] == 15
+    mock_randoms.assert_called_once_with(15)
+    pairs = {frozenset(pair) for pair in mock_settle.call_args[0][0]}
+    assert len(pairs) == 15
+
+    standings = result['standings']
+    assert all(standing['wins'] + standing['losses'] == 5 for standing in standings)
+    wins = [standing['wins'] for standing in standings]
+    assert wins == sorted(wins, reverse=True)
+
+def test_count_battles():
+    """Test the number of random numbers drawn for each format."""
+    assert count_battles("single_elimination", 64) == 63
+    assert count_battles("double_elimination", 64) == 127
+    assert count_battles("round_robin", 64) == 2016
+
+
+######################################################
+#
+#    Validation
+#
+######################################################
+
+
+def test_tournament_invalid_format(mock_tournament):
+    """Test that an unknown format is rejected."""
+    with pytest.raises(ValueError, match="Invalid tournament format: swiss"):
+        run_tournament([1, 2], "swiss")
+
+def test_tournament_too_few_meals(mock_tournament):
+    """Test that a tournament needs at least two meals."""
+    with pytest.raises(ValueError, match="A tournament needs between 2 and 256 meals, got 1."):
+        run_tournament([1])
+
+def test_tournament_duplicate_meals(mock_tournament):
+    """Test that a meal cannot enter twice."""
+    _, mock_settle = mock_tournament
+
+    with pytest.raises(ValueError, match="A meal can only enter a tournament once."):
+        run_tournament([1, 2, 1])
+    mock_settle.assert_not_called()
@@ -1,39 +1,105 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+#parses a raw singular response, a lone brewery is returned in a list like a list of 1 brewery
+def parse_singular(response):
+    item = json.loads(response)
+    if type(item) != list:
+        item = [item]
+    return item
+
+
 class Memory:
     """
     a class, representing a stack, to store recent successful api responses
+    the stack is a fixed size ring buffer, so adding (and evicting) is O(1)
+    and the most recent singular response is tracked as it is added, so getRecent is O(1)
+    responses are stored once as their raw JSON bytes and only parsed by getRecent
 
     Attributes:
-        stack : a list to store api responses
+        stack : a deque to store the raw api responses, most recent first
         maxLength: the maximum number of items the stack can store
+        recent: the most recent singular api response
+        added: the number of responses added so far
+        recentAdded: the value of added when recent was added
+        bytes: the total size in bytes of the responses in the stack
+        onResize: called as onResize(memory, change in bytes) after every add, if given
+        lock: guards the stack so one memory can be shared between request threads
     """
 
-    def __init__(self, limit):
+    def __init__(self, limit, onResize=None):
         """
-        initializes the memory as an empty array
+        initializes the memory as an empty ring buffer
         initializes the maxLength as an integer passed into the object
         """
-        self.stack = [] #needs to always have at least 1 value
+        self.stack = deque(maxlen=limit)
         self.maxLength = limit
+        self.recent = None
+        self.added = 0
+        self.recentAdded = 0
+        self.bytes = 0
+        self.onResize = onResize
+        self.lock = threading.Lock()
+
 
-    
     def stringRep(self):
         """
         returns:
-            the values of the stack, in order, as a string
+            the values of the stack, in order, as a JSON array string
+        """
+        return b"".join(self.chunks()).decode()
+
+    def chunks(self):
+        """
+        yields the stack, in order, as the pieces of a JSON array
+        the responses are yielded as stored, without being parsed or re-serialized
+        """
+        with self.lock:
+            responses = list(self.stack) #copies references, not bytes
+        yield b"["
+        for i, response in enumerate(responses):
+            yield response if i == 0 else b", " + response
+        yield b"]"
+
+    def entrySizes(self):
+        """
+        returns:
+            the size in bytes of every response in the stack, in order
         """
-        return str(self.stack)
+        with self.lock:
+            return [len(response) for response in self.stack]
 
-    def add(self, item):
+    def add(self, response, count):
         """
-        adds an item to the front of the stack
-        if the stack is full, removes the last item before adding
+        adds a response (its raw JSON bytes) to the front of the stack
+        count is the number of breweries in the response, a response of 1 brewery is singular
+        if the stack is full, the last item falls off the end
+        """
+        if count <= 0 or self.maxLength <= 0:
+            return
+        with self.lock:
+            change = len(response)
+            if len(self.stack) == self.maxLength:
+                change -= len(self.stack[-1])
+            self.stack.appendleft(response)
+            self.bytes += change
+            self.added += 1
+            if count == 1:
+                self.recent = response
+                self.recentAdded = self.added
+        if self.onResize is not None:
+            self.onResize(self, change)
+
+    def size(self):
+        """
+        returns:
+            the total size in bytes of the responses in the stack
         """
-        if len(self.stack) >= self.maxLength:
-            self.stack.pop(-1)
-        if type(item) != list:
-            item = [item]
-        if len(item) > 0:
-            self.stack.insert(0, item)
+        return self.bytes
 
     def getMaxLength(self):
         """
@@ -45,13 +111,345 @@ class Memory:
     def getRecent(self):
         """
         attempts to return the most recent singular api response
-        by traversing through its values
-        
+
+        returns:
+            the most recent singular api response
+            if none ^ exists (or it has been pushed out of the stack), None
+        """
+        #recent is still in the stack if fewer than maxLength responses were added after it
+        with self.lock:
+            if self.recent is None or self.added - self.recentAdded >= self.maxLength:
+                return None
+            response = self.recent
+        return parse_singular(response)
+
+
+class MemoryStore:
+    """
+    a class holding a separate Memory for every user/session
+
+    sessions that have not been used for idleTimeout seconds are dropped, and once there are
+    maxSessions sessions (or their responses take more than maxBytes) the least recently used
+    ones are dropped, so the store never holds more than maxBytes of responses in total
+
+    a session is only created once a response has to be stored in it, and until its client
+    sends the session cookie back it is "new" and counted against maxNewSessions instead,
+    so clients that ignore cookies only ever evict each other, not the established sessions
+
+    Attributes:
+        memories: session key -> (Memory, time last used) of established sessions, least recently used first
+        newMemories: the same for new sessions
+        limit: the maxLength of each session's Memory
+        maxSessions: the maximum number of established sessions kept
+        maxNewSessions: the maximum number of new sessions kept
+        maxBytes: the maximum total size in bytes of the responses kept
+        idleTimeout: the number of seconds an unused session is kept
+        bytes: the total size in bytes of the responses kept
+    """
+
+    def __init__(self, limit, maxSessions, idleTimeout, maxBytes=None, maxNewSessions=None):
+        """
+        initializes the store with no sessions
+        maxBytes defaults to no byte budget and maxNewSessions to maxSessions
+        """
+        self.memories = OrderedDict()
+        self.newMemories = OrderedDict()
+        self.limit = limit
+        self.maxSessions = maxSessions
+        self.maxNewSessions = maxSessions if maxNewSessions is None else maxNewSessions
+        self.maxBytes = maxBytes
+        self.idleTimeout = idleTimeout
+        self.bytes = 0
+        self.counted = {} #Memory -> bytes of it counted in self.bytes, only for the memories held
+        self.lock = threading.Lock() #only held to look up/create/drop sessions, not while they are used
+
+    def get(self, key, new=False):
+        """
+        gets the Memory of a session to store responses in, creating the session if it is unknown or was dropped
+        new is True for a session the client has not sent back yet (it was just started)
+
+        returns:
+            the Memory of the session
+        """
+        now = time.monotonic()
+        with self.lock:
+            entry = self.memories.pop(key, None) or self.newMemories.pop(key, None)
+            if entry is not None:
+                memory = entry[0]
+            else:
+                memory = Memory(self.limit, self.resized)
+                self.counted[memory] = 0
+            (self.newMemories if new else self.memories)[key] = (memory, now)
+            self.evict(now)
+            return memory
+
+    def peek(self, key):
+        """
+        gets the Memory of a session to read, without creating the session
+
+        returns:
+            the Memory of the session, a new empty one (that is not kept) if the session is unknown or was dropped
+        """
+        now = time.monotonic()
+        with self.lock:
+            for memories in (self.memories, self.newMemories):
+                entry = memories.pop(key, None)
+                if entry is not None:
+                    memories[key] = (entry[0], now)
+                    return entry[0]
+        return Memory(self.limit)
+
+    def resized(self, memory, change):
+        """
+        counts the bytes a session's Memory grew (or shrank) by, dropping sessions if over maxBytes
+        changes of a Memory that is no longer held are ignored
+        """
+        with self.lock:
+            if memory not in self.counted:
+                return
+            self.counted[memory] += change
+            self.bytes += change
+            self.evict(time.monotonic())
+
+    def evict(self, now):
+        """
+        drops idle sessions, then the least recently used sessions over maxNewSessions/maxSessions,
+        then the least recently used sessions (new ones first) until the responses fit in maxBytes
+        the caller holds the lock
+        """
+        #sessions are ordered by last use, so the idle ones are all at the front
+        for memories, maxSessions in ((self.newMemories, self.maxNewSessions), (self.memories, self.maxSessions)):
+            while memories:
+                oldestKey, (_, lastUsed) = next(iter(memories.items()))
+                if len(memories) <= maxSessions and now - lastUsed <= self.idleTimeout:
+                    break
+                self.drop(memories, oldestKey)
+        if self.maxBytes is not None:
+            for memories in (self.newMemories, self.memories):
+                while memories and self.bytes > self.maxBytes:
+                    self.drop(memories, next(iter(memories)))
+
+    def drop(self, memories, key):
+        """
+        drops a session and stops counting its bytes, the caller holds the lock
+        """
+        memory, _ = memories.pop(key)
+        self.bytes -= self.counted.pop(memory)
+
+    def sessions(self):
+        """
+        returns:
+            the number of sessions currently held
+        """
+        with self.lock:
+            return len(self.memories) + len(self.newMemories)
+
+
+class SQLiteMemory:
+    """
+    a Memory kept in a sqlite table instead of in the process, so every worker process
+    sees the same recent api responses for a session
+    same add/getRecent/stringRep/getMaxLength behaviour as Memory
+
+    Attributes:
+        store: the SQLiteMemoryStore holding the database connection
+        key: the session this memory belongs to
+        maxLength: the maximum number of items the stack can store
+    """
+
+    def __init__(self, store, key, limit):
+        """
+        initializes a view of one session's memory in the store
+        """
+        self.store = store
+        self.key = key
+        self.maxLength = limit
+
+    def stringRep(self):
+        """
+        returns:
+            the values of the stack, in order, as a JSON array string
+        """
+        return b"".join(self.chunks()).decode()
+
+    def chunks(self):
+        """
+        yields the stack, in order, as the pieces of a JSON array
+        rows are read in batches and yielded as stored, without being parsed or re-serialized
+        """
+        cursor = self.store.connection().execute(
+            "SELECT response FROM memory WHERE session = ? ORDER BY seq DESC", (self.key,))
+        yield b"["
+        first = True
+        rows = cursor.fetchmany(64)
+        while rows:
+            for row in rows:
+                yield row[0] if first else b", " + row[0]
+                first = False
+            rows = cursor.fetchmany(64)
+        yield b"]"
+
+    def entrySizes(self):
+        """
+        returns:
+            the size in bytes of every response in the stack, in order
+        """
+        rows = self.store.connection().execute(
+            "SELECT length(response) FROM memory WHERE session = ? ORDER BY seq DESC", (self.key,)).fetchall()
+        return [row[0] for row in rows]
+
+    def add(self, response, count):
+        """
+        adds a response (its raw JSON bytes) to the front of the stack
+        count is the number of breweries in the response, a response of 1 brewery is singular
+        if the stack is full, the last item is deleted
+        """
+        if count <= 0 or self.maxLength <= 0:
+            return
+        conn = self.store.connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE") #takes the write lock before reading the next seq
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM memory WHERE session = ?", (self.key,)).fetchone()[0]
+            conn.execute("INSERT INTO memory (session, seq, response, singular) VALUES (?, ?, ?, ?)",
+                         (self.key, seq, response, count == 1))
+            conn.execute("DELETE FROM memory WHERE session = ? AND seq <= ?", (self.key, seq - self.maxLength))
+
+    def getMaxLength(self):
+        """
+        returns:
+            the maxLength of the stack
+        """
+        return self.maxLength
+
+    def getRecent(self):
+        """
+        attempts to return the most recent singular api response
+
         returns:
             the most recent singular api response
             if none ^ exists, None
         """
-        for i in self.stack:
-            if len(i) == 1:
-                return i
-        return None
\ No newline at end of file
+        row = self.store.connection().execute(
+            "SELECT response FROM memory WHERE session = ? AND singular = 1 ORDER BY seq DESC LIMIT 1", (self.key,)).fetchone()
+        if row == None:
+            return None
+        return parse_singular(row[0])
+
+
+class SQLiteMemoryStore:
+    """
+    a MemoryStore backed by a sqlite database in WAL mode, shared by every process using the same file
+
+    idle sessions and sessions over maxSessions (or maxNewSessions, see MemoryStore) are deleted at most
+    once every sweepInterval seconds, so the database never holds much more than maxSessions * limit responses
+
+    Attributes:
+        path: the path of the sqlite database
+        limit: the maxLength of each session's memory
+        maxSessions: the maximum number of established sessions kept
+        maxNewSessions: the maximum number of new sessions kept
+        idleTimeout: the number of seconds an unused session is kept
+        sweepInterval: the minimum number of seconds between two eviction sweeps
+    """
+
+    def __init__(self, path, limit, maxSessions, idleTimeout, sweepInterval=1, maxNewSessions=None):
+        """
+        initializes the store, creating its tables if needed
+        maxNewSessions defaults to maxSessions
+        """
+        self.path = path
+        self.limit = limit
+        self.maxSessions = maxSessions
+        self.maxNewSessions = maxSessions if maxNewSessions is None else maxNewSessions
+        self.idleTimeout = idleTimeout
+        self.sweepInterval = sweepInterval
+        self.lastSweep = 0
+        self.local = threading.local() #one connection per thread
+        conn = self.connection()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS memory (
+                session TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                response BLOB NOT NULL,
+                singular BOOLEAN NOT NULL,
+                PRIMARY KEY (session, seq)
+            );
+            CREATE INDEX IF NOT EXISTS memory_singular ON memory (session, singular, seq);
+            CREATE TABLE IF NOT EXISTS memory_sessions (
+                session TEXT PRIMARY KEY,
+                last_used REAL NOT NULL,
+                new BOOLEAN NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS memory_sessions_last_used ON memory_sessions (last_used);
+        """)
+        #memory databases made before sessions were marked as new
+        if "new" not in [row[1] for row in conn.execute("PRAGMA table_info(memory_sessions)")]:
+            try:
+                conn.execute("ALTER TABLE memory_sessions ADD COLUMN new BOOLEAN NOT NULL DEFAULT 0")
+            except sqlite3.OperationalError: #another process added it first
+                pass
+
+    def connection(self):
+        """
+        returns:
+            the sqlite connection of the calling thread, opening it in WAL mode if needed
+        """
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            #isolation_level=None so transactions are only the ones opened explicitly
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def get(self, key, new=False):
+        """
+        gets the memory of a session to store responses in, creating the session if it is unknown or was dropped
+        new is True for a session the client has not sent back yet (it was just started)
+
+        returns:
+            the memory of the session
+        """
+        now = time.time()
+        conn = self.connection()
+        conn.execute("INSERT INTO memory_sessions (session, last_used, new) VALUES (?, ?, ?) "
+                     "ON CONFLICT (session) DO UPDATE SET last_used = excluded.last_used, new = excluded.new", (key, now, new))
+        if now - self.lastSweep >= self.sweepInterval:
+            self.lastSweep = now
+            self.sweep(now)
+        return SQLiteMemory(self, key, self.limit)
+
+    def peek(self, key):
+        """
+        gets the memory of a session to read, without creating the session
+
+        returns:
+            the memory of the session, empty if the session is unknown or was dropped
+        """
+        self.connection().execute("UPDATE memory_sessions SET last_used = ? WHERE session = ?", (time.time(), key))
+        return SQLiteMemory(self, key, self.limit)
+
+    def sweep(self, now):
+        """
+        deletes idle sessions and the least recently used sessions over maxSessions (or maxNewSessions)
+        """
+        conn = self.connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            doomed = conn.execute("""
+                SELECT session FROM memory_sessions WHERE last_used < ?
+                UNION
+                SELECT session FROM (SELECT session FROM memory_sessions WHERE new = 0 ORDER BY last_used DESC LIMIT -1 OFFSET ?)
+                UNION
+                SELECT session FROM (SELECT session FROM memory_sessions WHERE new = 1 ORDER BY last_used DESC LIMIT -1 OFFSET ?)
+            """, (now - self.idleTimeout, self.maxSessions, self.maxNewSessions)).fetchall()
+            conn.executemany("DELETE FROM memory WHERE session = ?", doomed)
+            conn.executemany("DELETE FROM memory_sessions WHERE session = ?", doomed)
+
+    def sessions(self):
+        """
+        returns:
+            the number of sessions currently held
+        """
+        return self.connection().execute("SELECT COUNT(*) FROM memory_sessions").fetchone()[0]
@@ -0,0 +1,71 @@
+"""
+moves favorites out of the favorite_brew_1..favorite_brew_5 JSON columns of users
+into the breweries and favorites tables, then drops the old columns
+
+    python migrate_favorites.py [path to db, users.db by default]
+
+safe to run more than once, a db that was already migrated is left alone
+"""
+import json
+import sqlite3
+import sys
+
+from sqlalchemy import create_engine
+
+from models import Base
+
+FAVORITE_COLUMNS = [f'favorite_brew_{position}' for position in range(1, 6)]
+
+
+def migrate(path):
+    """
+    migrates the favorites of every user in the db at path in one transaction
+
+    returns:
+        the number of favorites migrated
+    """
+    #creates the breweries and favorites tables (and their indexes) if they do not exist yet
+    Base.metadata.create_all(create_engine(f'sqlite:///{path}'))
+
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(users)")]
+        present = [column for column in FAVORITE_COLUMNS if column in columns]
+        if not present:
+            return 0
+
+        migrated = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(f'SELECT id, {", ".join(present)} FROM users')
+            for row in rows.fetchall():
+                user_id = row[0]
+                for column, value in zip(present, row[1:]):
+                    brewery = json.loads(value) if value != None else None
+                    if brewery == None: #cleared favorites can be stored as JSON null
+                        continue
+                    if type(brewery) == list: #favorites were stored as the singular response from memory
+                        brewery = brewery[0]
+                    position = int(column.rsplit("_", 1)[1])
+                    conn.execute("INSERT INTO breweries (id, data) VALUES (?, ?) "
+                                 "ON CONFLICT (id) DO UPDATE SET data = excluded.data",
+                                 (brewery["id"], json.dumps(brewery)))
+                    conn.execute("INSERT INTO favorites (user_id, position, brewery_id) VALUES (?, ?, ?) "
+                                 "ON CONFLICT (user_id, position) DO UPDATE SET brewery_id = excluded.brewery_id",
+                                 (user_id, position, brewery["id"]))
+                    migrated += 1
+            for column in present:
+                conn.execute(f'ALTER TABLE users DROP COLUMN {column}')
+            conn.execute("COMMIT")
+        except:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("VACUUM") #gives back the space the JSON blobs used
+        return migrated
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else "users.db"
+    print(f'migrated {migrate(path)} favorites in {path}')
@@ -0,0 +1,53 @@
+"""
+rebuilds the users table with AUTOINCREMENT, so the id of a deleted user is never given to a new one
+(a plain INTEGER PRIMARY KEY reuses the highest id once that user is deleted)
+
+    python migrate_users.py [path to db, users.db by default]
+
+run it after migrate_favorites.py, safe to run more than once, a db that was already migrated is left alone
+"""
+import sqlite3
+import sys
+
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateTable
+
+from models import User
+
+
+def migrate(path):
+    """
+    copies every user of the db at path into a users table with AUTOINCREMENT, in one transaction
+    ids are kept, so the favorites of every user still point at them
+
+    returns:
+        True if the table was rebuilt, False if it already uses AUTOINCREMENT
+    """
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'users'").fetchone()
+        if row == None or "AUTOINCREMENT" in row[0].upper():
+            return False
+        columns = [column.name for column in User.__table__.columns]
+        if [row[1] for row in conn.execute("PRAGMA table_info(users)")] != columns:
+            raise ValueError(f'users has to have the columns {columns}, run migrate_favorites.py first')
+
+        create = str(CreateTable(User.__table__).compile(dialect=sqlite.dialect())).strip()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(create.replace("CREATE TABLE users ", "CREATE TABLE users_new ", 1))
+            conn.execute(f'INSERT INTO users_new ({", ".join(columns)}) SELECT {", ".join(columns)} FROM users')
+            conn.execute("DROP TABLE users")
+            conn.execute("ALTER TABLE users_new RENAME TO users")
+            conn.execute("COMMIT")
+        except:
+            conn.execute("ROLLBACK")
+            raise
+        return True
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else "users.db"
+    print(f'{"rebuilt" if migrate(path) else "nothing to do for"} the users table in {path}')
@@ -0,0 +1,492 @@
+"""
+a local copy of the open brewery db in sqlite, so brewery routes do not wait on the api
+
+    python mirror.py sync [--pages N]   pulls the dataset from the api (N pages per run, all by default)
+    python mirror.py load <file>        loads breweries from a JSON list or NDJSON file (no network)
+
+a sync walks the api page by page and upserts every brewery, it remembers the next page
+so runs of a few pages each refresh the mirror incrementally, and once it reaches the last
+page the breweries it did not see in that pass are deleted and the mirror is complete
+"""
+import argparse
+import difflib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from cache import TTLCache
+from geo import GridIndex, nearest_of, parse_point
+
+#list-breweries filters answered locally (by_dist with the geo index), unknown queries are not
+LOCAL_FILTERS = ["by_city", "by_country", "by_dist", "by_ids", "by_name", "by_postal", "by_state", "by_type"]
+#sort fields of the api -> columns
+SORT_COLUMNS = {"id": "id", "name": "name", "type": "brewery_type", "brewery_type": "brewery_type", "city": "city",
+                "state": "state", "state_province": "state_province", "postal": "postal_code",
+                "postal_code": "postal_code", "country": "country"}
+#how similar (0 to 1) a fuzzy autocomplete match has to be, and how many matches of a pass are ranked
+FUZZY_SIMILARITY = 0.6
+SEARCH_CANDIDATES = 200
+COLUMNS = ["id", "name", "brewery_type", "city", "state_province", "state", "postal_code", "country", "latitude", "longitude"]
+
+
+#reads a coordinate the api sends as a number, a string or null
+def coordinate(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+#the column values of a brewery and its raw JSON
+def brewery_row(brewery):
+    return (brewery["id"], brewery.get("name"), brewery.get("brewery_type"), brewery.get("city"),
+            brewery.get("state_province"), brewery.get("state") or brewery.get("state_province"),
+            brewery.get("postal_code"), brewery.get("country"),
+            coordinate(brewery.get("latitude")), coordinate(brewery.get("longitude")),
+            json.dumps(brewery).encode())
+
+
+#joins raw brewery JSON objects into a raw JSON list
+def json_list(rows):
+    return b"[" + b",".join(rows) + b"]"
+
+
+class BreweryMirror:
+    """
+    breweries stored in a sqlite database (WAL, one connection per thread) with an index
+    for every list-breweries filter, queried the way the api answers the same requests
+
+    by_dist queries are ranked by a GridIndex of the brewery coordinates, built in memory
+    and rebuilt when the mirror changes
+
+    Attributes:
+        path: the path of the sqlite database
+        local: the connection of each thread
+        geo: (mirror version, GridIndex) of the last index built
+        samples: (mirror version, filters) -> array of the rowids matching the filters, for random sampling
+        rng: the random generator samples are drawn with
+    """
+
+    def __init__(self, path):
+        """
+        initializes the mirror, creating its tables if needed
+        """
+        self.path = path
+        self.local = threading.local()
+        self.geo = (None, None)
+        self.geoLock = threading.Lock()
+        self.samples = TTLCache(256, 300)
+        self.rng = np.random.default_rng()
+        self.connection().executescript("""
+            CREATE TABLE IF NOT EXISTS mirror_breweries (
+                id TEXT PRIMARY KEY,
+                name TEXT,
+                brewery_type TEXT,
+                city TEXT,
+                state_province TEXT,
+                state TEXT,
+                postal_code TEXT,
+                country TEXT,
+                latitude REAL,
+                longitude REAL,
+                data BLOB NOT NULL,
+                last_seen INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS mirror_breweries_name ON mirror_breweries (name COLLATE NOCASE, id);
+            CREATE INDEX IF NOT EXISTS mirror_breweries_city ON mirror_breweries (city COLLATE NOCASE, name COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS mirror_breweries_state ON mirror_breweries (state COLLATE NOCASE, name COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS mirror_breweries_type ON mirror_breweries (brewery_type, name COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS mirror_breweries_postal ON mirror_breweries (postal_code COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS mirror_breweries_country ON mirror_breweries (country COLLATE NOCASE, name COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS mirror_breweries_last_seen ON mirror_breweries (last_seen);
+            CREATE TABLE IF NOT EXISTS mirror_state (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+        """)
+        self.createSearch()
+
+    def createSearch(self):
+        """
+        creates the search indexes over brewery names and cities, kept up to date by triggers
+            mirror_search: words, with prefix indexes for autocomplete
+            mirror_trigrams: trigrams, for substring (by_name) and fuzzy matches
+        both index the rows of mirror_breweries (by rowid) without a copy of them
+        """
+        conn = self.connection()
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'mirror_search'").fetchone():
+            return
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("CREATE VIRTUAL TABLE mirror_search USING fts5(name, city, content='mirror_breweries', "
+                         "tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')")
+            conn.execute("CREATE VIRTUAL TABLE mirror_trigrams USING fts5(name, city, content='mirror_breweries', "
+                         "tokenize='trigram')")
+            for table in ["mirror_search", "mirror_trigrams"]:
+                conn.execute(f"""
+                    CREATE TRIGGER {table}_insert AFTER INSERT ON mirror_breweries BEGIN
+                        INSERT INTO {table} (rowid, name, city) VALUES (new.rowid, new.name, new.city);
+                    END""")
+                conn.execute(f"""
+                    CREATE TRIGGER {table}_delete AFTER DELETE ON mirror_breweries BEGIN
+                        INSERT INTO {table} ({table}, rowid, name, city) VALUES ('delete', old.rowid, old.name, old.city);
+                    END""")
+                conn.execute(f"""
+                    CREATE TRIGGER {table}_update AFTER UPDATE OF name, city ON mirror_breweries BEGIN
+                        INSERT INTO {table} ({table}, rowid, name, city) VALUES ('delete', old.rowid, old.name, old.city);
+                        INSERT INTO {table} (rowid, name, city) VALUES (new.rowid, new.name, new.city);
+                    END""")
+                conn.execute(f"INSERT INTO {table} ({table}) VALUES ('rebuild')") #indexes breweries already mirrored
+
+    def optimizeSearch(self):
+        """
+        merges the search indexes, so the entries of deleted and replaced breweries stop slowing down searches
+        """
+        conn = self.connection()
+        for table in ["mirror_search", "mirror_trigrams"]:
+            conn.execute(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
+
+    def connection(self):
+        """
+        returns:
+            the sqlite connection of the calling thread, opening it in WAL mode if needed
+        """
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def state(self, key, default=0):
+        """
+        returns:
+            a value of the sync state
+        """
+        row = self.connection().execute("SELECT value FROM mirror_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row != None else default
+
+    def ready(self):
+        """
+        returns:
+            True once the mirror holds a complete dataset, a full sync or a load
+        """
+        return self.state("complete") == 1
+
+    def count(self):
+        """
+        returns:
+            the number of breweries in the mirror
+        """
+        return self.connection().execute("SELECT COUNT(*) FROM mirror_breweries").fetchone()[0]
+
+    def upsert(self, conn, breweries, syncId):
+        """
+        inserts or replaces breweries, marking them as seen by the sync syncId, inside a transaction
+        """
+        conn.executemany(f"""
+            INSERT INTO mirror_breweries ({", ".join(COLUMNS)}, data, last_seen) VALUES ({", ".join("?" * (len(COLUMNS) + 2))})
+            ON CONFLICT (id) DO UPDATE SET {", ".join(f'{column} = excluded.{column}' for column in COLUMNS[1:])},
+                data = excluded.data, last_seen = excluded.last_seen
+        """, [brewery_row(brewery) + (syncId,) for brewery in breweries])
+        conn.execute("INSERT INTO mirror_state (key, value) VALUES ('version', 1) "
+                     "ON CONFLICT (key) DO UPDATE SET value = value + 1")
+
+    def add(self, breweries):
+        """
+        adds (or refreshes) breweries that were fetched from the api outside of a sync
+        they count as seen by the pass in progress (or the next one), so the end of that pass
+        keeps them and only a later pass that does not see them deletes them
+        """
+        conn = self.connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self.upsert(conn, breweries, self.state("sync_id") + 1)
+
+    def load(self, breweries):
+        """
+        replaces the whole mirror with breweries and marks it complete
+
+        returns:
+            the number of breweries loaded
+        """
+        conn = self.connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM mirror_breweries")
+            self.upsert(conn, breweries, 0)
+            conn.executemany("INSERT OR REPLACE INTO mirror_state (key, value) VALUES (?, ?)",
+                             [("sync_id", 0), ("next_page", 1), ("complete", 1)])
+        self.optimizeSearch()
+        return self.count()
+
+    def sync(self, fetchPage, perPage=200, maxPages=None):
+        """
+        pulls pages of breweries, fetchPage(page, perPage) -> list of breweries, continuing from where
+        the last sync stopped, every page is upserted in its own transaction
+        a short page is the last one, the breweries not seen since the pass started are then deleted
+
+        returns:
+            {"pages", "breweries", "deleted", "complete"} of this run
+        """
+        syncId = self.state("sync_id")
+        page = self.state("next_page", 1)
+        stats = {"pages": 0, "breweries": 0, "deleted": 0, "complete": False}
+        conn = self.connection()
+        while maxPages == None or stats["pages"] < maxPages:
+            breweries = fetchPage(page, perPage)
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                self.upsert(conn, breweries, syncId + 1)
+                if len(breweries) < perPage: #the end of the dataset, this pass saw every brewery
+                    stats["deleted"] = conn.execute("DELETE FROM mirror_breweries WHERE last_seen <= ?", (syncId,)).rowcount
+                    syncId += 1
+                    page = 1
+                    stats["complete"] = True
+                else:
+                    page += 1
+                conn.executemany("INSERT OR REPLACE INTO mirror_state (key, value) VALUES (?, ?)",
+                                 [("sync_id", syncId), ("next_page", page)]
+                                 + ([("complete", 1)] if stats["complete"] else []))
+            stats["pages"] += 1
+            stats["breweries"] += len(breweries)
+            if stats["complete"]:
+                self.optimizeSearch()
+                break
+        return stats
+
+    def get(self, id):
+        """
+        returns:
+            the raw JSON of a brewery, None if it is not in the mirror
+        """
+        row = self.connection().execute("SELECT data FROM mirror_breweries WHERE id = ?", (id,)).fetchone()
+        return row[0] if row != None else None
+
+    def where(self, queries):
+        """
+        returns:
+            (SQL conditions, parameters) for the list-breweries filters in queries
+        """
+        conditions = []
+        params = []
+        for key in LOCAL_FILTERS:
+            value = queries.get(key)
+            if value == None or key == "by_dist":
+                continue
+            if key == "by_ids":
+                ids = [id for id in value.split(",") if id]
+                conditions.append(f'id IN ({", ".join("?" * len(ids))})')
+                params += ids
+                continue
+            value = value.replace("_", " ") if key in ["by_city", "by_state", "by_country", "by_name"] else value
+            if key == "by_name" and len(value) >= 3:
+                #substring match like the api, found through the trigram index
+                conditions.append("rowid IN (SELECT rowid FROM mirror_trigrams WHERE name LIKE ?)")
+                params.append(f'%{value}%')
+            elif key == "by_name":
+                conditions.append("name LIKE ?") #too short for trigrams, LIKE ignores case
+                params.append(f'%{value}%')
+            elif key == "by_postal":
+                conditions.append("postal_code LIKE ?") #44107 also matches 44107-4020
+                params.append(f'{value}%')
+            elif key == "by_type":
+                conditions.append("brewery_type = ?")
+                params.append(value.lower())
+            else:
+                column = {"by_city": "city", "by_state": "state", "by_country": "country"}[key]
+                conditions.append(f'{column} = ? COLLATE NOCASE')
+                params.append(value)
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def orderBy(self, sort):
+        """
+        returns:
+            the SQL ORDER BY of an api sort ("name,city:desc"), None if it sorts on an unknown field
+        """
+        terms = []
+        for term in (sort or "name").split(","):
+            field, _, direction = term.partition(":")
+            if field not in SORT_COLUMNS or direction not in ["", "asc", "desc"]:
+                return None
+            collate = "" if field == "id" else " COLLATE NOCASE"
+            terms.append(f'{SORT_COLUMNS[field]}{collate} {direction or "asc"}')
+        return " ORDER BY " + ", ".join(terms + ["id"])
+
+    def page(self, queries):
+        """
+        answers a list-breweries request from the mirror
+        queries are the normalized queries of the request (page and per_page included)
+
+        returns:
+            (raw JSON list, number of breweries), None if a query can not be answered locally
+            raises ValueError if by_dist is not a valid point
+        """
+        if any(key not in LOCAL_FILTERS + ["page", "per_page", "sort"] for key in queries):
+            return None
+        perPage = int(queries["per_page"])
+        offset = (int(queries["page"]) - 1) * perPage
+        if "by_dist" in queries:
+            return self.pageByDistance(queries, offset, perPage)
+        order = self.orderBy(queries.get("sort"))
+        if order == None:
+            return None
+        where, params = self.where(queries)
+        rows = self.connection().execute(f'SELECT data FROM mirror_breweries{where}{order} LIMIT ? OFFSET ?',
+                                         params + [perPage, offset]).fetchall()
+        return json_list([row[0] for row in rows]), len(rows)
+
+    def geoIndex(self):
+        """
+        returns:
+            the GridIndex of every brewery with coordinates, rebuilt if the mirror changed since it was built
+        """
+        version = self.state("version")
+        with self.geoLock:
+            if self.geo[0] != version:
+                rows = self.connection().execute(
+                    "SELECT id, latitude, longitude FROM mirror_breweries WHERE latitude IS NOT NULL AND longitude IS NOT NULL").fetchall()
+                ids, lats, lons = zip(*rows) if rows else ((), (), ())
+                self.geo = (version, GridIndex(ids, lats, lons))
+            return self.geo[1]
+
+    def pageByDistance(self, queries, offset, perPage):
+        """
+        answers a list-breweries request with by_dist=lat,lon, breweries nearest to the point first
+        with no other filter the geo index finds them, otherwise the filtered breweries are ranked by a scan
+
+        returns:
+            (raw JSON list, number of breweries)
+            raises ValueError if by_dist is not a valid point (see geo.parse_point)
+        """
+        lat, lon = parse_point(queries["by_dist"])
+        where, params = self.where(queries)
+        if where:
+            rows = self.connection().execute(
+                f'SELECT id, latitude, longitude FROM mirror_breweries{where} AND latitude IS NOT NULL AND longitude IS NOT NULL',
+                params).fetchall()
+            ids = [row[0] for row in rows]
+            positions, _ = nearest_of(lat, lon, [row[1] for row in rows], [row[2] for row in rows], offset + perPage)
+            nearest = [ids[position] for position in positions.tolist()]
+        else:
+            nearest, _ = self.geoIndex().nearest(lat, lon, offset + perPage)
+        nearest = nearest[offset:]
+        if not nearest:
+            return json_list([]), 0
+        data = dict(self.connection().execute(
+            f'SELECT id, data FROM mirror_breweries WHERE id IN ({", ".join("?" * len(nearest))})', nearest).fetchall())
+        return json_list([data[id] for id in nearest]), len(nearest)
+
+    def autocomplete(self, query, limit=10):
+        """
+        suggests breweries for what has been typed so far, in three passes that each run only
+        if the ones before found fewer than limit:
+            - names starting with query, alphabetically, straight from the name index
+            - names or cities with words starting with the words of query ("sierra nev"),
+                names weighing more than cities, ranked by bm25 over the first SEARCH_CANDIDATES matches
+            - names like query (typos included), ranked by how similar they are
+
+        returns:
+            a list of {"id", "name", "city", "state"}, best match first
+        """
+        words = re.findall(r"\w+", query.lower())
+        if not words or limit <= 0:
+            return []
+        conn = self.connection()
+        prefix = query.strip().replace("%", "").replace("_", "")
+        rows = conn.execute("SELECT id, name, city, state FROM mirror_breweries WHERE name LIKE ? "
+                            "ORDER BY name COLLATE NOCASE LIMIT ?", (f'{prefix}%', limit)).fetchall()
+        if len(rows) < limit:
+            rows += self.without(rows, conn.execute("""
+                SELECT b.id, b.name, b.city, b.state FROM (
+                    SELECT rowid, bm25(mirror_search, 10.0, 1.0) AS score FROM mirror_search WHERE mirror_search MATCH ? LIMIT ?
+                ) AS found JOIN mirror_breweries b ON b.rowid = found.rowid ORDER BY found.score LIMIT ?
+            """, (" ".join(f'"{word}"*' for word in words), SEARCH_CANDIDATES, limit)).fetchall())[:limit - len(rows)]
+        trigrams = {word[i:i + 3] for word in words for i in range(len(word) - 2)}
+        if len(rows) < limit and trigrams:
+            candidates = self.without(rows, conn.execute("""
+                SELECT b.id, b.name, b.city, b.state FROM (
+                    SELECT rowid, bm25(mirror_trigrams, 10.0, 1.0) AS score FROM mirror_trigrams WHERE mirror_trigrams MATCH ? LIMIT ?
+                ) AS found JOIN mirror_breweries b ON b.rowid = found.rowid ORDER BY found.score LIMIT ?
+            """, (" OR ".join(f'"{trigram}"' for trigram in trigrams), SEARCH_CANDIDATES, limit * 10)).fetchall())
+            #compared with the start of the name, so a long name is not penalized for its length
+            text = " ".join(words)
+            scored = [(difflib.SequenceMatcher(None, text, (row[1] or "").lower()[:len(text)]).ratio(), row) for row in candidates]
+            rows += [row for score, row in sorted(scored, key=lambda pair: -pair[0]) if score >= FUZZY_SIMILARITY][:limit - len(rows)]
+        return [{"id": id, "name": name, "city": city, "state": state} for id, name, city, state in rows]
+
+    def without(self, rows, candidates):
+        """
+        returns:
+            the candidates that are not already in rows
+        """
+        found = {row[0] for row in rows}
+        return [row for row in candidates if row[0] not in found]
+
+    def sample(self, queries, size):
+        """
+        picks size different breweries uniformly at random among the ones matching the list-breweries
+        filters in queries (by_dist aside), the rowids of the matches are kept per mirror version and
+        filters, so a pick is a draw from an array and a lookup by rowid
+
+        returns:
+            (raw JSON list, number of breweries), None if a query can not be answered locally
+        """
+        if any(key not in LOCAL_FILTERS or key == "by_dist" for key in queries):
+            return None
+        where, params = self.where(queries)
+        key = (self.state("version"), where, tuple(params))
+        rowids = self.samples.fetch(key, lambda: np.fromiter(
+            (row[0] for row in self.connection().execute(f'SELECT rowid FROM mirror_breweries{where}', params)), dtype=np.int64))
+        picks = self.rng.choice(rowids, min(size, len(rowids)), replace=False).tolist()
+        if not picks:
+            return json_list([]), 0
+        rows = self.connection().execute(
+            f'SELECT data FROM mirror_breweries WHERE rowid IN ({", ".join("?" * len(picks))})', picks).fetchall()
+        rows = [row[0] for row in rows]
+        self.rng.shuffle(rows) #rowid IN comes back in rowid order
+        return json_list(rows), len(rows)
+
+
+#reads breweries from a JSON list or an NDJSON file
+def read_breweries(path):
+    with open(path, encoding="utf-8") as file:
+        text = file.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+#pulls the mirror every interval seconds on a daemon thread, pages at a time (all if None)
+def start_sync_thread(mirror, fetchPage, interval, pages):
+    def loop():
+        while True:
+            try:
+                mirror.sync(fetchPage, maxPages=pages)
+            except Exception:
+                logging.exception("brewery mirror sync failed") #the next run picks up where this one stopped
+            time.sleep(interval)
+    thread = threading.Thread(target=loop, name="mirror-sync", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="sync or load the local brewery mirror")
+    parser.add_argument("command", choices=["sync", "load"])
+    parser.add_argument("path", nargs="?", help="file to load")
+    parser.add_argument("--pages", type=int, default=None, help="pages to sync in this run, all by default")
+    args = parser.parse_args()
+
+    import db_app
+
+    if args.command == "load":
+        print(f'loaded {db_app.mirror.load(read_breweries(args.path))} breweries into {db_app.mirror.path}')
+    else:
+        print(db_app.mirror.sync(db_app.fetch_mirror_page, maxPages=args.pages))
@@ -0,0 +1,34 @@
+"""
+the tables of users.db, shared by the app and the migration scripts
+"""
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, JSON
+from sqlalchemy.orm import declarative_base
+
+Base = declarative_base()
+
+#user schema
+#AUTOINCREMENT so the id of a deleted user is never given to a new one (see migrate_users.py for existing dbs)
+class User(Base):
+    __tablename__ = "users"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    username = Column(String, unique=True, nullable=False)
+    salt = Column(String, nullable=False)
+    hashed_password = Column(String, nullable=False)
+    __table_args__ = {"sqlite_autoincrement": True}
+
+#brewery schema
+#every brewery that is some user's favorite, stored once no matter how many users favorited it
+class Brewery(Base):
+    __tablename__ = "breweries"
+    id = Column(String, primary_key=True)
+    data = Column(JSON, nullable=False)
+
+#favorite schema
+#a user's favorite brewery at a position in [1,5]
+class Favorite(Base):
+    __tablename__ = "favorites"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    position = Column(Integer, primary_key=True)
+    brewery_id = Column(String, ForeignKey("breweries.id"), nullable=False)
+    #covers counting the users who favorited a brewery without touching the table
+    __table_args__ = (Index("ix_favorites_brewery_user", "brewery_id", "user_id"),)
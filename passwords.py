@@ -0,0 +1,162 @@
+"""
+password hashing with versioned hash formats
+
+hashes are stored as "<scheme>$<cost parameters>$<salt>$<hash>":
+    - scrypt$<n>$<r>$<p>$<salt>$<hash>
+    - pbkdf2_sha256$<iterations>$<salt>$<hash>
+hashes without a "$" are the original single sha256(password + salt) hex digests,
+they still verify (with the salt column of the user) and get rehashed on the next login
+
+key derivation runs on a bounded process pool so an expensive hash does not hold the
+GIL of a request thread, the calling thread just waits for the result
+the pool processes are started by a forkserver (spawn where there is none), never forked
+from the app, a fork would copy the locks other request threads hold into every worker
+"""
+import hashlib
+import hmac
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from config import Config
+
+SCHEMES = ["scrypt", "pbkdf2_sha256"]
+
+
+#derives a hash, runs inside a pool worker so it only takes plain arguments
+def derive(scheme, password, salt, params):
+    if scheme == "scrypt":
+        n, r, p = params
+        return hashlib.scrypt(password.encode(), salt=bytes.fromhex(salt), n=n, r=r, p=p,
+                              maxmem=128 * n * r * p + 1024 * 1024, dklen=32).hex()
+    if scheme == "pbkdf2_sha256":
+        (iterations,) = params
+        return hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), iterations).hex()
+    if scheme == "sha256":
+        return hashlib.sha256((password + salt).encode()).hexdigest()
+    raise ValueError(f'unknown password hash scheme: {scheme}')
+
+
+class PasswordHasher:
+    """
+    hashes and verifies passwords with the configured scheme and cost
+
+    Attributes:
+        scheme: the scheme new hashes use, "scrypt" or "pbkdf2_sha256"
+        params: the cost parameters of the scheme, (n, r, p) for scrypt, (iterations,) for pbkdf2_sha256
+        workers: the number of pool processes, 0 to hash on the calling thread
+        pending: bounds how many hashes can be queued on the pool at once
+    """
+
+    def __init__(self, scheme, params, workers, maxPending):
+        """
+        initializes the hasher, the pool is started on first use
+        """
+        if scheme not in SCHEMES:
+            raise ValueError(f'unknown password hash scheme: {scheme}')
+        self.scheme = scheme
+        self.params = tuple(params)
+        self.workers = workers
+        self.pending = threading.BoundedSemaphore(max(maxPending, 1))
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def run(self, scheme, password, salt, params):
+        """
+        returns:
+            the derived hash, computed on the pool (waiting for a slot if it is full)
+        """
+        if self.workers <= 0:
+            return derive(scheme, password, salt, params)
+        pool = self.startPool()
+        with self.pending:
+            return pool.submit(derive, scheme, password, salt, params).result()
+
+    def startPool(self):
+        """
+        returns:
+            the process pool, started on first use
+        """
+        with self.lock:
+            if self.pool is None:
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(method))
+            return self.pool
+
+    def hash(self, password, salt):
+        """
+        returns:
+            the stored form of a password hashed with the current scheme and cost
+        """
+        return self.encode(salt, self.run(self.scheme, password, salt, self.params))
+
+    def hashMany(self, passwords, salts):
+        """
+        hashes a batch of passwords at once, spread over every pool process
+        the batch is queued a chunk of workers hashes at a time, each chunk taking a pending slot,
+        so hashes of logins and new accounts wait for at most one chunk instead of the whole batch
+
+        returns:
+            the stored forms of the passwords, in order
+        """
+        if self.workers <= 0:
+            digests = [derive(self.scheme, password, salt, self.params) for password, salt in zip(passwords, salts)]
+        else:
+            pool = self.startPool()
+            digests = []
+            for start in range(0, len(passwords), self.workers):
+                chunk = passwords[start:start + self.workers]
+                with self.pending:
+                    digests += pool.map(derive, [self.scheme] * len(chunk), chunk, salts[start:start + self.workers],
+                                        [self.params] * len(chunk))
+        return [self.encode(salt, digest) for salt, digest in zip(salts, digests)]
+
+    def encode(self, salt, digest):
+        """
+        returns:
+            the stored form of a hash made with the current scheme and cost
+        """
+        return "$".join([self.scheme] + [str(param) for param in self.params] + [salt, digest])
+
+    def verify(self, password, stored, legacySalt):
+        """
+        checks a password against its stored hash, in constant time
+        legacySalt is the salt column of the user, only used by the original sha256 hashes
+
+        returns:
+            True if the password matches
+        """
+        scheme, params, salt, digest = parse(stored, legacySalt)
+        return hmac.compare_digest(self.run(scheme, password, salt, params), digest)
+
+    def needsRehash(self, stored):
+        """
+        returns:
+            True if the stored hash does not use the current scheme and cost
+        """
+        scheme, params, _, _ = parse(stored, "")
+        return scheme != self.scheme or params != self.params
+
+    def close(self):
+        """
+        shuts down the pool
+        """
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown()
+                self.pool = None
+
+
+#splits a stored hash into (scheme, cost parameters, salt, hash)
+def parse(stored, legacySalt):
+    if "$" not in stored:
+        return "sha256", (), legacySalt, stored
+    parts = stored.split("$")
+    return parts[0], tuple(int(param) for param in parts[1:-2]), parts[-2], parts[-1]
+
+
+#the cost parameters for a scheme from the config
+def configured_params(scheme):
+    if scheme == "scrypt":
+        return (Config.KDF_SCRYPT_N, Config.KDF_SCRYPT_R, Config.KDF_SCRYPT_P)
+    return (Config.KDF_PBKDF2_ITERATIONS,)
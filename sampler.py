@@ -0,0 +1,83 @@
+import json
+import logging
+import threading
+from collections import deque
+
+
+class RandomPool:
+    """
+    random breweries fetched from the api ahead of time, batch at a time, so a random pick
+    is taken from the pool instead of waiting on the api
+
+    whenever a take leaves fewer than half of target breweries, a background thread fetches
+    batches until the pool is back to target (one thread at a time)
+
+    Attributes:
+        fetch: fetch(count) -> raw JSON list of count random breweries
+        target: the number of breweries the pool is refilled to
+        batch: the number of breweries fetched at once
+        pool: the raw JSON of every brewery in the pool
+    """
+
+    def __init__(self, fetch, target, batch):
+        """
+        initializes an empty pool, it is filled on first use
+        """
+        self.fetch = fetch
+        self.target = target
+        self.batch = max(batch, 1)
+        self.pool = deque()
+        self.lock = threading.Lock()
+        self.refilling = False
+        self.taken = 0
+        self.missed = 0
+
+    def take(self, count):
+        """
+        returns:
+            the raw JSON list of count breweries from the pool, None if it holds fewer than that
+        """
+        picks = None
+        with self.lock:
+            if len(self.pool) >= count:
+                picks = [self.pool.popleft() for _ in range(count)]
+                self.taken += count
+            else:
+                self.missed += count
+            start = not self.refilling and len(self.pool) < self.target / 2
+            if start:
+                self.refilling = True
+        if start:
+            threading.Thread(target=self.refill, name="random-pool", daemon=True).start()
+        if picks == None:
+            return None
+        return b"[" + b",".join(picks) + b"]"
+
+    def refill(self):
+        """
+        fetches batches until the pool is back to target
+        """
+        try:
+            while True:
+                with self.lock:
+                    missing = self.target - len(self.pool)
+                if missing <= 0:
+                    return
+                breweries = json.loads(self.fetch(min(missing, self.batch)))
+                if not breweries:
+                    return
+                with self.lock:
+                    self.pool.extend(json.dumps(brewery).encode() for brewery in breweries)
+        except Exception:
+            logging.exception("unable to refill the random brewery pool")
+        finally:
+            with self.lock:
+                self.refilling = False
+
+    def stats(self):
+        """
+        returns:
+            the size of the pool and how many breweries were taken from it or missed it
+        """
+        with self.lock:
+            return {"size": len(self.pool), "target": self.target, "taken": self.taken, "missed": self.missed}
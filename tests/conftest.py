@@ -0,0 +1,17 @@
+import os
+import sys
+import tempfile
+
+#config.py reads the environment once on import, so the app under test gets its own
+#throwaway databases and cheap password hashing before anything imports it
+_tmp = tempfile.mkdtemp(prefix="brewery-tests-")
+os.environ.setdefault("DATABASE_URL", f'sqlite:///{os.path.join(_tmp, "users.db")}')
+os.environ.setdefault("MEMORY_DB_PATH", os.path.join(_tmp, "memory.db"))
+os.environ.setdefault("MIRROR_DB_PATH", os.path.join(_tmp, "breweries.db"))
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("KDF_WORKERS", "0")
+os.environ.setdefault("KDF_SCRYPT_N", "16")
+os.environ.setdefault("RANDOM_POOL_SIZE", "0")
+
+#the app is a set of flat modules in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,92 @@
+import pytest
+from sqlalchemy import create_engine, insert
+
+from accounts import UserRepository
+from models import Base, Brewery, Favorite, User
+
+
+@pytest.fixture
+def repository(tmp_path):
+    """a repository over a fresh users db"""
+    engine = create_engine(f'sqlite:///{tmp_path / "users.db"}')
+    Base.metadata.create_all(engine)
+    yield UserRepository(engine, User.__table__, Favorite.__table__, Brewery.__table__)
+    engine.dispose()
+
+
+def test_create_and_look_up(repository):
+    """test a created user can be looked up by username"""
+    user_id = repository.create("alice", "salt", "hash")
+    assert repository.userId("alice") == user_id
+    assert tuple(repository.credentials("alice")) == (user_id, "salt", "hash")
+    assert repository.passwordHash(user_id) == "hash"
+    assert repository.userId("bob") == None
+    assert repository.credentials("bob") == None
+    assert repository.passwordHash(user_id + 1) == None
+
+
+def test_create_taken_username(repository):
+    """test a taken username inserts nothing"""
+    repository.create("alice", "salt", "hash")
+    assert repository.create("alice", "other", "other") == None
+    assert repository.credentials("alice")[2] == "hash"
+
+
+def test_set_password_only_replaces_the_verified_hash(repository):
+    """test a password is only replaced while the hash is still the one that was verified"""
+    user_id = repository.create("alice", "salt", "hash")
+    assert repository.setPassword(user_id, "hash", "salt2", "hash2")
+    assert not repository.setPassword(user_id, "hash", "salt3", "hash3")
+    assert tuple(repository.credentials("alice")) == (user_id, "salt2", "hash2")
+
+
+def test_delete_removes_favorites(repository):
+    """test deleting a user deletes their favorites, and only with the verified hash"""
+    user_id = repository.create("alice", "salt", "hash")
+    with repository.engine.begin() as conn:
+        conn.execute(insert(Brewery.__table__).values(id="b1", data={"id": "b1"}))
+        conn.execute(insert(Favorite.__table__).values(user_id=user_id, position=1, brewery_id="b1"))
+    assert not repository.delete(user_id, "stale hash")
+    assert repository.delete(user_id, "hash")
+    assert repository.userId("alice") == None
+    with repository.engine.connect() as conn:
+        assert conn.execute(Favorite.__table__.select()).all() == []
+
+
+def test_ids_are_not_reused(repository):
+    """test a new user never gets the id of a deleted one"""
+    user_id = repository.create("alice", "salt", "hash")
+    repository.delete(user_id, "hash")
+    assert repository.create("bob", "salt", "hash") > user_id
+
+
+def test_create_many_and_existing(repository):
+    """test a batch insert skips taken usernames"""
+    repository.create("alice", "salt", "hash")
+    rows = [{"username": name, "salt": "s", "hashed_password": "h"} for name in ["alice", "bob", "carol"]]
+    assert repository.createMany(rows) == {"bob", "carol"}
+    assert repository.createMany([]) == set()
+    assert repository.existing(["alice", "dave", "carol"]) == {"alice", "carol"}
+
+
+def test_export(repository):
+    """test every user is exported in id order with their favorites, in batches"""
+    first = repository.create("alice", "s1", "h1")
+    repository.create("bob", "s2", "h2")
+    with repository.engine.begin() as conn:
+        conn.execute(insert(Brewery.__table__).values(id="b1", data={"id": "b1"}))
+        conn.execute(insert(Favorite.__table__), [{"user_id": first, "position": 3, "brewery_id": "b1"},
+                                                  {"user_id": first, "position": 1, "brewery_id": "b1"}])
+    assert list(repository.export(batchSize=1)) == [("alice", "s1", "h1", {1: {"id": "b1"}, 3: {"id": "b1"}}),
+                                                    ("bob", "s2", "h2", {})]
+
+
+def test_create_many_with_favorites(repository):
+    """test favorites of a batch are inserted with their users, each brewery once, and skipped for taken usernames"""
+    repository.create("alice", "salt", "hash")
+    brewery = {"id": "b1", "name": "first"}
+    rows = [{"username": "alice", "salt": "s", "hashed_password": "h", "favorites": {1: brewery}},
+            {"username": "bob", "salt": "s", "hashed_password": "h", "favorites": {2: brewery, 5: {"id": "b2"}}}]
+    assert repository.createMany(rows) == {"bob"}
+    exported = {username: favorites for username, _, _, favorites in repository.export()}
+    assert exported == {"alice": {}, "bob": {2: brewery, 5: {"id": "b2"}}}
@@ -0,0 +1,161 @@
+import asyncio
+import json
+from urllib.parse import parse_qsl
+
+import httpx
+import pytest
+
+import asgi_app
+import db_app
+
+BREWERIES = [{"id": f'b{i}', "name": f'Brewery {i}', "city": "Cleveland" if i % 2 else "Columbus"} for i in range(1, 6)]
+
+
+class StubApi:
+    """
+    the open brewery db endpoints the asgi routes call, over httpx.MockTransport
+
+    Attributes:
+        requests: the path and query string of every request
+        delay: seconds every answer waits, so concurrent requests overlap
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.delay = 0
+
+    async def __call__(self, request):
+        path = request.url.path
+        queries = dict(parse_qsl(request.url.query.decode()))
+        self.requests.append((path, queries))
+        await asyncio.sleep(self.delay)
+        if path.endswith("/random"):
+            return httpx.Response(200, json=BREWERIES[:int(queries.get("size", 1))])
+        if path.endswith("/breweries"):
+            if "by_type" in queries and queries["by_type"] not in ["micro", "large"]:
+                return httpx.Response(400, json={"errors": ["Brewery type must include one of these types"]})
+            return httpx.Response(200, json=[brewery for brewery in BREWERIES
+                                             if queries.get("by_city", brewery["city"]) == brewery["city"]])
+        id = path.rsplit("/", 1)[1]
+        for brewery in BREWERIES:
+            if brewery["id"] == id:
+                return httpx.Response(200, json=brewery)
+        return httpx.Response(404, json={"message": "Couldn't find Brewery"})
+
+
+@pytest.fixture
+def api():
+    """a StubApi behind the asgi app, with empty caches"""
+    api = StubApi()
+    db_app.brewery_cache.clear()
+    db_app.list_cache.clear()
+    yield api
+    db_app.brewery_cache.clear()
+    db_app.list_cache.clear()
+
+
+def run(api, monkeypatch, *urls):
+    """
+    returns:
+        the responses of the asgi app to GET urls, sent concurrently by one client (sharing its cookies)
+    """
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(api)) as upstream:
+            monkeypatch.setattr(asgi_app.app, "client", upstream)
+            transport = httpx.ASGITransport(app=asgi_app.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await asyncio.gather(*[client.get(url) for url in urls])
+
+    return asyncio.run(main())
+
+
+def test_get_brewery(api, monkeypatch):
+    """test a brewery is served, remembered in the session and cached"""
+    (response,) = run(api, monkeypatch, "/get-brewery/b2")
+    assert response.json() == BREWERIES[1]
+    assert "set-cookie" in response.headers
+    run(api, monkeypatch, "/get-brewery/b2")
+    assert len(api.requests) == 1
+
+
+def test_get_brewery_invalid_id(api, monkeypatch):
+    """test an unknown id is a 400"""
+    (response,) = run(api, monkeypatch, "/get-brewery/nope")
+    assert response.status_code == 400
+    assert response.json() == {"error": "nope, invalid id"}
+
+
+def test_get_brewery_collapses_concurrent_requests(api, monkeypatch):
+    """test concurrent requests for one brewery make a single upstream call"""
+    api.delay = 0.05
+    responses = run(api, monkeypatch, *["/get-brewery/b3"] * 5)
+    assert [response.json() for response in responses] == [BREWERIES[2]] * 5
+    assert len(api.requests) == 1
+
+
+def test_get_brewery_disconnect_does_not_fail_others(api, monkeypatch):
+    """test a request that goes away while its upstream call is in flight does not fail the requests sharing it"""
+    api.delay = 0.1
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(api)) as upstream:
+            monkeypatch.setattr(asgi_app.app, "client", upstream)
+            transport = httpx.ASGITransport(app=asgi_app.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                first = asyncio.ensure_future(client.get("/get-brewery/b4"))
+                await asyncio.sleep(0.02)
+                second = asyncio.ensure_future(client.get("/get-brewery/b4"))
+                await asyncio.sleep(0.02)
+                first.cancel()
+                return await second
+
+    response = asyncio.run(main())
+    assert response.json() == BREWERIES[3]
+    assert len(api.requests) == 1
+
+
+def test_list_breweries(api, monkeypatch):
+    """test a page is fetched with the normalized query and served from the cache after"""
+    first, second = run(api, monkeypatch, "/list-breweries?by_city=Cleveland", "/list-breweries?per_page=50&by_city=Cleveland&page=1")
+    assert first.json() == second.json() == [brewery for brewery in BREWERIES if brewery["city"] == "Cleveland"]
+    assert api.requests == [("/v1/breweries", {"by_city": "Cleveland", "page": "1", "per_page": "50"})]
+
+
+def test_list_breweries_bad_queries(api, monkeypatch):
+    """test invalid paging and by_dist are a 400 without asking the api"""
+    paging, point = run(api, monkeypatch, "/list-breweries?page=two", "/list-breweries?by_dist=95,0")
+    assert paging.status_code == 400
+    assert paging.json() == {"error": "page and per_page must be integers"}
+    assert point.status_code == 400
+    assert "invalid point" in point.json()["error"]
+    assert api.requests == []
+
+
+def test_list_breweries_rejected_by_api(api, monkeypatch):
+    """test a query the api rejects is reported as an error and not cached"""
+    run(api, monkeypatch, "/list-breweries?by_type=castle")
+    (response,) = run(api, monkeypatch, "/list-breweries?by_type=castle")
+    assert response.json() == {"error": "error getting a list of breweries from API"}
+    assert len(api.requests) == 2
+
+
+def test_get_random(api, monkeypatch):
+    """test unfiltered random breweries come from the api's random endpoint with the size clamped"""
+    small, _ = run(api, monkeypatch, "/get-random?size=2", "/get-random?size=500")
+    assert small.json() == BREWERIES[:2]
+    assert sorted(queries["size"] for _, queries in api.requests) == ["2", str(db_app.MAX_RANDOM)]
+
+
+def test_get_random_bad_size(api, monkeypatch):
+    """test a size that is not an integer is a 400"""
+    (response,) = run(api, monkeypatch, "/get-random?size=many")
+    assert response.status_code == 400
+    assert response.json() == {"error": "size must be an integer"}
+
+
+def test_get_random_from_pool(api, monkeypatch):
+    """test random breweries are taken from the prefetched pool without asking the api"""
+    monkeypatch.setattr(db_app.random_pool, "take", lambda size: json.dumps(BREWERIES[:size]).encode())
+    (response,) = run(api, monkeypatch, "/get-random?size=3")
+    assert response.json() == BREWERIES[:3]
+    assert api.requests == []
@@ -0,0 +1,116 @@
+import io
+import json
+
+import pytest
+from sqlalchemy import create_engine
+
+from accounts import UserRepository
+from bulk_accounts import export_users, import_users
+from models import Base, Brewery, Favorite, User
+from passwords import PasswordHasher
+
+BREWERY = {"id": "b1", "name": "first", "city": "San Diego"}
+
+
+def make_repository(path):
+    engine = create_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(engine)
+    return UserRepository(engine, User.__table__, Favorite.__table__, Brewery.__table__)
+
+
+@pytest.fixture
+def repository(tmp_path):
+    """a repository over a fresh users db"""
+    repository = make_repository(tmp_path / "users.db")
+    yield repository
+    repository.engine.dispose()
+
+
+@pytest.fixture
+def hasher():
+    """a cheap password hasher on the calling thread"""
+    return PasswordHasher("scrypt", (16, 8, 1), workers=0, maxPending=1)
+
+
+def ndjson(*rows):
+    return io.StringIO("".join(json.dumps(row) + "\n" for row in rows))
+
+
+def test_import_ndjson(repository, hasher):
+    """test passwords are hashed and favorites are imported"""
+    lines = ndjson({"username": "alice", "password": "pw", "favorites": {"2": BREWERY}},
+                   {"username": "bob", "password": "pw"})
+    assert import_users(repository, hasher, lines) == (2, [])
+    _, salt, hashed_password = repository.credentials("alice")
+    assert hasher.verify("pw", hashed_password, salt)
+    assert {username: favorites for username, _, _, favorites in repository.export()} == {"alice": {2: BREWERY}, "bob": {}}
+
+
+def test_import_errors(repository, hasher):
+    """test unusable and duplicate rows are reported by line, the rest are created"""
+    repository.create("taken", "s", "h")
+    lines = io.StringIO("\n".join([
+        json.dumps({"username": "alice", "password": "pw"}),
+        "not json",
+        json.dumps({"username": "taken", "password": "pw"}),
+        json.dumps({"username": "alice", "password": "pw"}),
+        json.dumps({"username": "nopassword"}),
+        json.dumps({"username": "badfavorite", "password": "pw", "favorites": {"9": BREWERY}}),
+    ]) + "\n")
+    created, errors = import_users(repository, hasher, lines, batchSize=2)
+    assert created == 1
+    assert sorted((error["line"], error["username"] or "") for error in errors) == [(2, ""), (3, "taken"), (4, "alice"), (5, ""), (6, "")]
+
+
+def test_round_trip_ndjson(tmp_path, repository, hasher):
+    """test an ndjson export imports into another db with the same accounts and favorites"""
+    import_users(repository, hasher, ndjson({"username": "alice", "password": "pw", "favorites": {"1": BREWERY, "5": {"id": "b2"}}},
+                                            {"username": "bob", "password": "pw2"}))
+    exported = "".join(export_users(repository))
+
+    target = make_repository(tmp_path / "target.db")
+    assert import_users(target, hasher, io.StringIO(exported)) == (2, [])
+    assert list(target.export()) == list(repository.export())
+    _, salt, hashed_password = target.credentials("bob")
+    assert hasher.verify("pw2", hashed_password, salt)
+    target.engine.dispose()
+
+
+def test_round_trip_csv(tmp_path, repository, hasher):
+    """test a csv export imports into another db with the same accounts and favorites"""
+    import_users(repository, hasher, ndjson({"username": "alice", "password": "pw", "favorites": {"3": BREWERY}},
+                                            {"username": "bob", "password": "pw2"}))
+    exported = "".join(export_users(repository, "csv"))
+    assert exported.splitlines()[0].startswith("username,salt,hashed_password,favorite_brew_1")
+
+    target = make_repository(tmp_path / "target.db")
+    assert import_users(target, hasher, io.StringIO(exported, newline=""), "csv") == (2, [])
+    assert list(target.export()) == list(repository.export())
+    target.engine.dispose()
+
+
+def test_csv_passwords(repository, hasher):
+    """test a csv of usernames and passwords"""
+    lines = io.StringIO("username,password\r\nalice,pw\r\n,pw\r\n", newline="")
+    created, errors = import_users(repository, hasher, lines, "csv")
+    assert created == 1
+    assert errors == [{"line": 3, "username": None, "error": "username is required"}]
+
+
+def test_unknown_format(repository, hasher):
+    """test an unknown format is rejected"""
+    with pytest.raises(ValueError):
+        import_users(repository, hasher, io.StringIO(""), "xml")
+    with pytest.raises(ValueError):
+        list(export_users(repository, "xml"))
+
+
+def test_import_batch_limit(monkeypatch):
+    """test the import route rejects batches larger than MAX_IMPORT_BATCH"""
+    import db_app
+
+    monkeypatch.setattr(db_app.Config, "ADMIN_KEY", "admin")
+    response = db_app.app.test_client().post(f'/import-users?batch={db_app.MAX_IMPORT_BATCH + 1}', data=b"",
+                                             headers={"X-Admin-Key": "admin"})
+    assert response.status_code == 400
+    assert response.get_json() == {"error": f'batch must be at most {db_app.MAX_IMPORT_BATCH}'}
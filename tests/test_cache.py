@@ -0,0 +1,124 @@
+import time
+
+import pytest
+
+from cache import TTLCache
+
+
+def test_lookup_miss():
+    """test looking up a key that was never stored"""
+    cache = TTLCache(maxSize=10, ttl=60)
+    assert cache.lookup("a") == (False, None)
+    assert cache.stats()["misses"] == 1
+
+
+def test_put_and_lookup():
+    """test a stored value is found until it expires"""
+    cache = TTLCache(maxSize=10, ttl=60)
+    cache.put("a", 1)
+    assert cache.lookup("a") == (True, 1)
+    assert cache.stats()["hits"] == 1
+
+
+def test_entries_expire(monkeypatch):
+    """test an entry is dropped once its ttl has passed"""
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = TTLCache(maxSize=10, ttl=5)
+    cache.put("a", 1)
+    now[0] += 4
+    assert cache.lookup("a") == (True, 1)
+    now[0] += 2
+    assert cache.lookup("a") == (False, None)
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_negative_ttl(monkeypatch):
+    """test a cached None uses the negative ttl"""
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = TTLCache(maxSize=10, ttl=60, negativeTtl=1)
+    cache.put("missing", None)
+    assert cache.lookup("missing") == (True, None)
+    now[0] += 2
+    assert cache.lookup("missing") == (False, None)
+
+
+def test_zero_negative_ttl_is_not_stored():
+    """test None is not cached at all when the negative ttl is 0"""
+    cache = TTLCache(maxSize=10, ttl=60, negativeTtl=0)
+    cache.put("missing", None)
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction():
+    """test the least recently used entry is evicted once the cache is full"""
+    cache = TTLCache(maxSize=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.lookup("a") #b is now the least recently used
+    cache.put("c", 3)
+    assert cache.lookup("b") == (False, None)
+    assert cache.lookup("a") == (True, 1)
+    assert cache.lookup("c") == (True, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_weighted_eviction():
+    """test a weigh function turns maxSize into a budget of total weight"""
+    cache = TTLCache(maxSize=10, ttl=60, weigh=len)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    cache.put("c", b"1234")
+    assert cache.stats()["size"] == 8
+    assert cache.lookup("a") == (False, None)
+    cache.put("huge", b"x" * 11) #heavier than the whole cache, not stored
+    assert cache.lookup("huge") == (False, None)
+    assert cache.stats()["size"] == 8
+
+
+def test_put_replaces_weight():
+    """test replacing a value updates the total weight instead of adding to it"""
+    cache = TTLCache(maxSize=10, ttl=60, weigh=len)
+    cache.put("a", b"12345")
+    cache.put("a", b"12")
+    assert cache.stats()["size"] == 2
+    assert cache.lookup("a") == (True, b"12")
+
+
+def test_fetch_reads_through():
+    """test fetch only calls the loader on a miss"""
+    cache = TTLCache(maxSize=10, ttl=60)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return "value"
+
+    assert cache.fetch("a", loader) == "value"
+    assert cache.fetch("a", loader) == "value"
+    assert len(calls) == 1
+
+
+def test_fetch_does_not_cache_errors():
+    """test a loader that raises leaves nothing in the cache"""
+    cache = TTLCache(maxSize=10, ttl=60)
+
+    def loader():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        cache.fetch("a", loader)
+    assert cache.lookup("a") == (False, None)
+
+
+def test_clear():
+    """test clear empties the cache but keeps the counters"""
+    cache = TTLCache(maxSize=10, ttl=60)
+    cache.put("a", 1)
+    cache.lookup("a")
+    cache.clear()
+    stats = cache.stats()
+    assert stats["entries"] == 0 and stats["size"] == 0
+    assert stats["hits"] == 1
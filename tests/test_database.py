@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+from sqlalchemy import text
+
+from database import create_db_engine, sqlite_pragmas
+
+
+def test_pragmas_from_arguments():
+    """test explicit pragmas win over the config and are normalized"""
+    pragmas = sqlite_pragmas(journalMode="wal", synchronous="full", busyTimeout=100, mmapSize=0, cacheSize=-2000)
+    assert pragmas == {"journal_mode": "WAL", "synchronous": "FULL", "busy_timeout": 100, "mmap_size": 0, "cache_size": -2000}
+
+
+def test_invalid_pragmas():
+    """test unknown journal modes and synchronous settings are rejected"""
+    with pytest.raises(ValueError):
+        sqlite_pragmas(journalMode="fast")
+    with pytest.raises(ValueError):
+        sqlite_pragmas(synchronous="sometimes")
+
+
+def test_every_connection_gets_the_pragmas(tmp_path):
+    """test pooled connections are opened in WAL mode with the busy timeout"""
+    engine = create_db_engine(f'sqlite:///{tmp_path / "users.db"}', poolSize=2, maxOverflow=0, poolTimeout=1,
+                              pragmas=sqlite_pragmas(busyTimeout=1234))
+    with engine.connect() as first, engine.connect() as second:
+        for conn in (first, second):
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 1234
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1 #NORMAL
+    engine.dispose()
+
+
+def test_reader_not_blocked_by_writer(tmp_path):
+    """test a read does not wait for an open write transaction"""
+    engine = create_db_engine(f'sqlite:///{tmp_path / "users.db"}', poolSize=2, maxOverflow=0, poolTimeout=1)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+        conn.execute(text("INSERT INTO t VALUES (1)"))
+
+    writing = threading.Event()
+    done = threading.Event()
+
+    def write():
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO t VALUES (2)"))
+            writing.set()
+            done.wait(2)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    writing.wait(2)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM t")).scalar() == 1
+    done.set()
+    writer.join()
+    engine.dispose()
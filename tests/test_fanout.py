@@ -0,0 +1,146 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+import asgi_app
+import db_app
+from config import Config
+from fanout import ordered_fanout, ordered_fanout_async
+
+
+@pytest.fixture
+def pool():
+    """a thread pool for the fan-out"""
+    pool = ThreadPoolExecutor(max_workers=8)
+    yield pool
+    pool.shutdown()
+
+
+def test_results_in_order(pool):
+    """test results come back in the order of the items, however long each call takes"""
+    def slow(item):
+        time.sleep(0.01 * (5 - item))
+        return item * 10
+    assert list(ordered_fanout(pool, slow, range(5), window=3)) == [0, 10, 20, 30, 40]
+
+
+def test_window_bounds_calls_in_flight(pool):
+    """test no more than window calls run at once"""
+    lock = threading.Lock()
+    running = [0, 0] #now, most
+
+    def call(item):
+        with lock:
+            running[0] += 1
+            running[1] = max(running[1], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+        return item
+
+    assert list(ordered_fanout(pool, call, range(20), window=3)) == list(range(20))
+    assert running[1] <= 3
+
+
+def test_error_is_raised_in_order(pool):
+    """test the error of a call is raised when its turn comes"""
+    def call(item):
+        if item == 2:
+            raise ValueError("bad page")
+        return item
+
+    results = ordered_fanout(pool, call, range(5), window=2)
+    assert next(results) == 0
+    assert next(results) == 1
+    with pytest.raises(ValueError):
+        next(results)
+
+
+def test_closing_cancels_pending_calls():
+    """test calls that have not started are cancelled when the generator is closed"""
+    pool = ThreadPoolExecutor(max_workers=1)
+    calls = []
+
+    def call(item):
+        calls.append(item)
+        time.sleep(0.05)
+        return item
+
+    results = ordered_fanout(pool, call, range(10), window=4)
+    assert next(results) == 0
+    results.close()
+    pool.shutdown(wait=True)
+    assert len(calls) < 10
+
+
+def test_async_results_in_order():
+    """test the async fan-out yields in order with at most window tasks running"""
+    running = [0, 0]
+
+    async def call(item):
+        running[0] += 1
+        running[1] = max(running[1], running[0])
+        await asyncio.sleep(0.01 * (5 - item % 5))
+        running[0] -= 1
+        return item
+
+    async def main():
+        return [result async for result in ordered_fanout_async(call, range(12), 4)]
+
+    assert asyncio.run(main()) == list(range(12))
+    assert running[1] <= 4
+
+
+@pytest.fixture
+def one_brewery_pages(monkeypatch):
+    """every page of the api holds one brewery named after its page, and 1000 breweries match"""
+    def page(query_string):
+        number = dict(pair.split("=") for pair in query_string.split("&"))["page"]
+        return json.dumps([{"id": number}]).encode(), 1
+
+    monkeypatch.setattr(db_app, "fetch_breweries", page)
+    monkeypatch.setattr(db_app, "fetch_total", lambda meta_query: (b"{}", 1000))
+    monkeypatch.setattr(Config, "FANOUT_MAX_PAGES", 2)
+    db_app.list_cache.clear()
+
+
+def test_truncated_stream(one_brewery_pages):
+    """test a stream with more matches than FANOUT_MAX_PAGES pages says it was truncated"""
+    response = db_app.app.test_client().get("/list-breweries?all=true&by_state=ohio")
+    lines = [json.loads(line) for line in response.data.splitlines()]
+    assert response.headers["X-Truncated"] == "true"
+    assert lines == [{"id": "1"}, {"id": "2"}, {"truncated": True, "total": 1000, "sent": 2 * db_app.MAX_PER_PAGE}]
+
+
+def test_complete_stream(one_brewery_pages, monkeypatch):
+    """test a stream with every match has no trailer"""
+    monkeypatch.setattr(db_app, "fetch_total", lambda meta_query: (b"{}", 300))
+    response = db_app.app.test_client().get("/list-breweries?all=true&by_state=ohio")
+    assert "X-Truncated" not in response.headers
+    assert [json.loads(line) for line in response.data.splitlines()] == [{"id": "1"}, {"id": "2"}]
+
+
+def test_truncated_stream_asgi(one_brewery_pages, monkeypatch):
+    """test the asgi stream marks truncation the same way"""
+    async def fetch_total(meta_query):
+        return b"{}", 1000
+
+    async def fetch_breweries(query_string):
+        return db_app.fetch_breweries(query_string)
+
+    monkeypatch.setattr(asgi_app.app, "fetchTotal", fetch_total)
+    monkeypatch.setattr(asgi_app.app, "fetchBreweries", fetch_breweries)
+
+    async def main():
+        transport = httpx.ASGITransport(app=asgi_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/list-breweries?all=true&by_state=ohio")
+
+    response = asyncio.run(main())
+    assert response.headers["x-truncated"] == "true"
+    assert json.loads(response.text.splitlines()[-1]) == {"truncated": True, "total": 1000, "sent": 2 * db_app.MAX_PER_PAGE}
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from geo import GridIndex, haversine, nearest_of, parse_point
+
+
+@pytest.fixture
+def points():
+    """(ids, lats, lons) of random points all over the globe, poles and antimeridian included"""
+    rng = np.random.default_rng(7)
+    lats = np.degrees(np.arcsin(rng.uniform(-1, 1, 2000)))
+    lons = rng.uniform(-180, 180, 2000)
+    lats = np.r_[lats, 90, -90, 0, 0, 89.9, -89.9]
+    lons = np.r_[lons, 0, 0, 180, -179.99, 179.9, -179.9]
+    return [f'p{i}' for i in range(len(lats))], lats, lons
+
+
+def test_haversine():
+    """test known great-circle distances"""
+    distances = haversine(0, 0, [0, 90, 0], [1, 0, 180])
+    assert distances == pytest.approx([111.195, 10007.557, 20015.115], abs=0.01)
+
+
+def test_nearest_of(points):
+    """test the full scan ranks every point by distance, ties by position"""
+    _, lats, lons = points
+    positions, distances = nearest_of(40, -80, lats, lons, 10)
+    everything = haversine(40, -80, lats, lons)
+    assert positions.tolist() == np.argsort(everything, kind="stable")[:10].tolist()
+    assert distances.tolist() == everything[positions].tolist()
+    assert len(nearest_of(40, -80, lats[:3], lons[:3], 10)[0]) == 3
+
+
+@pytest.mark.parametrize("cellDegrees", [0.5, 5, 45])
+@pytest.mark.parametrize("lat, lon", [(40, -80), (0, 179.95), (0, -180), (89.5, 10), (-90, 0), (-33.9, 151.2)])
+@pytest.mark.parametrize("k", [1, 7, 50])
+def test_grid_matches_full_scan(points, cellDegrees, lat, lon, k):
+    """test the grid finds the same nearest points as a full scan"""
+    ids, lats, lons = points
+    index = GridIndex(ids, lats, lons, cellDegrees)
+    found, distances = index.nearest(lat, lon, k)
+    _, expected = nearest_of(lat, lon, lats, lons, k)
+    assert np.allclose(distances, expected)
+    positions = [ids.index(id) for id in found]
+    assert np.allclose(haversine(lat, lon, lats[positions], lons[positions]), distances)
+
+
+def test_grid_k_larger_than_index(points):
+    """test asking for more points than the index holds returns all of them, nearest first"""
+    ids, lats, lons = points
+    index = GridIndex(ids[:20], lats[:20], lons[:20])
+    found, distances = index.nearest(10, 10, 100)
+    assert sorted(found) == sorted(ids[:20])
+    assert np.all(np.diff(distances) >= 0)
+
+
+def test_grid_empty():
+    """test an empty index and k=0 find nothing"""
+    assert len(GridIndex([], [], [])) == 0
+    assert GridIndex([], [], []).nearest(0, 0, 5)[0] == []
+    assert GridIndex(["a"], [1], [1]).nearest(0, 0, 0)[0] == []
+
+
+def test_grid_same_cell():
+    """test points in the same cell are ranked among themselves"""
+    index = GridIndex(["far", "near", "mid"], [10.4, 10.01, 10.2], [10.4, 10.01, 10.2])
+    assert index.nearest(10, 10, 3)[0] == ["near", "mid", "far"]
+
+
+def test_grid_far_from_points():
+    """test queries far from every point (other continents, the poles) fall back to the same answer as a full scan"""
+    rng = np.random.default_rng(3)
+    lats = rng.uniform(25, 49, 5000)
+    lons = rng.uniform(-124, -67, 5000)
+    index = GridIndex(list(range(5000)), lats, lons)
+    for lat, lon in [(51.5, -0.1), (-33.9, 151.2), (35.7, 139.7), (-89.9, 0), (90, 0), (1000, 0)]:
+        found, distances = index.nearest(lat, lon, 10)
+        positions, expected = nearest_of(lat, lon, lats, lons, 10)
+        assert found == positions.tolist()
+        assert np.allclose(distances, expected)
+
+
+def test_parse_point():
+    """test points in range parse and everything else raises ValueError"""
+    assert parse_point("32.7,-117.2") == (32.7, -117.2)
+    assert parse_point("-90,180") == (-90, 180)
+    for value in ["90.1,0", "0,-180.1", "nan,0", "0,nan", "inf,0", "1,2,3", "1", "a,b", ""]:
+        with pytest.raises(ValueError):
+            parse_point(value)
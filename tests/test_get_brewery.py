@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+import requests
+
+import asgi_app
+import db_app
+
+
+class StubApi:
+    """
+    answers brewery lookups with the statuses queued for them, then with the brewery
+
+    Attributes:
+        statuses: the statuses of the next responses, 200 once they run out
+        calls: the number of lookups
+    """
+
+    def __init__(self, *statuses):
+        self.statuses = list(statuses)
+        self.calls = 0
+
+    def answer(self, id):
+        """(status, JSON body) of the next lookup"""
+        self.calls += 1
+        status = self.statuses.pop(0) if self.statuses else 200
+        if status == 404:
+            return status, {"message": "Couldn't find Brewery"}
+        if status != 200:
+            return status, {"message": "Too many requests, please slow down"}
+        return status, {"id": id, "name": "Stub Brewing"}
+
+
+@pytest.fixture(params=["flask", "asgi"])
+def get(request, monkeypatch):
+    """gets /get-brewery/<id> from either app, with its api lookups answered by a StubApi"""
+    db_app.brewery_cache.clear()
+    api = StubApi()
+
+    def flask_get(url):
+        status, body = api.answer(url.rsplit("/", 1)[1])
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(body).encode()
+        response.url = url
+        return response
+
+    async def asgi_get(request):
+        status, body = api.answer(request.url.path.rsplit("/", 1)[1])
+        return httpx.Response(status, json=body)
+
+    monkeypatch.setattr(db_app.upstream, "get", flask_get)
+
+    def fetch(id):
+        if request.param == "flask":
+            return db_app.app.test_client().get(f'/get-brewery/{id}')
+
+        async def main():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(asgi_get)) as upstream:
+                monkeypatch.setattr(asgi_app.app, "client", upstream)
+                transport = httpx.ASGITransport(app=asgi_app.app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                    return await client.get(f'/get-brewery/{id}')
+
+        return asyncio.run(main())
+
+    yield api, fetch
+    db_app.brewery_cache.clear()
+
+
+def body(response):
+    """the JSON body of a response from either app"""
+    return json.loads(response.data if hasattr(response, "data") else response.content)
+
+
+def test_found(get):
+    """test a brewery is fetched once and then served from the cache"""
+    api, fetch = get
+    assert body(fetch("b1")) == {"id": "b1", "name": "Stub Brewing"}
+    assert body(fetch("b1")) == {"id": "b1", "name": "Stub Brewing"}
+    assert api.calls == 1
+
+
+def test_not_found_is_cached(get):
+    """test a 404 is an invalid id and is cached negatively"""
+    api, fetch = get
+    api.statuses = [404]
+    for _ in range(2):
+        response = fetch("missing")
+        assert response.status_code == 400
+        assert body(response) == {"error": "missing, invalid id"}
+    assert api.calls == 1
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_error_status_is_not_cached(get, status):
+    """test other error statuses answer 502 and are not cached, so the next lookup asks the api again"""
+    api, fetch = get
+    api.statuses = [status]
+    response = fetch("b1")
+    assert response.status_code == 502
+    assert body(response) == {"error": "error getting brewery from API"}
+    assert body(fetch("b1")) == {"id": "b1", "name": "Stub Brewing"}
+    assert api.calls == 2
@@ -0,0 +1,59 @@
+from urllib.parse import parse_qsl
+
+import pytest
+
+import db_app
+
+
+def test_equivalent_queries_share_a_key():
+    """test queries that mean the same thing normalize to the same cache key"""
+    first = db_app.normalize_list_query({"by_city": "san diego", "per_page": "50"})
+    second = db_app.normalize_list_query({"page": "1", "by_city": " san diego ", "unknown": "x", "by_name": ""})
+    assert first == second
+
+
+def test_defaults_and_clamping():
+    """test paging defaults are filled in and out of range values are clamped"""
+    assert dict(parse_qsl(db_app.normalize_list_query({}))) == {"page": "1", "per_page": "50"}
+    queries = dict(parse_qsl(db_app.normalize_list_query({"page": "-3", "per_page": "1000"})))
+    assert queries == {"page": "1", "per_page": str(db_app.MAX_PER_PAGE)}
+
+
+def test_invalid_paging():
+    """test non integer paging raises ValueError"""
+    with pytest.raises(ValueError):
+        db_app.normalize_list_query({"page": "two"})
+
+
+@pytest.mark.parametrize("point", ["95,0", "-90.5,0", "0,181", "0,-180.5", "nan,0", "0,inf", "1000", "north"])
+def test_invalid_by_dist(point):
+    """test by_dist outside the globe, nan or not a point is rejected with a 400, paged or streamed"""
+    with pytest.raises(ValueError):
+        db_app.normalize_list_query({"by_dist": point})
+    client = db_app.app.test_client()
+    for url in [f'/list-breweries?by_dist={point}', f'/list-breweries?by_dist={point}&all=true']:
+        response = client.get(url)
+        assert response.status_code == 400
+        assert "invalid point" in response.get_json()["error"]
+
+
+def test_by_dist_edges():
+    """test the poles and the antimeridian are valid points"""
+    for point in ["90,180", "-90,-180", "0,0"]:
+        assert dict(parse_qsl(db_app.normalize_list_query({"by_dist": point})))["by_dist"] == point
+
+
+def test_list_cache_hit(monkeypatch):
+    """test a cached page is served without asking the api again"""
+    calls = []
+
+    def fetch(query_string):
+        calls.append(query_string)
+        return b"[]", 0
+
+    monkeypatch.setattr(db_app, "fetch_breweries", fetch)
+    db_app.list_cache.clear()
+    key = db_app.normalize_list_query({"by_state": "ohio"})
+    assert db_app.cached_breweries(key) == (b"[]", 0)
+    assert db_app.cached_breweries(db_app.normalize_list_query({"by_state": "ohio", "page": "1"})) == (b"[]", 0)
+    assert calls == [key]
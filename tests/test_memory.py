@@ -0,0 +1,170 @@
+import json
+import time
+
+from memory import Memory, MemoryStore
+
+
+def brewery(id):
+    return json.dumps({"id": id}).encode()
+
+
+def test_add_and_string_rep():
+    """test responses are stacked most recent first and kept as raw bytes"""
+    memory = Memory(3)
+    memory.add(brewery("a"), 1)
+    memory.add(b'[{"id": "b"}, {"id": "c"}]', 2)
+    assert json.loads(memory.stringRep()) == [[{"id": "b"}, {"id": "c"}], {"id": "a"}]
+    assert b"".join(memory.chunks()) == memory.stringRep().encode()
+
+
+def test_empty_responses_are_not_added():
+    """test a response of no breweries is not stored"""
+    memory = Memory(3)
+    memory.add(b"[]", 0)
+    assert memory.stringRep() == "[]"
+    assert memory.size() == 0
+
+
+def test_ring_buffer_drops_oldest():
+    """test the last item falls off once the stack is full"""
+    memory = Memory(2)
+    for id in ["a", "b", "c"]:
+        memory.add(brewery(id), 1)
+    assert json.loads(memory.stringRep()) == [{"id": "c"}, {"id": "b"}]
+
+
+def test_get_recent():
+    """test the most recent singular response is returned until it falls off the stack"""
+    memory = Memory(2)
+    assert memory.getRecent() == None
+    memory.add(brewery("a"), 1)
+    memory.add(b'[{"id": "b"}, {"id": "c"}]', 2)
+    assert memory.getRecent() == [{"id": "a"}]
+    memory.add(b'[{"id": "d"}, {"id": "e"}]', 2)
+    assert memory.getRecent() == None
+
+
+def test_sizes_track_evictions():
+    """test the byte size follows adds and responses falling off the stack"""
+    memory = Memory(2)
+    memory.add(b"1234", 1)
+    memory.add(b"12", 1)
+    assert memory.entrySizes() == [2, 4]
+    assert memory.size() == 6
+    memory.add(b"123", 1)
+    assert memory.entrySizes() == [3, 2]
+    assert memory.size() == 5
+
+
+def test_store_keeps_sessions_apart():
+    """test every session gets its own memory"""
+    store = MemoryStore(limit=5, maxSessions=10, idleTimeout=60)
+    store.get("a").add(brewery("a"), 1)
+    assert store.get("a").getRecent() == [{"id": "a"}]
+    assert store.get("b").getRecent() == None
+    assert store.sessions() == 2
+
+
+def test_store_drops_least_recently_used_session():
+    """test the least recently used session is dropped past maxSessions"""
+    store = MemoryStore(limit=5, maxSessions=2, idleTimeout=60)
+    store.get("a").add(brewery("a"), 1)
+    store.get("b")
+    store.get("a")
+    store.get("c")
+    assert store.sessions() == 2
+    assert store.peek("a").getRecent() == [{"id": "a"}]
+    assert store.peek("b").getRecent() == None
+
+
+def test_store_drops_idle_sessions(monkeypatch):
+    """test sessions unused for idleTimeout seconds are dropped"""
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    store = MemoryStore(limit=5, maxSessions=10, idleTimeout=60)
+    store.get("a")
+    now[0] += 61
+    store.get("b")
+    assert store.sessions() == 1
+
+
+def test_store_byte_budget():
+    """test least recently used sessions are dropped once the responses take more than maxBytes"""
+    store = MemoryStore(limit=5, maxSessions=10, idleTimeout=60, maxBytes=10)
+    store.get("a").add(b"1234", 1)
+    store.get("b").add(b"1234", 1)
+    assert store.bytes == 8
+    store.get("c").add(b"1234", 1)
+    assert store.sessions() == 2
+    assert store.bytes == 8
+    assert store.peek("a").size() == 0
+    assert store.peek("c").size() == 4
+
+
+def test_store_byte_budget_counts_evicted_responses():
+    """test responses falling off a full stack are no longer counted"""
+    store = MemoryStore(limit=1, maxSessions=10, idleTimeout=60, maxBytes=10)
+    memory = store.get("a")
+    for _ in range(5):
+        memory.add(b"1234", 1)
+    assert store.bytes == 4
+    assert store.sessions() == 1
+
+
+def test_store_ignores_dropped_memories():
+    """test a memory still in use after its session was dropped is not counted anymore"""
+    store = MemoryStore(limit=5, maxSessions=1, idleTimeout=60, maxBytes=100)
+    dropped = store.get("a")
+    store.get("b").add(b"1234", 1)
+    dropped.add(b"1234", 1)
+    assert store.bytes == 4
+
+
+def test_new_sessions_do_not_evict_established_ones():
+    """test sessions that never sent their cookie back only push out each other"""
+    store = MemoryStore(limit=5, maxSessions=2, idleTimeout=60, maxNewSessions=2)
+    store.get("a").add(brewery("a"), 1)
+    for i in range(10):
+        store.get(f'anonymous{i}', new=True).add(brewery("x"), 1)
+    assert store.sessions() == 3
+    assert store.peek("a").getRecent() == [{"id": "a"}]
+
+
+def test_new_session_is_established_when_it_comes_back():
+    """test a new session moves out of the new sessions once its client sends the cookie back"""
+    store = MemoryStore(limit=5, maxSessions=2, idleTimeout=60, maxNewSessions=1)
+    store.get("a", new=True).add(brewery("a"), 1)
+    store.get("a")
+    store.get("b", new=True)
+    assert store.peek("a").getRecent() == [{"id": "a"}]
+
+
+def test_peek_does_not_create_sessions():
+    """test reading an unknown session gives an empty memory without keeping it"""
+    store = MemoryStore(limit=5, maxSessions=2, idleTimeout=60)
+    memory = store.peek("unknown")
+    assert memory.stringRep() == "[]"
+    memory.add(brewery("a"), 1)
+    assert store.sessions() == 0
+    assert store.bytes == 0
+
+
+def test_reading_memory_does_not_start_a_session(monkeypatch):
+    """test a session (and its cookie) is only started once a response is stored"""
+    import db_app
+
+    monkeypatch.setattr(db_app, "fetch_brewery", lambda id: (brewery(id), 1))
+    db_app.brewery_cache.clear()
+    client = db_app.app.test_client()
+    sessions = db_app.memories.sessions()
+
+    response = client.get("/view-memory")
+    assert response.get_json() == {"memory": []}
+    assert "Set-Cookie" not in response.headers
+    assert client.get("/memory-sizes").get_json() == {"sizes": [], "total": 0}
+    assert db_app.memories.sessions() == sessions
+
+    response = client.get("/get-brewery/b1")
+    assert "Set-Cookie" in response.headers
+    assert client.get("/view-memory").get_json() == {"memory": [{"id": "b1"}]}
+    assert db_app.memories.sessions() == sessions + 1
@@ -0,0 +1,66 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+from migrate_favorites import migrate
+
+LEGACY_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER NOT NULL,
+    username VARCHAR NOT NULL,
+    salt VARCHAR NOT NULL,
+    hashed_password VARCHAR NOT NULL,
+    favorite_brew_1 JSON,
+    favorite_brew_2 JSON,
+    favorite_brew_3 JSON,
+    favorite_brew_4 JSON,
+    favorite_brew_5 JSON,
+    PRIMARY KEY (id),
+    UNIQUE (username)
+);
+"""
+
+
+def legacy_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    brewery = {"id": "b1", "name": "first"}
+    conn.execute("INSERT INTO users VALUES (1, 'testt', 's', 'h', ?, ?, 'null', NULL, NULL)",
+                 (json.dumps([brewery]), json.dumps({"id": "b2", "name": "second"})))
+    conn.execute("INSERT INTO users VALUES (2, 'judecl', 's', 'h', NULL, NULL, NULL, NULL, ?)", (json.dumps(brewery),))
+    conn.commit()
+    conn.close()
+
+
+def test_migrate(tmp_path):
+    """test favorites move into the favorites table, each brewery stored once, and the columns are dropped"""
+    path = str(tmp_path / "users.db")
+    legacy_db(path)
+    assert migrate(path) == 3
+
+    conn = sqlite3.connect(path)
+    favorites = conn.execute("SELECT user_id, position, brewery_id FROM favorites ORDER BY user_id, position").fetchall()
+    assert favorites == [(1, 1, "b1"), (1, 2, "b2"), (2, 5, "b1")]
+    breweries = dict(conn.execute("SELECT id, data FROM breweries").fetchall())
+    assert json.loads(breweries["b1"]) == {"id": "b1", "name": "first"}
+    assert len(breweries) == 2
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(users)")]
+    assert columns == ["id", "username", "salt", "hashed_password"]
+    conn.close()
+
+
+def test_migrate_twice(tmp_path):
+    """test a migrated db is left alone"""
+    path = str(tmp_path / "users.db")
+    legacy_db(path)
+    migrate(path)
+    assert migrate(path) == 0
+
+
+def test_does_not_build_the_app():
+    """test the migration only needs the models, not the app"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = "import sys, migrate_favorites; sys.exit('db_app' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code], cwd=root).returncode == 0
@@ -0,0 +1,38 @@
+import sqlite3
+
+import pytest
+
+from migrate_users import migrate
+
+
+def users_db(path, favoriteColumns=False):
+    conn = sqlite3.connect(path)
+    extra = "".join(f'favorite_brew_{position} JSON, ' for position in range(1, 6)) if favoriteColumns else ""
+    conn.execute(f'CREATE TABLE users (id INTEGER NOT NULL, username VARCHAR NOT NULL, salt VARCHAR NOT NULL, '
+                 f'hashed_password VARCHAR NOT NULL, {extra}PRIMARY KEY (id), UNIQUE (username))')
+    conn.execute("INSERT INTO users (id, username, salt, hashed_password) VALUES (1, 'testt', 's', 'h'), (2, 'judecl', 's', 'h')")
+    conn.commit()
+    conn.close()
+
+
+def test_migrate(tmp_path):
+    """test the users table is rebuilt with AUTOINCREMENT, keeping every id, so a deleted id is not reused"""
+    path = str(tmp_path / "users.db")
+    users_db(path)
+    assert migrate(path)
+    assert not migrate(path)
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT id, username FROM users ORDER BY id").fetchall() == [(1, "testt"), (2, "judecl")]
+    conn.execute("DELETE FROM users WHERE id = 2")
+    conn.execute("INSERT INTO users (username, salt, hashed_password) VALUES ('new', 's', 'h')")
+    assert conn.execute("SELECT id FROM users WHERE username = 'new'").fetchone() == (3,)
+    conn.close()
+
+
+def test_needs_favorites_migrated(tmp_path):
+    """test the users table is not rebuilt while it still has the favorite columns"""
+    path = str(tmp_path / "users.db")
+    users_db(path, favoriteColumns=True)
+    with pytest.raises(ValueError):
+        migrate(path)
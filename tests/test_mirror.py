@@ -0,0 +1,257 @@
+import asyncio
+import json
+import os
+import threading
+
+import httpx
+import pytest
+
+import asgi_app
+import db_app
+from mirror import BreweryMirror, read_breweries
+
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "breweries.json")
+
+
+@pytest.fixture
+def breweries():
+    """the breweries of the fixture file"""
+    return read_breweries(FIXTURE)
+
+
+@pytest.fixture
+def mirror(tmp_path, breweries):
+    """a mirror loaded with the fixture breweries"""
+    mirror = BreweryMirror(str(tmp_path / "mirror.db"))
+    mirror.load(breweries)
+    return mirror
+
+
+def ids(result):
+    """the ids of the breweries in a (raw JSON list, count) result"""
+    raw, count = result
+    breweries = json.loads(raw)
+    assert len(breweries) == count
+    return [brewery["id"] for brewery in breweries]
+
+
+def queries(**filters):
+    """normalized list-breweries queries, first page of 50 unless given"""
+    return {"page": "1", "per_page": "50", **filters}
+
+
+def test_read_ndjson(tmp_path, breweries):
+    """test an NDJSON file reads the same as a JSON list"""
+    path = tmp_path / "breweries.ndjson"
+    path.write_text("\n".join(json.dumps(brewery) for brewery in breweries) + "\n")
+    assert read_breweries(str(path)) == breweries
+
+
+def test_load(tmp_path, breweries):
+    """test a load fills the mirror and marks it ready"""
+    mirror = BreweryMirror(str(tmp_path / "mirror.db"))
+    assert not mirror.ready()
+    assert mirror.load(breweries) == len(breweries)
+    assert mirror.ready()
+    assert json.loads(mirror.get("b-02"))["name"] == "Stone Brewing"
+    assert mirror.get("missing") == None
+
+
+def test_load_replaces(mirror, breweries):
+    """test a second load drops the breweries it does not hold"""
+    assert mirror.load(breweries[:3]) == 3
+    assert mirror.get("b-08") == None
+
+
+def test_page_by_city(mirror):
+    """test by_city ignores case and underscores, sorted by name"""
+    assert ids(mirror.page(queries(by_city="san_diego"))) == ["b-01", "b-07", "b-03"]
+
+
+def test_page_by_name(mirror):
+    """test by_name matches substrings, short ones included"""
+    assert ids(mirror.page(queries(by_name="brewing"))) == ["b-01", "b-08", "b-05", "b-04", "b-02"]
+    assert ids(mirror.page(queries(by_name="co"))) == ["b-05", "b-06", "b-04"]
+
+
+def test_page_by_type(mirror):
+    """test by_type, combined with another filter"""
+    assert ids(mirror.page(queries(by_type="micro"))) == ["b-08", "b-03", "b-06"]
+    assert ids(mirror.page(queries(by_type="MICRO", by_city="cleveland"))) == ["b-06"]
+
+
+def test_page_by_dist(mirror):
+    """test by_dist ranks breweries with coordinates by distance, with and without another filter"""
+    assert ids(mirror.page(queries(by_dist="32.76,-117.2"))) == ["b-01", "b-03", "b-07", "b-02", "b-04", "b-05", "b-08"]
+    assert ids(mirror.page(queries(by_dist="32.76,-117.2", by_type="regional"))) == ["b-02", "b-04", "b-05"]
+
+
+@pytest.mark.parametrize("point", ["nowhere", "95,0", "0,-181", "nan,nan", "1000,0"])
+def test_page_by_dist_invalid(mirror, point):
+    """test by_dist that is not a point on the globe is rejected"""
+    with pytest.raises(ValueError):
+        mirror.page(queries(by_dist=point))
+
+
+def test_page_paging_and_sort(mirror):
+    """test page, per_page and sort"""
+    assert ids(mirror.page(queries(sort="city:desc,name", per_page="3"))) == ["b-01", "b-07", "b-03"]
+    assert ids(mirror.page(queries(sort="city:desc,name", per_page="3", page="2"))) == ["b-02", "b-08", "b-05"]
+    assert ids(mirror.page(queries(by_dist="32.76,-117.2", per_page="2", page="2"))) == ["b-07", "b-02"]
+
+
+def test_page_unknown_query(mirror):
+    """test queries the mirror can not answer are left to the api"""
+    assert mirror.page(queries(by_unknown="x")) == None
+    assert mirror.page(queries(sort="rating")) == None
+
+
+def test_autocomplete(mirror):
+    """test prefixes, words within names and typos are suggested"""
+    assert [row["id"] for row in mirror.autocomplete("sto")] == ["b-02"]
+    assert mirror.autocomplete("nevada")[0] == {"id": "b-04", "name": "Sierra Nevada Brewing Co",
+                                                "city": "Chico", "state": "California"}
+    assert mirror.autocomplete("sierra nev")[0]["id"] == "b-04"
+    assert mirror.autocomplete("balast")[0]["id"] == "b-01"
+    assert len(mirror.autocomplete("brew", limit=2)) == 2
+    assert mirror.autocomplete("  ") == []
+
+
+def test_sample(mirror):
+    """test a sample holds different breweries that match the filters"""
+    picked = ids(mirror.sample({"by_city": "San Diego"}, 2))
+    assert len(set(picked)) == 2
+    assert set(picked) <= {"b-01", "b-03", "b-07"}
+    assert sorted(ids(mirror.sample({"by_city": "San Diego"}, 10))) == ["b-01", "b-03", "b-07"]
+    assert len(ids(mirror.sample({}, 100))) == 8
+    assert mirror.sample({"by_city": "Nowhere"}, 3) == (b"[]", 0)
+
+
+def test_sample_unknown_query(mirror):
+    """test by_dist and unknown filters are left to the api"""
+    assert mirror.sample({"by_dist": "32.76,-117.2"}, 3) == None
+    assert mirror.sample({"by_unknown": "x"}, 3) == None
+
+
+class FakeApi:
+    """
+    serves breweries page by page like the api, counting the pages fetched
+
+    Attributes:
+        breweries: the breweries served
+        fetched: the (page, per_page) of every fetch
+    """
+
+    def __init__(self, breweries):
+        self.breweries = breweries
+        self.fetched = []
+
+    def __call__(self, page, perPage):
+        self.fetched.append((page, perPage))
+        return self.breweries[(page - 1) * perPage:page * perPage]
+
+
+def test_sync_resumes(tmp_path, breweries):
+    """test a sync limited to maxPages continues from the next page on the next run"""
+    mirror = BreweryMirror(str(tmp_path / "mirror.db"))
+    api = FakeApi(breweries)
+    assert mirror.sync(api, perPage=3, maxPages=2) == {"pages": 2, "breweries": 6, "deleted": 0, "complete": False}
+    assert not mirror.ready()
+    assert mirror.state("next_page") == 3
+    assert mirror.sync(api, perPage=3, maxPages=2) == {"pages": 1, "breweries": 2, "deleted": 0, "complete": True}
+    assert api.fetched == [(1, 3), (2, 3), (3, 3)]
+    assert mirror.ready()
+    assert mirror.count() == 8
+    assert mirror.state("next_page") == 1
+
+
+def test_sync_deletes_removed(mirror, breweries):
+    """test a full pass deletes the breweries the api no longer has and picks up changes"""
+    renamed = dict(breweries[1], name="Stone Brewing World Bistro")
+    api = FakeApi([breweries[0], renamed] + breweries[3:6])
+    assert mirror.sync(api, perPage=2) == {"pages": 3, "breweries": 5, "deleted": 3, "complete": True}
+    assert mirror.count() == 5
+    assert mirror.get("b-03") == None
+    assert mirror.get("b-08") == None
+    assert json.loads(mirror.get("b-02"))["name"] == "Stone Brewing World Bistro"
+    assert ids(mirror.page(queries(by_name="bistro"))) == ["b-02"]
+    assert [row["id"] for row in mirror.autocomplete("modern")] == []
+
+
+def test_added_brewery_survives_sync(mirror, breweries):
+    """test a brewery added outside of a sync is kept until a pass finishes without it"""
+    extra = dict(breweries[0], id="b-09", name="Extra Brewing")
+    mirror.add([extra])
+    assert mirror.sync(FakeApi(breweries + [extra]), perPage=50)["deleted"] == 0
+    assert mirror.count() == 9
+
+
+def test_added_during_sync(tmp_path, breweries):
+    """test a brewery added while a pass is in progress is kept by that pass and deleted by the next one without it"""
+    mirror = BreweryMirror(str(tmp_path / "mirror.db"))
+    api = FakeApi(breweries)
+    mirror.sync(api, perPage=3, maxPages=1)
+    mirror.add([dict(breweries[0], id="b-09", name="Extra Brewing")])
+    assert mirror.sync(api, perPage=3)["deleted"] == 0
+    assert mirror.get("b-09") != None
+    assert mirror.sync(api, perPage=3)["deleted"] == 1
+    assert mirror.get("b-09") == None
+
+
+class FakeResponse:
+    """a response of the upstream client"""
+
+    def __init__(self, body, status=200):
+        self.content = json.dumps(body).encode()
+        self.status_code = status
+
+    def raise_for_status(self):
+        pass
+
+
+def test_get_brewery_waits_for_complete_mirror(tmp_path, breweries, monkeypatch):
+    """test get-brewery is not answered from a mirror that is not complete, and only a synced mirror is written through"""
+    mirror = BreweryMirror(str(tmp_path / "mirror.db"))
+    mirror.add([dict(breweries[1], name="Stale Name")])
+    calls = []
+
+    def get(url):
+        calls.append(url)
+        return FakeResponse(breweries[1])
+
+    monkeypatch.setattr(db_app, "mirror", mirror)
+    monkeypatch.setattr(db_app.upstream, "get", get)
+    db_app.brewery_cache.clear()
+    client = db_app.app.test_client()
+    assert client.get("/get-brewery/b-02").get_json()["name"] == "Stone Brewing"
+    assert len(calls) == 1
+    assert json.loads(mirror.get("b-02"))["name"] == "Stale Name" #no sync runs, so nothing is written
+
+    monkeypatch.setattr(db_app.Config, "MIRROR_SYNC_INTERVAL", 60)
+    db_app.brewery_cache.clear()
+    client.get("/get-brewery/b-02")
+    assert json.loads(mirror.get("b-02"))["name"] == "Stone Brewing"
+    db_app.brewery_cache.clear()
+
+
+def test_asgi_mirror_off_loop(mirror, monkeypatch):
+    """test the asgi app reads the mirror on a worker thread, not on the event loop"""
+    threads = []
+    get = mirror.get
+
+    def record(id):
+        threads.append(threading.get_ident())
+        return get(id)
+
+    monkeypatch.setattr(mirror, "get", record)
+    monkeypatch.setattr(db_app, "mirror", mirror)
+
+    async def main():
+        transport = httpx.ASGITransport(app=asgi_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return threading.get_ident(), await client.get("/get-brewery/b-02")
+
+    loop, response = asyncio.run(main())
+    assert response.json()["name"] == "Stone Brewing"
+    assert threads and loop not in threads
@@ -0,0 +1,114 @@
+import hashlib
+
+import pytest
+
+import passwords
+from passwords import PasswordHasher, parse
+
+SCRYPT = ("scrypt", (16, 8, 1))
+PBKDF2 = ("pbkdf2_sha256", (1000,))
+
+
+def test_hash_and_verify():
+    """test a password verifies against its own hash only"""
+    hasher = PasswordHasher(*SCRYPT, workers=0, maxPending=1)
+    stored = hasher.hash("hunter2", "00ff")
+    assert stored.startswith("scrypt$16$8$1$00ff$")
+    assert hasher.verify("hunter2", stored, "")
+    assert not hasher.verify("hunter3", stored, "")
+
+
+def test_pbkdf2():
+    """test the pbkdf2 scheme stores its iterations"""
+    hasher = PasswordHasher(*PBKDF2, workers=0, maxPending=1)
+    stored = hasher.hash("hunter2", "00ff")
+    assert parse(stored, "")[:3] == ("pbkdf2_sha256", (1000,), "00ff")
+    assert hasher.verify("hunter2", stored, "")
+
+
+def test_legacy_sha256():
+    """test an original sha256(password + salt) hash verifies with the salt column"""
+    hasher = PasswordHasher(*SCRYPT, workers=0, maxPending=1)
+    stored = hashlib.sha256(("hunter2" + "abcd").encode()).hexdigest()
+    assert hasher.verify("hunter2", stored, "abcd")
+    assert not hasher.verify("hunter2", stored, "dcba")
+
+
+def test_needs_rehash():
+    """test hashes with an old scheme or cost need a rehash, current ones do not"""
+    hasher = PasswordHasher(*SCRYPT, workers=0, maxPending=1)
+    assert not hasher.needsRehash(hasher.hash("hunter2", "00ff"))
+    assert hasher.needsRehash(hashlib.sha256(b"hunter2abcd").hexdigest())
+    assert hasher.needsRehash(PasswordHasher(*PBKDF2, workers=0, maxPending=1).hash("hunter2", "00ff"))
+    assert hasher.needsRehash(PasswordHasher("scrypt", (32, 8, 1), workers=0, maxPending=1).hash("hunter2", "00ff"))
+
+
+def test_hash_many_on_pool():
+    """test a batch hashed on the process pool matches hashing one at a time"""
+    pooled = PasswordHasher(*PBKDF2, workers=2, maxPending=1)
+    single = PasswordHasher(*PBKDF2, workers=0, maxPending=1)
+    try:
+        stored = pooled.hashMany(["a", "b", "c"], ["01", "02", "03"])
+        assert stored == [single.hash(password, salt) for password, salt in zip("abc", ["01", "02", "03"])]
+        assert pooled.verify("b", stored[1], "")
+    finally:
+        pooled.close()
+
+
+def test_hash_many_takes_a_slot_per_chunk():
+    """test a batch is queued a chunk of workers hashes at a time, so other hashes can get in between"""
+    hasher = PasswordHasher(*PBKDF2, workers=2, maxPending=1)
+    acquired = []
+
+    class Recorder:
+        def __enter__(self):
+            acquired.append(True)
+
+        def __exit__(self, *exc):
+            return False
+
+    hasher.pending = Recorder()
+    try:
+        stored = hasher.hashMany(list("abcde"), ["01", "02", "03", "04", "05"])
+        assert len(acquired) == 3
+        assert hasher.verify("e", stored[4], "")
+    finally:
+        hasher.close()
+
+
+def test_pool_is_not_forked(monkeypatch):
+    """test the pool processes are not forked from the (threaded) app process"""
+    contexts = []
+
+    class Recorder:
+        def __init__(self, max_workers, mp_context):
+            contexts.append(mp_context.get_start_method())
+
+    monkeypatch.setattr(passwords, "ProcessPoolExecutor", Recorder)
+    hasher = PasswordHasher(*PBKDF2, workers=2, maxPending=1)
+    hasher.startPool()
+    hasher.startPool()
+    assert len(contexts) == 1
+    assert contexts[0] in ["forkserver", "spawn"]
+
+
+def test_unknown_scheme():
+    """test an unknown scheme is rejected"""
+    with pytest.raises(ValueError):
+        PasswordHasher("md5", (), workers=0, maxPending=1)
+
+
+def test_login_rehashes_legacy_password():
+    """test logging in upgrades an original sha256 hash to the current scheme, and the password still works"""
+    import db_app
+
+    stored = hashlib.sha256(("hunter2" + "abcd").encode()).hexdigest()
+    db_app.users.create("legacy-user", "abcd", stored)
+    client = db_app.app.test_client()
+
+    assert client.post("/login", json={"username": "legacy-user", "password": "hunter2"}).status_code == 200
+    _, _, rehashed = db_app.users.credentials("legacy-user")
+    assert rehashed.startswith("scrypt$")
+    assert not db_app.hasher.needsRehash(rehashed)
+    assert client.post("/login", json={"username": "legacy-user", "password": "hunter2"}).status_code == 200
+    assert client.post("/login", json={"username": "legacy-user", "password": "wrong"}).status_code == 401
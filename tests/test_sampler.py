@@ -0,0 +1,181 @@
+import json
+import threading
+import time
+from urllib.parse import parse_qsl
+
+import pytest
+
+import db_app
+from config import Config
+from sampler import RandomPool
+
+
+class StubFetch:
+    """
+    serves count numbered breweries per fetch, like the api's random endpoint
+
+    Attributes:
+        counts: the count of every fetch
+        fail: raise instead of answering
+        release: set to let fetches answer, a fetch waits for it
+    """
+
+    def __init__(self):
+        self.counts = []
+        self.fail = False
+        self.release = threading.Event()
+        self.release.set()
+        self.next = 0
+
+    def __call__(self, count):
+        self.release.wait(5)
+        self.counts.append(count)
+        if self.fail:
+            raise ConnectionError("api down")
+        breweries = [{"id": str(self.next + i)} for i in range(count)]
+        self.next += count
+        return json.dumps(breweries).encode()
+
+
+def settle(pool):
+    """waits for the refill thread of a pool to finish, a take that starts one marks it before returning"""
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        with pool.lock:
+            if not pool.refilling:
+                return
+        time.sleep(0.005)
+
+
+def test_first_take_prefetches():
+    """test the first take misses and fills the pool in batches up to target"""
+    fetch = StubFetch()
+    pool = RandomPool(fetch, target=10, batch=4)
+    assert pool.take(1) == None
+    settle(pool)
+    assert fetch.counts == [4, 4, 2]
+    assert pool.stats() == {"size": 10, "target": 10, "taken": 0, "missed": 1}
+    assert [brewery["id"] for brewery in json.loads(pool.take(3))] == ["0", "1", "2"]
+    assert pool.stats()["taken"] == 3
+
+
+def test_refill_below_half():
+    """test a take only starts a refill once it leaves fewer than half of target"""
+    fetch = StubFetch()
+    pool = RandomPool(fetch, target=10, batch=10)
+    pool.refill()
+    pool.take(5)
+    settle(pool)
+    assert fetch.counts == [10]
+    pool.take(1)
+    settle(pool)
+    assert fetch.counts == [10, 6]
+    assert pool.stats()["size"] == 10
+
+
+def test_one_refill_at_a_time():
+    """test takes during a refill do not start another one"""
+    fetch = StubFetch()
+    fetch.release.clear()
+    pool = RandomPool(fetch, target=10, batch=10)
+    for _ in range(5):
+        assert pool.take(1) == None
+    fetch.release.set()
+    settle(pool)
+    assert fetch.counts == [10]
+    assert pool.stats()["missed"] == 5
+
+
+def test_take_larger_than_pool():
+    """test a take the pool can not cover misses and leaves the pool as it was"""
+    fetch = StubFetch()
+    pool = RandomPool(fetch, target=4, batch=4)
+    pool.refill()
+    assert pool.take(5) == None
+    assert pool.stats() == {"size": 4, "target": 4, "taken": 0, "missed": 5}
+
+
+def test_failed_refill():
+    """test a failing fetch is logged and a later take tries again"""
+    fetch = StubFetch()
+    fetch.fail = True
+    pool = RandomPool(fetch, target=4, batch=4)
+    pool.take(1)
+    settle(pool)
+    assert pool.stats()["size"] == 0
+    fetch.fail = False
+    pool.take(1)
+    settle(pool)
+    assert pool.stats()["size"] == 4
+
+
+class StubMatches:
+    """
+    the api's count and list endpoints for total breweries matching any filter
+
+    Attributes:
+        total: the number of matches
+        calls: ("meta" or "list", query string) of every call
+    """
+
+    def __init__(self, total):
+        self.total = total
+        self.calls = []
+
+    def fetch_total(self, meta_query):
+        self.calls.append(("meta", meta_query))
+        return b"{}", self.total
+
+    def fetch_breweries(self, query_string):
+        self.calls.append(("list", query_string))
+        queries = dict(parse_qsl(query_string))
+        perPage = int(queries["per_page"])
+        start = (int(queries["page"]) - 1) * perPage
+        breweries = [{"id": str(i)} for i in range(start, min(start + perPage, self.total))]
+        return json.dumps(breweries).encode(), len(breweries)
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """450 matches served by a StubMatches"""
+    api = StubMatches(450)
+    monkeypatch.setattr(db_app, "fetch_total", api.fetch_total)
+    monkeypatch.setattr(db_app, "fetch_breweries", api.fetch_breweries)
+    db_app.list_cache.clear()
+    yield api
+    db_app.list_cache.clear()
+
+
+def test_filtered_random_calls(api):
+    """test a filtered pick asks for the count and a few full pages, then nothing while they are cached"""
+    raw, count = db_app.fetch_random_filtered(50, {"by_state": "ohio"})
+    ids = [brewery["id"] for brewery in json.loads(raw)]
+    assert count == 50
+    assert len(set(ids)) == 50
+    assert all(0 <= int(id) < 450 for id in ids)
+    assert [kind for kind, _ in api.calls] == ["meta"] + ["list"] * Config.RANDOM_FILTERED_PAGES
+    pages = [dict(parse_qsl(query)) for kind, query in api.calls if kind == "list"]
+    assert all(page["per_page"] == str(db_app.MAX_PER_PAGE) and page["by_state"] == "ohio" for page in pages)
+    assert len({page["page"] for page in pages}) == len(pages)
+
+    api.calls.clear()
+    for _ in range(20):
+        db_app.fetch_random_filtered(5, {"by_state": "ohio"})
+    assert [kind for kind, _ in api.calls].count("meta") == 0
+    assert len(api.calls) <= 3 - Config.RANDOM_FILTERED_PAGES #only the pages not drawn the first time
+
+
+def test_filtered_random_few_matches(api):
+    """test a pick larger than the matches returns every match once from a single page"""
+    api.total = 7
+    raw, count = db_app.fetch_random_filtered(50, {"by_city": "tiny"})
+    assert count == 7
+    assert sorted(int(brewery["id"]) for brewery in json.loads(raw)) == list(range(7))
+    assert [kind for kind, _ in api.calls] == ["meta", "list"]
+
+
+def test_filtered_random_no_matches(api):
+    """test no match returns an empty list without fetching a page"""
+    api.total = 0
+    assert db_app.fetch_random_filtered(5, {"by_city": "nowhere"}) == (b"[]", 0)
+    assert [kind for kind, _ in api.calls] == ["meta"]
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import threading
+
+import httpx
+
+from memory import SQLiteMemoryStore
+
+
+def brewery(id):
+    return json.dumps({"id": id}).encode()
+
+
+def test_add_and_read(tmp_path):
+    """test responses are stacked most recent first and read back as stored"""
+    store = SQLiteMemoryStore(str(tmp_path / "memory.db"), limit=3, maxSessions=10, idleTimeout=60)
+    memory = store.get("a")
+    memory.add(brewery("a"), 1)
+    memory.add(b'[{"id": "b"}, {"id": "c"}]', 2)
+    memory.add(b"[]", 0)
+    assert json.loads(memory.stringRep()) == [[{"id": "b"}, {"id": "c"}], {"id": "a"}]
+    assert memory.entrySizes() == [26, 11]
+    assert memory.getRecent() == [{"id": "a"}]
+
+
+def test_limit(tmp_path):
+    """test only the last limit responses are kept"""
+    store = SQLiteMemoryStore(str(tmp_path / "memory.db"), limit=2, maxSessions=10, idleTimeout=60)
+    memory = store.get("a")
+    for id in ["a", "b", "c"]:
+        memory.add(brewery(id), 1)
+    assert json.loads(memory.stringRep()) == [{"id": "c"}, {"id": "b"}]
+
+
+def test_shared_between_stores(tmp_path):
+    """test two stores on the same file (like two worker processes) see the same memories"""
+    path = str(tmp_path / "memory.db")
+    first = SQLiteMemoryStore(path, limit=5, maxSessions=10, idleTimeout=60)
+    second = SQLiteMemoryStore(path, limit=5, maxSessions=10, idleTimeout=60)
+    first.get("a").add(brewery("a"), 1)
+    assert second.get("a").getRecent() == [{"id": "a"}]
+
+
+def test_concurrent_adds(tmp_path):
+    """test concurrent adds from many threads keep every response"""
+    store = SQLiteMemoryStore(str(tmp_path / "memory.db"), limit=100, maxSessions=10, idleTimeout=60)
+
+    def add(i):
+        store.get("a").add(brewery(str(i)), 1)
+
+    threads = [threading.Thread(target=add, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(store.get("a").entrySizes()) == 20
+
+
+def test_sweep_drops_sessions(tmp_path):
+    """test idle sessions and the least recently used ones over maxSessions are deleted"""
+    store = SQLiteMemoryStore(str(tmp_path / "memory.db"), limit=5, maxSessions=2, idleTimeout=60, sweepInterval=0)
+    store.get("a").add(brewery("a"), 1)
+    store.get("b")
+    store.get("c")
+    assert store.sessions() == 2
+    assert store.peek("a").getRecent() == None
+    store.sweep(10 ** 12) #far in the future, every session is idle
+    assert store.sessions() == 0
+
+
+def test_new_sessions_do_not_evict_established_ones(tmp_path):
+    """test sessions that never sent their cookie back only push out each other"""
+    store = SQLiteMemoryStore(str(tmp_path / "memory.db"), limit=5, maxSessions=2, idleTimeout=60,
+                              sweepInterval=0, maxNewSessions=1)
+    store.get("a").add(brewery("a"), 1)
+    for i in range(5):
+        store.get(f'anonymous{i}', new=True).add(brewery("x"), 1)
+    assert store.sessions() == 2
+    assert store.peek("a").getRecent() == [{"id": "a"}]
+
+
+def test_peek_does_not_create_sessions(tmp_path):
+    """test reading an unknown session gives an empty memory without creating the session"""
+    store = SQLiteMemoryStore(str(tmp_path / "memory.db"), limit=5, maxSessions=2, idleTimeout=60)
+    assert store.peek("unknown").stringRep() == "[]"
+    assert store.sessions() == 0
+
+
+def test_asgi_stores_off_the_event_loop(tmp_path, monkeypatch):
+    """test the asgi routes write to the sqlite memory from a worker thread"""
+    import asgi_app
+    import db_app
+
+    store = SQLiteMemoryStore(str(tmp_path / "memory.db"), limit=5, maxSessions=10, idleTimeout=60)
+    threads = []
+    get = store.get
+
+    def record(key, new=False):
+        threads.append(threading.current_thread())
+        return get(key, new)
+
+    monkeypatch.setattr(store, "get", record)
+    monkeypatch.setattr(db_app, "memories", store)
+    monkeypatch.setattr(db_app, "local_brewery", lambda id: brewery(id))
+
+    async def main():
+        transport = httpx.ASGITransport(app=asgi_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/get-brewery/b1"), threading.current_thread()
+
+    response, loopThread = asyncio.run(main())
+    assert response.json() == {"id": "b1"}
+    assert len(threads) == 1 and threads[0] is not loopThread
+    assert store.sessions() == 1
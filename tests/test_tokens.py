@@ -0,0 +1,100 @@
+import time
+
+import pytest
+
+import db_app
+from tokens import TokenSigner
+
+
+def test_issue_and_verify():
+    """test a token verifies to its user and credential version"""
+    signer = TokenSigner("secret", ttl=60, cacheSize=10, cacheTtl=60)
+    token = signer.issue(1, "alice", "hash")
+    assert signer.verify(token) == (1, "alice", signer.version("hash"))
+
+
+def test_tampered_token():
+    """test a token with a changed payload or from another secret is rejected"""
+    signer = TokenSigner("secret", ttl=60, cacheSize=10, cacheTtl=60)
+    payload, _, signature = signer.issue(1, "alice", "hash").partition(".")
+    other = signer.issue(2, "bob", "hash").partition(".")[0]
+    assert signer.verify(f'{other}.{signature}') == None
+    assert signer.verify(f'{payload}.') == None
+    assert signer.verify("garbage") == None
+    assert TokenSigner("other", ttl=60, cacheSize=10, cacheTtl=60).verify(f'{payload}.{signature}') == None
+
+
+def test_expired_token(monkeypatch):
+    """test a token is rejected once it expires, even while it is cached"""
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    signer = TokenSigner("secret", ttl=60, cacheSize=10, cacheTtl=600)
+    token = signer.issue(1, "alice", "hash")
+    assert signer.verify(token) != None
+    now[0] += 61
+    assert signer.verify(token) == None
+
+
+def test_version_follows_the_hash():
+    """test the credential version changes with the password hash and does not contain it"""
+    signer = TokenSigner("secret", ttl=60, cacheSize=10, cacheTtl=60)
+    assert signer.version("hash") == signer.version("hash")
+    assert signer.version("hash") != signer.version("other hash")
+    assert "hash" not in signer.version("hash")
+
+
+def login(client, username, password):
+    response = client.post("/login", json={"username": username, "password": password})
+    assert response.status_code == 200
+    return {"Authorization": f'Bearer {response.get_json()["token"]}'}
+
+
+@pytest.fixture
+def client():
+    """a test client of the app, with no credential versions cached"""
+    db_app.credential_versions.clear()
+    return db_app.app.test_client()
+
+
+def test_token_authenticates(client):
+    """test a token from /login is accepted in place of a username"""
+    client.post("/create-account", json={"username": "token-user", "password": "pw1"})
+    headers = login(client, "token-user", "pw1")
+    response = client.get("/view-favorites", headers=headers)
+    assert response.status_code == 200
+    assert "token-user" in response.get_json()
+    assert client.get("/view-favorites", headers={"Authorization": "Bearer nope"}).status_code == 401
+
+
+def test_password_change_revokes_tokens(client):
+    """test tokens issued before a password change are rejected, new ones work"""
+    client.post("/create-account", json={"username": "changer", "password": "pw1"})
+    headers = login(client, "changer", "pw1")
+    response = client.post("/update-password", json={"username": "changer", "oldPassword": "pw1", "newPassword": "pw2"})
+    assert response.status_code == 200
+    assert client.get("/view-favorites", headers=headers).status_code == 401
+    assert client.get("/view-favorites", headers=login(client, "changer", "pw2")).status_code == 200
+
+
+def test_delete_revokes_tokens(client):
+    """test a deleted user's token does not work for a new account, which gets a new id"""
+    client.post("/create-account", json={"username": "deleted", "password": "pw1"})
+    old_id = db_app.users.userId("deleted")
+    headers = login(client, "deleted", "pw1")
+    assert client.delete("/delete-user", json={"username": "deleted", "password": "pw1"}).status_code == 200
+    assert client.get("/view-favorites", headers=headers).status_code == 401
+
+    client.post("/create-account", json={"username": "deleted", "password": "pw1"})
+    assert db_app.users.userId("deleted") > old_id
+    assert client.get("/view-favorites", headers=headers).status_code == 401
+
+
+def test_revoked_in_another_process(client):
+    """test a password changed by another worker revokes tokens once the cached version expires"""
+    client.post("/create-account", json={"username": "elsewhere", "password": "pw1"})
+    headers = login(client, "elsewhere", "pw1")
+    assert client.get("/view-favorites", headers=headers).status_code == 200
+    user_id, _, hashed_password = db_app.users.credentials("elsewhere")
+    db_app.users.setPassword(user_id, hashed_password, "00", "scrypt$16$8$1$00$00")
+    db_app.credential_versions.clear() #what TOKEN_CHECK_TTL passing does
+    assert client.get("/view-favorites", headers=headers).status_code == 401
@@ -0,0 +1,263 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from upstream import SingleFlight, UpstreamClient, parse_host_timeouts
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """serves canned responses and records the client port of every request"""
+
+    #HTTP/1.1 so the stub keeps connections alive like the real api
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, self.client_address[1]))
+        if self.path == "/slow":
+            time.sleep(0.5)
+        status = 200
+        if self.path == "/flaky" and server.failures > 0:
+            server.failures -= 1
+            status = 503
+        body = b'{"id": "b1"}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    """a threaded server that ignores clients hanging up mid response"""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    """runs a local http server for the duration of a test"""
+    server = StubServer(("127.0.0.1", 0), StubHandler)
+    server.requests = []
+    server.failures = 0
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def url_for(server, path):
+    return f'http://127.0.0.1:{server.server_address[1]}{path}'
+
+
+def test_get(stub_server):
+    """test a response is fetched through the pooled client"""
+    client = UpstreamClient()
+    response = client.get(url_for(stub_server, "/breweries"))
+    assert response.status_code == 200
+    assert response.json() == {"id": "b1"}
+    client.close()
+
+
+def test_connection_reused(stub_server):
+    """test sequential requests share one keep-alive connection"""
+    client = UpstreamClient()
+    for _ in range(3):
+        client.get(url_for(stub_server, "/breweries")).content
+    ports = {port for _, port in stub_server.requests}
+    assert len(stub_server.requests) == 3
+    assert len(ports) == 1
+    client.close()
+
+
+def test_retries_unavailable(stub_server):
+    """test a 503 is retried until it succeeds"""
+    stub_server.failures = 2
+    client = UpstreamClient(retries=2, backoff=0)
+    response = client.get(url_for(stub_server, "/flaky"))
+    assert response.status_code == 200
+    assert len(stub_server.requests) == 3
+    client.close()
+
+
+def test_last_response_returned_when_retries_run_out(stub_server):
+    """test the last 503 is returned instead of raised once retries run out"""
+    stub_server.failures = 5
+    client = UpstreamClient(retries=1, backoff=0)
+    response = client.get(url_for(stub_server, "/flaky"))
+    assert response.status_code == 503
+    assert len(stub_server.requests) == 2
+    client.close()
+
+
+def test_host_timeout(stub_server):
+    """test a slow host fails within its own timeout and read timeouts are not retried"""
+    client = UpstreamClient(retries=2, defaultTimeout=5, timeouts={"127.0.0.1": 0.1})
+    start = time.monotonic()
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        client.get(url_for(stub_server, "/slow"))
+    assert time.monotonic() - start < 0.5
+    assert len(stub_server.requests) == 1
+    client.close()
+
+
+def test_explicit_timeout_wins(stub_server):
+    """test a timeout passed to get overrides the host timeout"""
+    client = UpstreamClient(timeouts={"127.0.0.1": 0.1})
+    assert client.get(url_for(stub_server, "/slow"), timeout=2).status_code == 200
+    client.close()
+
+
+def test_timeout_for():
+    """test hosts are matched without their case and unknown hosts use the default"""
+    client = UpstreamClient(defaultTimeout=5, timeouts={"API.example.com": 2})
+    assert client.timeoutFor("https://api.example.com/v1") == 2
+    assert client.timeoutFor("https://other.example.com/") == 5
+
+
+def test_parse_host_timeouts():
+    """test parsing host=seconds pairs"""
+    assert parse_host_timeouts("a.com=1.5, B.com=3,") == {"a.com": 1.5, "b.com": 3.0}
+    assert parse_host_timeouts("") == {}
+    with pytest.raises(ValueError):
+        parse_host_timeouts("a.com")
+
+
+def test_single_flight_collapses_threads():
+    """test concurrent calls for one key share a single call and its result"""
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(2)
+        return "brewery"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flights.do("b1", fetch)))
+    leader.start()
+    started.wait(2)
+    followers = [threading.Thread(target=lambda: results.append(flights.do("b1", fetch))) for _ in range(3)]
+    for follower in followers:
+        follower.start()
+    while flights.stats()["collapsed"] < 3:
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(2)
+
+    assert results == ["brewery"] * 4
+    assert len(calls) == 1
+    assert flights.stats() == {"inFlight": 0, "executed": 1, "collapsed": 3}
+
+
+def test_single_flight_shares_errors():
+    """test an error of the shared call is raised in every waiting thread, and the next call runs again"""
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(2)
+        raise RuntimeError("upstream down")
+
+    errors = []
+
+    def call():
+        try:
+            flights.do("b1", fail)
+        except RuntimeError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(2)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while flights.stats()["collapsed"] < 1:
+        time.sleep(0.01)
+    release.set()
+    leader.join(2)
+    follower.join(2)
+
+    assert len(errors) == 2
+    assert flights.do("b1", lambda: "ok") == "ok"
+
+
+def test_single_flight_async():
+    """test concurrent coroutines for one key share a single call"""
+    flights = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "brewery"
+
+    async def main():
+        return await asyncio.gather(*[flights.doAsync("b1", fetch) for _ in range(5)])
+
+    assert asyncio.run(main()) == ["brewery"] * 5
+    assert len(calls) == 1
+    assert flights.stats()["collapsed"] == 4
+
+
+def test_single_flight_async_survives_cancelled_caller():
+    """test cancelling the first caller does not cancel the call the others wait on"""
+    flights = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "brewery"
+
+    async def main():
+        first = asyncio.ensure_future(flights.doAsync("b1", fetch))
+        await asyncio.sleep(0)
+        others = asyncio.gather(*[flights.doAsync("b1", fetch) for _ in range(3)])
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await others
+
+    assert asyncio.run(main()) == ["brewery"] * 3
+    assert len(calls) == 1
+    assert flights.stats()["inFlight"] == 0
+
+
+def test_single_flight_async_error_and_next_call():
+    """test an error reaches every waiter and the next call for the key runs again"""
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ConnectionError("api down")
+
+    async def ok():
+        return "brewery"
+
+    async def main():
+        results = await asyncio.gather(*[flights.doAsync("b1", fail) for _ in range(3)], return_exceptions=True)
+        await asyncio.sleep(0)
+        return results, await flights.doAsync("b1", ok)
+
+    errors, result = asyncio.run(main())
+    assert all(isinstance(error, ConnectionError) for error in errors)
+    assert result == "brewery"
@@ -0,0 +1,97 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+from cache import TTLCache
+
+
+#base64url without padding
+def b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+def b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class TokenSigner:
+    """
+    issues and verifies signed session tokens, "<base64 payload>.<base64 hmac-sha256 of the payload>"
+
+    a token is checked with its HMAC alone (no password hashing), and tokens that were
+    verified recently are remembered so repeat requests skip even the HMAC
+
+    every token carries the credential version of its user (see version), a fingerprint of the
+    password hash it was issued for, so the caller can revoke it by comparing that with the
+    user's current version: changing the password or deleting the user changes it
+
+    Attributes:
+        key: the HMAC key
+        ttl: the number of seconds an issued token is valid
+        verified: cache of recently verified tokens -> (user id, username, credential version, expiry)
+    """
+
+    def __init__(self, secret, ttl, cacheSize, cacheTtl):
+        """
+        initializes the signer with a key derived from the app secret
+        """
+        self.key = hmac.new(secret.encode(), b"session-token", hashlib.sha256).digest()
+        self.ttl = ttl
+        self.verified = TTLCache(cacheSize, cacheTtl)
+
+    def sign(self, payload):
+        """
+        returns:
+            the base64 HMAC of a base64 payload
+        """
+        return b64encode(hmac.new(self.key, payload.encode(), hashlib.sha256).digest())
+
+    def version(self, hashedPassword):
+        """
+        returns:
+            the credential version of a user with a password hash, a keyed fingerprint
+            of the hash so a token does not give away anything about it
+        """
+        return self.sign("credential:" + hashedPassword)[:16]
+
+    def issue(self, userId, username, hashedPassword):
+        """
+        returns:
+            a token for a user with a password hash, valid for ttl seconds
+        """
+        claims = {"uid": userId, "sub": username, "ver": self.version(hashedPassword), "exp": int(time.time() + self.ttl)}
+        payload = b64encode(json.dumps(claims).encode())
+        return f'{payload}.{self.sign(payload)}'
+
+    def verify(self, token):
+        """
+        returns:
+            (user id, username, credential version) of a valid, unexpired token, otherwise None
+            the version still has to be checked against the user's current one
+        """
+        found, user = self.verified.lookup(token)
+        if not found:
+            user = self.check(token)
+            if user == None:
+                return None
+            self.verified.put(token, user)
+        userId, username, version, expires = user
+        if expires <= time.time():
+            return None
+        return userId, username, version
+
+    def check(self, token):
+        """
+        verifies the HMAC of a token and decodes it
+
+        returns:
+            (user id, username, credential version, expiry) if the signature is valid, otherwise None
+        """
+        payload, _, signature = token.partition(".")
+        if not signature or not hmac.compare_digest(self.sign(payload), signature):
+            return None
+        try:
+            claims = json.loads(b64decode(payload))
+            return claims["uid"], claims["sub"], claims["ver"], claims["exp"]
+        except (ValueError, KeyError, TypeError):
+            return None
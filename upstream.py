@@ -0,0 +1,174 @@
+import asyncio
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib.parse import urlsplit
+
+
+#parses per host timeouts written as "host=seconds,host=seconds"
+def parse_host_timeouts(value):
+    timeouts = {}
+    for entry in value.split(","):
+        entry = entry.strip()
+        if entry == "":
+            continue
+        host, sep, seconds = entry.partition("=")
+        if not sep:
+            raise ValueError(f'invalid host timeout: {entry}, expected host=seconds')
+        timeouts[host.strip().lower()] = float(seconds)
+    return timeouts
+
+
+class UpstreamClient:
+    """
+    a pooled, keep-alive http client used for every call to an outside api
+
+    connections are reused between requests instead of paying a new tcp+tls handshake,
+    connection errors and 429/5xx responses are retried with exponential backoff,
+    and every request gets a timeout based on its host
+
+    Attributes:
+        session: the requests session holding the connection pools
+        defaultTimeout: the timeout in seconds for hosts not in timeouts
+        timeouts: host -> timeout in seconds
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, poolSize=10, retries=2, backoff=0.2, defaultTimeout=5, timeouts=None):
+        """
+        initializes the session with a pooled, retrying adapter
+        read timeouts are not retried so a slow api fails within its timeout,
+        and once status retries run out the last response is returned instead of raised
+        """
+        retry = Retry(total=retries, read=False, backoff_factor=backoff,
+                      status_forcelist=self.RETRY_STATUSES, allowed_methods=["GET", "HEAD"],
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.defaultTimeout = defaultTimeout
+        self.timeouts = {host.lower(): timeouts[host] for host in (timeouts or {})}
+
+    def timeoutFor(self, url):
+        """
+        returns:
+            the timeout in seconds for the host of the url
+        """
+        host = (urlsplit(url).hostname or "").lower()
+        return self.timeouts.get(host, self.defaultTimeout)
+
+    def get(self, url, **kwargs):
+        """
+        sends a GET request over a pooled connection
+        an explicit timeout in kwargs wins over the host timeout
+
+        returns:
+            the requests.Response
+        """
+        kwargs.setdefault("timeout", self.timeoutFor(url))
+        return self.session.get(url, **kwargs)
+
+    def close(self):
+        """
+        closes every pooled connection
+        """
+        self.session.close()
+
+
+class SingleFlight:
+    """
+    collapses concurrent identical upstream calls into one in-flight call
+
+    the first caller for a key runs the call, callers arriving while it is in flight
+    wait for it and get its result or its error instead of making their own call
+    threads use do(), coroutines on an event loop use doAsync()
+
+    Attributes:
+        executed: the number of calls that actually ran
+        collapsed: the number of calls that waited on another call instead of running
+    """
+
+    def __init__(self):
+        """
+        initializes with nothing in flight
+        """
+        self.calls = {} #key -> [threading.Event, result, error]
+        self.asyncCalls = {} #key -> asyncio.Task
+        self.lock = threading.Lock()
+        self.executed = 0
+        self.collapsed = 0
+
+    def do(self, key, fn):
+        """
+        returns fn(), sharing one call of it between every thread asking for the same key
+        raises whatever fn raised, in every waiting thread
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = [threading.Event(), None, None]
+                self.calls[key] = call
+                self.executed += 1
+            else:
+                self.collapsed += 1
+
+        if not leader:
+            call[0].wait()
+            if call[2] is not None:
+                raise call[2]
+            return call[1]
+
+        try:
+            call[1] = fn()
+            return call[1]
+        except BaseException as e:
+            call[2] = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call[0].set()
+
+    async def doAsync(self, key, fn):
+        """
+        returns await fn(), sharing one call of it between every coroutine asking for the same key
+        raises whatever fn raised, in every waiting coroutine
+        the call runs as a task owned by the flight, so a caller that gets cancelled (its client went away)
+        only stops waiting, the call and everyone else waiting on it carry on
+        """
+        with self.lock:
+            task = self.asyncCalls.get(key)
+            if task is None:
+                task = asyncio.get_running_loop().create_task(fn())
+                task.add_done_callback(lambda done: self.landed(key, done))
+                self.asyncCalls[key] = task
+                self.executed += 1
+            else:
+                self.collapsed += 1
+        return await asyncio.shield(task)
+
+    def landed(self, key, task):
+        """
+        forgets a finished async call, so the next caller for its key makes a new one
+        """
+        with self.lock:
+            if self.asyncCalls.get(key) is task:
+                del self.asyncCalls[key]
+        if not task.cancelled():
+            task.exception() #marks the error as retrieved when nobody was waiting
+
+    def stats(self):
+        """
+        returns:
+            a dict of the coalescing counters
+        """
+        with self.lock:
+            return {
+                "inFlight": len(self.calls) + len(self.asyncCalls),
+                "executed": self.executed,
+                "collapsed": self.collapsed
+            }